@@ -1,20 +1,268 @@
-from django.contrib import admin
-from .models import Student, StudentUniversity, Diploma, Certificate
+from django.contrib import admin, messages
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils.functional import cached_property
+from . import audit
+from .expiry import chunked_queryset
+from .models import (
+    ArchivedDocument,
+    ArchivedStudent,
+    AuditEvent,
+    Certificate,
+    Diploma,
+    DocumentNumberSeries,
+    SlowQuery,
+    StatusChangeRecord,
+    Student,
+    StudentUniversity,
+)
+
+# Начиная с этого количества строк в таблице вместо COUNT(*) используется оценка
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Сколько секунд кэшируются значения фильтров по свободным текстовым полям
+FILTER_VALUES_TIMEOUT = 600
+
+BULK_CHUNK_SIZE = 500
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор, который для больших таблиц без фильтров берёт оценку числа строк
+    из статистики PostgreSQL вместо точного COUNT(*)
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self.estimate(queryset)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples = -1, пока таблица ни разу не анализировалась
+        return row[0] if row and row[0] >= 0 else None
+
+
+class CachedAllValuesFieldListFilter(admin.AllValuesFieldListFilter):
+    """
+    Фильтр по всем значениям поля, которые кэшируются, а не считаются
+    SELECT DISTINCT по всей таблице при каждом открытии списка
+    """
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.cache_key = f'admin-filter:{model._meta.label}:{field_path}'
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    @property
+    def lookup_choices(self):
+        return self._lookup_choices
+
+    @lookup_choices.setter
+    def lookup_choices(self, queryset):
+        values = cache.get(self.cache_key)
+        if values is None:
+            values = list(queryset)
+            cache.set(self.cache_key, values, FILTER_VALUES_TIMEOUT)
+        self._lookup_choices = values
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """
+    Базовый класс списков админки для больших таблиц
+    """
+    paginator = EstimatedCountPaginator
+    # Без второго COUNT(*) по всей таблице при поиске и фильтрации
+    show_full_result_count = False
+    list_per_page = 50
+    ordering = ('-pk',)
+
+
+def bulk_set_field(modeladmin, request, queryset, field_name, value):
+    """
+    Массово меняет значение поля пачками через bulk_update
+    и записывает изменения в StatusChangeRecord
+    """
+    model = queryset.model
+    updated = 0
+    queryset = queryset.exclude(**{field_name: value}).only('pk', field_name, *audit.repr_fields(model))
+    for chunk in chunked_queryset(queryset, BULK_CHUNK_SIZE):
+        records = []
+        old_values = {}
+        for obj in chunk:
+            old_values[obj.pk] = {field_name: getattr(obj, field_name)}
+            records.append(StatusChangeRecord(
+                model_name=model.__name__,
+                object_id=obj.pk,
+                field_name=field_name,
+                old_value=getattr(obj, field_name),
+                new_value=value,
+                reason=f"Админка: {request.user.username}",
+            ))
+            setattr(obj, field_name, value)
+        with transaction.atomic():
+            model.objects.bulk_update(chunk, [field_name])
+            StatusChangeRecord.objects.bulk_create(records)
+            audit.record_bulk_update(chunk, old_values, [field_name], request=request)
+        updated += len(chunk)
+    modeladmin.message_user(request, f"Обновлено записей: {updated}", messages.SUCCESS)
+
+
+def make_status_action(field_name, value, label):
+    def action(modeladmin, request, queryset):
+        bulk_set_field(modeladmin, request, queryset, field_name, value)
+    action.__name__ = f'set_{field_name}_{value}'
+    action.short_description = label
+    return action
+
+
+def bulk_regenerate_qr(modeladmin, request, queryset, generate, fields):
+    """
+    Перегенерирует QR-коды и сохраняет ссылки на файлы одним bulk_update на пачку
+    """
+    regenerated = 0
+    failed = 0
+    for chunk in chunked_queryset(queryset, BULK_CHUNK_SIZE):
+        # Значения до генерации: FieldFile меняется на месте
+        old_values = {obj.pk: audit.field_values(queryset.model, obj) for obj in chunk}
+        done = [obj for obj in chunk if generate(obj, request, save=False)]
+        failed += len(chunk) - len(done)
+        with transaction.atomic():
+            queryset.model.objects.bulk_update(done, fields)
+            audit.record_bulk_update(done, old_values, fields, request=request)
+        regenerated += len(done)
+    modeladmin.message_user(request, f"QR-кодов создано: {regenerated}", messages.SUCCESS)
+    if failed:
+        modeladmin.message_user(request, f"Не удалось создать QR-кодов: {failed}", messages.ERROR)
+
 
 @admin.register(Student)
-class StudentAdmin(admin.ModelAdmin):
-    list_display = ('full_name_english', 'passport_number', 'birth_date', 'current_status')
-    list_filter = ('current_status', 'gender', 'country_of_residence')
+class StudentAdmin(ScalableModelAdmin):
+    list_display = ('full_name_english', 'passport_number', 'birth_date', 'current_status', 'is_overdue')
+    list_filter = ('current_status', 'is_overdue', 'gender', ('country_of_residence', CachedAllValuesFieldListFilter))
     search_fields = ('full_name_english', 'full_name_arabic', 'passport_number')
+    actions = [
+        make_status_action('current_status', value, f"Статус: {label}")
+        for value, label in Student.STATUS_CHOICES
+    ]
+
+
+class DocumentAdmin(ScalableModelAdmin):
+    list_select_related = ('student',)
+    autocomplete_fields = ('student',)
+
 
 @admin.register(Diploma)
-class DiplomaAdmin(admin.ModelAdmin):
-    list_display = ('diploma_type', 'issue_date', 'document_status')
+class DiplomaAdmin(DocumentAdmin):
+    list_display = ('diploma_number', 'student', 'diploma_type', 'issue_date', 'document_status')
     list_filter = ('diploma_type', 'document_status')
+    search_fields = ('diploma_number', 'registration_number')
+    actions = [
+        make_status_action('document_status', value, f"Статус документа: {label}")
+        for value, label in Diploma.STATUS_CHOICES
+    ] + ['regenerate_qr']
+
+    @admin.action(description="Перегенерировать QR-коды")
+    def regenerate_qr(self, request, queryset):
+        from .qr_generator import generate_diploma_qr
+        bulk_regenerate_qr(self, request, queryset, generate_diploma_qr, ['diploma_qr', 'diploma_qr_format'])
+
 
 @admin.register(Certificate)
-class CertificateAdmin(admin.ModelAdmin):
-    list_display = ('certificate_type', 'issue_date', 'purpose')
-    list_filter = ('certificate_type', 'purpose')
+class CertificateAdmin(DocumentAdmin):
+    list_display = ('certificate_number', 'student', 'certificate_type', 'issue_date', 'purpose')
+    list_filter = ('certificate_type', 'purpose', 'is_expired')
+    search_fields = ('certificate_number',)
+    actions = ['regenerate_qr']
+
+    @admin.action(description="Перегенерировать QR-коды")
+    def regenerate_qr(self, request, queryset):
+        from .qr_generator import generate_certificate_qr
+        bulk_regenerate_qr(self, request, queryset, generate_certificate_qr, ['certificate_qr', 'certificate_qr_format'])
+
+
+@admin.register(StudentUniversity)
+class StudentUniversityAdmin(DocumentAdmin):
+    list_display = ('university', 'student', 'start_date', 'end_date', 'is_current')
+    list_filter = ('is_current',)
+    search_fields = ('university',)
+
+
+@admin.register(StatusChangeRecord)
+class StatusChangeRecordAdmin(ScalableModelAdmin):
+    list_display = ('model_name', 'object_id', 'field_name', 'old_value', 'new_value', 'changed_at')
+    list_filter = (('model_name', CachedAllValuesFieldListFilter), ('field_name', CachedAllValuesFieldListFilter))
+
+
+@admin.register(DocumentNumberSeries)
+class DocumentNumberSeriesAdmin(admin.ModelAdmin):
+    list_display = ('institution', 'number_type', 'year', 'next_value')
+    list_filter = ('number_type', 'year')
+    search_fields = ('institution',)
+
+
+@admin.register(ArchivedStudent)
+class ArchivedStudentAdmin(ScalableModelAdmin):
+    list_display = ('full_name_english', 'passport_number', 'current_status', 'archived_at')
+    list_filter = ('current_status',)
+    search_fields = ('full_name_english', 'passport_number')
+    exclude = ('data',)
+    readonly_fields = ('student_id', 'passport_number', 'full_name_english', 'current_status', 'media_archive')
+    actions = ['restore']
+
+    @admin.action(description="Восстановить из архива")
+    def restore(self, request, queryset):
+        from .archive import restore_student
+        restored = 0
+        for student_id in queryset.values_list('student_id', flat=True):
+            restore_student(student_id)
+            restored += 1
+        self.message_user(request, f"Восстановлено студентов: {restored}", messages.SUCCESS)
+
+
+@admin.register(ArchivedDocument)
+class ArchivedDocumentAdmin(ScalableModelAdmin):
+    list_display = ('number', 'document_type', 'document_id', 'issue_date', 'archived_student')
+    list_filter = ('document_type',)
+    search_fields = ('number',)
+    list_select_related = ('archived_student',)
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(ScalableModelAdmin):
+    list_display = ('occurred_at', 'action', 'model_name', 'object_id', 'object_repr', 'username', 'ip_address')
+    list_filter = ('action', ('model_name', CachedAllValuesFieldListFilter))
+    search_fields = ('username', 'object_repr')
+
+    # Журнал только для чтения
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('fingerprint', 'calls', 'total_ms', 'max_ms', 'view', 'location', 'last_seen')
+    search_fields = ('sql', 'view', 'location')
+    readonly_fields = ('fingerprint', 'sql', 'calls', 'total_ms', 'max_ms', 'view', 'location', 'plan', 'first_seen', 'last_seen')
 
-admin.site.register(StudentUniversity)
+    def has_add_permission(self, request):
+        return False
@@ -1,6 +1,55 @@
+import os
 from django.apps import AppConfig
 
 
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.models import Group, Permission
+        from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_migrate
+        from .auth_cache import invalidate_all, invalidate_user
+        from .audit import connect_signals as connect_audit_signals
+        from .numbering import check_duplicates_before_migrate
+        from .summary import backfill_summaries, connect_signals
+
+        # Снимок пользователя сбрасывается при изменении флагов is_staff и т.п.
+        user_model = get_user_model()
+        post_save.connect(invalidate_user, sender=user_model, dispatch_uid='main.invalidate_user_save')
+        post_delete.connect(invalidate_user, sender=user_model, dispatch_uid='main.invalidate_user_delete')
+        # ... и при изменении групп и прав (массовые update() вызывают invalidate_all сами)
+        for through in (user_model.groups.through, user_model.user_permissions.through, Group.permissions.through):
+            m2m_changed.connect(invalidate_all, sender=through, dispatch_uid=f'main.invalidate_all_{through.__name__}')
+        for model in (Group, Permission):
+            post_delete.connect(invalidate_all, sender=model, dispatch_uid=f'main.invalidate_all_{model.__name__}')
+
+        # Повторы номеров документов проверяются до добавления ограничений уникальности
+        pre_migrate.connect(check_duplicates_before_migrate, sender=self, dispatch_uid='main.check_document_numbers')
+
+        # Сводки по студентам для списков; после migrate создаются недостающие
+        connect_signals()
+        post_migrate.connect(backfill_summaries, sender=self, dispatch_uid='main.backfill_summaries')
+
+        # Журнал аудита изменений студентов и документов
+        connect_audit_signals()
+
+        # Счётчики ограничения частоты в продакшене - только в общем кэше
+        from django.core import checks
+        from .ratelimit import check_shared_cache
+
+        checks.register(check_shared_cache, checks.Tags.caches, deploy=True)
+
+        # Медленные запросы замеряются на каждом соединении: и в веб-воркерах, и в командах
+        from django.db.backends.signals import connection_created
+        from .slow_queries import install_timer
+
+        connection_created.connect(install_timer, dispatch_uid='main.slow_query_timer')
+
+        # Прогрев только в веб-воркерах: wsgi.py / asgi.py выставляют переменную
+        # до загрузки приложения, manage.py её не выставляет
+        from .warmup import WARM_UP_ENV, warm_up
+
+        if os.environ.get(WARM_UP_ENV) == '1':
+            warm_up()
@@ -0,0 +1,408 @@
+# students/archive.py
+import datetime
+import tarfile
+import tempfile
+import zlib
+from django.conf import settings
+from django.core import serializers
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import FileField
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.utils import timezone
+from .models import (
+    ArchivedDocument,
+    ArchivedStudent,
+    Certificate,
+    Diploma,
+    PaymentReceipt,
+    StatusChangeRecord,
+    Student,
+    StudentUniversity,
+)
+from .summary import refresh_summaries
+
+# Статусы студентов, которые переносятся в архив
+ARCHIVE_STATUSES = ('graduate', 'expelled')
+
+# Через сколько дней после окончания обучения студент переносится в архив
+# (переопределяется settings.ARCHIVE_AFTER_DAYS)
+DEFAULT_ARCHIVE_AFTER_DAYS = 365
+
+# Сколько дней восстановленный студент не архивируется повторно
+# (переопределяется settings.ARCHIVE_RESTORE_HOLD_DAYS)
+DEFAULT_RESTORE_HOLD_DAYS = 90
+
+MEDIA_ARCHIVE_DIR = 'archive/students'
+
+# Файлы до этого размера собираются в памяти, больше - во временном файле
+SPOOL_SIZE = 16 * 1024 * 1024
+
+DEFAULT_CHUNK_SIZE = 100
+
+# Связанные со студентом таблицы, записи которых переносятся в архив
+STUDENT_RELATED_MODELS = (StudentUniversity, Certificate, Diploma, PaymentReceipt)
+
+
+def student_objects(student):
+    """
+    Студент и все связанные с ним записи в порядке восстановления
+
+    Вызывается внутри транзакции: студент и записи блокируются до её конца,
+    чтобы документ, добавленный или изменённый параллельно, не был удалён
+    вместе со студентом, не попав в архив (вставка записи со ссылкой на
+    студента ждёт снятия блокировки строки студента).
+    Сводка (StudentSummary) не архивируется: она пересчитывается при восстановлении.
+    """
+    student = Student.objects.select_for_update().get(pk=student.pk)
+    return (
+        [student]
+        + list(student.universities.select_for_update().order_by('pk'))
+        + list(student.certificates.select_for_update().order_by('pk'))
+        + list(student.diplomas.select_for_update().order_by('pk'))
+        + list(student.payment_receipts.select_for_update().order_by('pk'))
+    )
+
+
+def media_names(objects):
+    names = []
+    for obj in objects:
+        for field in obj._meta.get_fields():
+            if isinstance(field, FileField):
+                value = getattr(obj, field.name)
+                if value and value.name not in names:
+                    names.append(value.name)
+    return names
+
+
+def referenced_names(names):
+    """
+    Имена из списка, на которые ссылаются записи основных таблиц
+    """
+    referenced = set()
+    for model in (Student, *STUDENT_RELATED_MODELS):
+        for field in model._meta.get_fields():
+            if isinstance(field, FileField):
+                referenced.update(
+                    model.objects.filter(**{f'{field.name}__in': names}).values_list(field.name, flat=True)
+                )
+    return referenced
+
+
+def document_index(archived, objects):
+    """
+    Строки узкого индекса для проверки документов архивного студента
+    """
+    rows = []
+    for obj in objects:
+        if hasattr(obj, 'certificate_number'):
+            rows.append(('certificate', obj.pk, obj.certificate_number, obj.issue_date))
+        elif hasattr(obj, 'diploma_number'):
+            rows.append(('diploma', obj.pk, obj.diploma_number, obj.issue_date))
+        elif hasattr(obj, 'payment_receipt'):
+            rows.append(('receipt', obj.pk, '', timezone.localdate(obj.upload_date) if obj.upload_date else None))
+    return [
+        ArchivedDocument(
+            archived_student=archived,
+            document_type=document_type,
+            document_id=document_id,
+            number=number,
+            issue_date=issue_date,
+        )
+        for document_type, document_id, number, issue_date in rows
+    ]
+
+
+def write_media_archive(student_id, names):
+    """
+    Собирает файлы студента в один tar.gz и сохраняет его в хранилище
+
+    Returns:
+        tuple: Имя архива в хранилище и список файлов, которых не оказалось в хранилище
+    """
+    missing = []
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as buffer:
+        with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+            for name in names:
+                try:
+                    source = default_storage.open(name)
+                except FileNotFoundError:
+                    missing.append(name)
+                    continue
+                with source:
+                    info = tarfile.TarInfo(name)
+                    info.size = source.size
+                    info.mtime = int(timezone.now().timestamp())
+                    archive.addfile(info, source)
+        buffer.seek(0)
+        archive_name = default_storage.save(
+            f'{MEDIA_ARCHIVE_DIR}/{student_id}.tar.gz',
+            File(buffer, name=f'{student_id}.tar.gz'),
+        )
+    return archive_name, missing
+
+
+def restore_media_archive(archive_name):
+    """
+    Распаковывает архив файлов студента обратно в хранилище
+
+    Returns:
+        dict: Исходное имя файла -> имя, под которым он сохранён
+    """
+    restored = {}
+    try:
+        with default_storage.open(archive_name) as source:
+            with tarfile.open(fileobj=source, mode='r|gz') as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    with archive.extractfile(member) as content:
+                        restored[member.name] = default_storage.save(member.name, File(content, name=member.name))
+    except Exception:
+        for name in restored.values():
+            default_storage.delete(name)
+        raise
+    return restored
+
+
+def status_record(student_id, old_value, new_value, reason):
+    return StatusChangeRecord(
+        model_name='Student',
+        object_id=student_id,
+        field_name='archive',
+        old_value=old_value,
+        new_value=new_value,
+        reason=reason,
+    )
+
+
+def archive_candidates(today=None):
+    """
+    Студенты, которых пора перенести в архив
+
+    Выпускники и отчисленные, закончившие обучение больше ARCHIVE_AFTER_DAYS
+    дней назад и не восстанавливавшиеся из архива за последние
+    ARCHIVE_RESTORE_HOLD_DAYS дней.
+
+    Returns:
+        QuerySet: Студенты для архивации
+    """
+    today = today or timezone.localdate()
+    cutoff = today - datetime.timedelta(days=getattr(settings, 'ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS))
+    hold_days = getattr(settings, 'ARCHIVE_RESTORE_HOLD_DAYS', DEFAULT_RESTORE_HOLD_DAYS)
+    recently_restored = StatusChangeRecord.objects.filter(
+        model_name='Student',
+        field_name='archive',
+        new_value='restored',
+        changed_at__gte=timezone.now() - datetime.timedelta(days=hold_days),
+    ).values('object_id')
+    return Student.objects.annotate(
+        finished=Coalesce('actual_end_date', 'expected_end_date', 'start_date'),
+    ).filter(
+        current_status__in=ARCHIVE_STATUSES,
+        finished__lt=cutoff,
+    ).exclude(pk__in=recently_restored)
+
+
+def archive_student(student):
+    """
+    Переносит студента с документами и файлами в архив
+
+    Записи читаются и сериализуются под блокировкой в той же транзакции,
+    в которой удаляются; исходные файлы удаляются только после её фиксации.
+
+    Args:
+        student (Student): Студент
+
+    Returns:
+        ArchivedStudent: Запись архива
+    """
+    archive_name = ''
+    try:
+        with transaction.atomic():
+            objects = student_objects(student)
+            student = objects[0]
+            if student.current_status not in ARCHIVE_STATUSES:
+                raise ValueError(f"Статус студента изменился: {student.get_current_status_display()}")
+            names = media_names(objects)
+            if names:
+                archive_name, missing = write_media_archive(student.pk, names)
+            else:
+                missing = []
+            data = zlib.compress(serializers.serialize('json', objects).encode('utf-8'))
+            archived = ArchivedStudent.objects.create(
+                student_id=student.pk,
+                passport_number=student.passport_number,
+                full_name_english=student.full_name_english,
+                full_name_arabic=student.full_name_arabic,
+                birth_date=student.birth_date,
+                current_status=student.current_status,
+                data=data,
+                media_archive=archive_name,
+            )
+            ArchivedDocument.objects.bulk_create(document_index(archived, objects))
+            status_record(student.pk, 'active', 'archived', f"Файлов: {len(names) - len(missing)}").save()
+            student.delete()
+            # Один файл может быть указан у нескольких студентов (общие шаблоны и т.п.)
+            unused = set(names) - set(missing) - referenced_names(names)
+            transaction.on_commit(lambda: [default_storage.delete(name) for name in unused])
+    except Exception:
+        if archive_name:
+            default_storage.delete(archive_name)
+        raise
+    return archived
+
+
+def restore_student(student_id):
+    """
+    Восстанавливает студента из архива в основные таблицы
+
+    Args:
+        student_id (int): ID студента
+
+    Returns:
+        Student: Восстановленный студент
+    """
+    with transaction.atomic():
+        try:
+            archived = ArchivedStudent.objects.select_for_update().get(student_id=student_id)
+        except ArchivedStudent.DoesNotExist:
+            # Студента мог уже восстановить параллельный запрос
+            return Student.objects.get(pk=student_id)
+
+        restored = restore_media_archive(archived.media_archive.name) if archived.media_archive else {}
+        try:
+            for deserialized in serializers.deserialize('json', zlib.decompress(bytes(archived.data))):
+                obj = deserialized.object
+                for field in obj._meta.get_fields():
+                    if isinstance(field, FileField):
+                        value = getattr(obj, field.name)
+                        if value and value.name in restored:
+                            setattr(obj, field.name, restored[value.name])
+                deserialized.save()
+            refresh_summaries([student_id])
+            status_record(student_id, 'archived', 'restored', f"Файлов: {len(restored)}").save()
+            media_archive = archived.media_archive.name
+            archived.delete()
+        except Exception:
+            for name in restored.values():
+                default_storage.delete(name)
+            raise
+        if media_archive:
+            transaction.on_commit(lambda: default_storage.delete(media_archive))
+    return Student.objects.get(pk=student_id)
+
+
+def archived_objects(archived):
+    """
+    Записи архивного студента, собранные в памяти без записи в базу
+
+    Returns:
+        list: Несохранённые объекты Student и связанных моделей
+    """
+    return [
+        deserialized.object
+        for deserialized in serializers.deserialize('json', zlib.decompress(bytes(archived.data)))
+    ]
+
+
+def get_archived_student(student_id):
+    """
+    Архивный студент для просмотра без восстановления
+
+    Returns:
+        tuple: ArchivedStudent и его записи (archived_objects)
+
+    Raises:
+        Http404: Студента нет в архиве
+    """
+    archived = ArchivedStudent.objects.filter(student_id=student_id).first()
+    if archived is None:
+        raise Http404("Студент не найден")
+    return archived, archived_objects(archived)
+
+
+def find_archived_document(document_type, number=None, student_id=None, document_id=None):
+    """
+    Ищет документ архивного студента по номеру или по ID из ссылки QR-кода
+    (без распаковки архива)
+
+    Returns:
+        QuerySet: Записи индекса архивных документов
+    """
+    documents = ArchivedDocument.objects.filter(document_type=document_type)
+    if number is not None:
+        documents = documents.filter(number=number)
+    if student_id is not None:
+        documents = documents.filter(archived_student_id=student_id)
+    if document_id is not None:
+        documents = documents.filter(document_id=document_id)
+    return documents.select_related('archived_student')
+
+
+def display_fields(obj):
+    """
+    Поля архивной записи для просмотра: подпись и значение (файлы не показываются)
+
+    Returns:
+        list: Пары (verbose_name, значение)
+    """
+    rows = []
+    for field in obj._meta.concrete_fields:
+        if field.primary_key or field.is_relation or isinstance(field, FileField):
+            continue
+        if field.choices:
+            value = getattr(obj, f'get_{field.name}_display')()
+        else:
+            value = getattr(obj, field.attname)
+        if value in (None, ''):
+            continue
+        rows.append((field.verbose_name, value))
+    return rows
+
+
+def archive_students(today=None, limit=None, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE, log=None):
+    """
+    Переносит в архив всех подходящих студентов
+
+    Каждый студент архивируется в отдельной транзакции: ошибка одного
+    не откатывает остальных.
+
+    Args:
+        today (date): Дата, от которой отсчитывается срок
+        limit (int): Максимальное количество студентов за запуск
+        dry_run (bool): Только подсчитать кандидатов
+        chunk_size (int): Сколько студентов читается из базы за раз
+        log: Функция для вывода прогресса
+
+    Returns:
+        dict: Количество перенесённых студентов и ошибок
+    """
+    log = log or (lambda message: None)
+    queryset = archive_candidates(today)
+    if dry_run:
+        count = queryset.count()
+        return {'archived': min(count, limit) if limit else count, 'failed': 0}
+
+    archived = 0
+    failed = 0
+    last_pk = 0
+    while limit is None or archived < limit:
+        chunk = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+        if not chunk:
+            break
+        # После delete() у объекта pk становится None
+        last_pk = chunk[-1].pk
+        for student in chunk:
+            if limit is not None and archived >= limit:
+                break
+            try:
+                archive_student(student)
+                archived += 1
+            except Exception as error:
+                failed += 1
+                log(f"Студент #{student.pk}: {error}")
+        log(f"Перенесено в архив: {archived}")
+    return {'archived': archived, 'failed': failed}
@@ -0,0 +1,339 @@
+# students/audit.py
+import atexit
+import contextvars
+import datetime
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import FileField
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+from .models import AuditEvent, Certificate, Diploma, Student
+from .network import client_ip
+
+logger = logging.getLogger(__name__)
+
+# Модели, изменения которых записываются в журнал
+AUDITED_MODELS = (Student, Certificate, Diploma)
+
+# Поля, из которых строится str() объекта для события: их нужно загружать
+# в QuerySet.only() перед массовыми изменениями (record_bulk_update)
+REPR_FIELDS = {
+    Student: ('full_name_english', 'passport_number'),
+    Certificate: ('certificate_number',),
+    Diploma: ('diploma_number',),
+}
+
+# Размер пачки bulk_create и интервал сброса буфера в секундах
+# (переопределяются settings.AUDIT_BATCH_SIZE и settings.AUDIT_FLUSH_INTERVAL)
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 2.0
+
+# Сколько событий буфер держит, если база недоступна; более старые теряются
+MAX_BUFFERED_EVENTS = 50000
+
+AUDIT_ARCHIVE_DIR = 'archive/audit'
+SPOOL_SIZE = 16 * 1024 * 1024
+
+# Переменная окружения, включающая буфер с фоновой записью (выставляется в wsgi.py /
+# asgi.py). Без неё - в тестах и командах manage.py - события пишутся сразу после
+# фиксации транзакции: atexit-сброс буфера сработал бы уже после того, как тестовая
+# база удалена и соединение снова указывает на рабочую
+AUDIT_BUFFER_ENV = 'STUDENTS_QR_AUDIT_BUFFER'
+
+# Запрос, в рамках которого происходят изменения (выставляет AuditContextMiddleware)
+_request = contextvars.ContextVar('audit_request', default=None)
+
+
+def bind_request(request):
+    return _request.set(request)
+
+
+def unbind_request(token):
+    _request.reset(token)
+
+
+def request_fields(request):
+    """
+    Данные о пользователе и запросе для события
+    """
+    if request is None:
+        return {}
+    user = getattr(request, 'user', None)
+    authenticated = user is not None and user.is_authenticated
+    return {
+        'user_id': user.pk if authenticated else None,
+        'username': user.get_username() if authenticated else '',
+        'ip_address': client_ip(request),
+        'path': request.path[:255],
+    }
+
+
+class AuditBuffer:
+    """
+    Буфер событий процесса
+
+    Запрос только добавляет событие в список; фоновый поток записывает
+    накопленное через bulk_create, когда набралась пачка или прошёл интервал.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'AUDIT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'AUDIT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+    def _ensure_thread(self):
+        # После fork воркера поток родителя в дочернем процессе не работает
+        if self.thread is None or self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self.thread.start()
+
+    def add(self, event):
+        with self.lock:
+            self.events.append(event)
+            full = len(self.events) >= self.batch_size
+            self._ensure_thread()
+        if full:
+            self.wakeup.set()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Ошибка записи журнала аудита")
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """
+        Записывает накопленные события; при ошибке возвращает их в буфер
+
+        Returns:
+            int: Количество записанных событий
+        """
+        with self.lock:
+            events, self.events = self.events, []
+        if not events:
+            return 0
+        try:
+            AuditEvent.objects.bulk_create(events, batch_size=self.batch_size)
+        except Exception:
+            with self.lock:
+                self.events = (events + self.events)[-MAX_BUFFERED_EVENTS:]
+            raise
+        return len(events)
+
+
+buffer = AuditBuffer()
+
+
+def flush_on_exit():
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception("Не удалось записать журнал аудита при завершении процесса")
+
+
+atexit.register(flush_on_exit)
+
+
+def json_value(value):
+    if isinstance(value, (datetime.date, datetime.time, datetime.datetime)):
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def field_values(model, source):
+    """
+    Значения редактируемых полей объекта (или словаря values()) в виде,
+    пригодном для JSON; для файлов - имя файла
+    """
+    values = {}
+    for field in model._meta.concrete_fields:
+        if field.primary_key or not field.editable:
+            continue
+        value = source.get(field.attname) if isinstance(source, dict) else getattr(source, field.attname)
+        values[field.name] = stored_value(field, value)
+    return values
+
+
+def stored_value(field, value):
+    if isinstance(field, FileField):
+        value = getattr(value, 'name', value) or ''
+    return json_value(value)
+
+
+def record(action, instance, changes=None, request=None):
+    """
+    Добавляет событие в буфер (в веб-воркерах) или записывает его
+    после фиксации текущей транзакции
+    """
+    now = timezone.now()
+    event = AuditEvent(
+        occurred_at=now,
+        period=now.year * 100 + now.month,
+        action=action,
+        model_name=type(instance).__name__,
+        object_id=instance.pk,
+        object_repr=str(instance)[:200],
+        changes=changes or {},
+        **request_fields(request if request is not None else _request.get()),
+    )
+    if os.environ.get(AUDIT_BUFFER_ENV) == '1':
+        transaction.on_commit(lambda: buffer.add(event))
+    else:
+        transaction.on_commit(lambda: AuditEvent.objects.bulk_create([event]))
+
+
+def record_view(request, instance, what):
+    """
+    Записывает просмотр чувствительных данных (скан паспорта и т.п.)
+    """
+    record('view', instance, {'view': what}, request=request)
+
+
+def repr_fields(model):
+    return REPR_FIELDS.get(model, ())
+
+
+def record_bulk_update(objects, old_values, fields, request=None):
+    """
+    Записывает изменения объектов, сохранённых через bulk_update: массовые
+    изменения не отправляют post_save, поэтому событие создаётся явно
+
+    Args:
+        objects (list): Объекты с новыми значениями (поля repr_fields загружены)
+        old_values (dict): Прежние значения {pk: {имя поля: значение}}
+        fields (list): Имена изменённых полей
+        request: Запрос (по умолчанию - текущий)
+    """
+    if not objects or type(objects[0]) not in AUDITED_MODELS:
+        return
+    model_fields = [type(objects[0])._meta.get_field(name) for name in fields]
+    for obj in objects:
+        old = old_values.get(obj.pk, {})
+        changes = {}
+        for field in model_fields:
+            before = stored_value(field, old.get(field.name))
+            after = stored_value(field, getattr(obj, field.attname))
+            if before != after:
+                changes[field.name] = [before, after]
+        if changes:
+            record('update', obj, changes, request=request)
+
+
+def remember_old_values(sender, instance, raw=False, **kwargs):
+    instance._audit_old_values = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    row = sender._base_manager.filter(pk=instance.pk).values(
+        *[field.attname for field in sender._meta.concrete_fields]
+    ).first()
+    if row is not None:
+        instance._audit_old_values = field_values(sender, row)
+
+
+def object_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_values = field_values(sender, instance)
+    old_values = getattr(instance, '_audit_old_values', None)
+    if created or old_values is None:
+        record('create', instance, {name: [None, value] for name, value in new_values.items()})
+        return
+    changes = {
+        name: [old_values.get(name), value]
+        for name, value in new_values.items()
+        if old_values.get(name) != value
+    }
+    if changes:
+        record('update', instance, changes)
+
+
+def object_deleted(sender, instance, **kwargs):
+    record('delete', instance, {name: [value, None] for name, value in field_values(sender, instance).items()})
+
+
+def connect_signals():
+    for model in AUDITED_MODELS:
+        pre_save.connect(remember_old_values, sender=model, dispatch_uid=f'main.audit_pre_save_{model.__name__}')
+        post_save.connect(object_saved, sender=model, dispatch_uid=f'main.audit_save_{model.__name__}')
+        post_delete.connect(object_deleted, sender=model, dispatch_uid=f'main.audit_delete_{model.__name__}')
+
+
+def rotate_audit_log(keep_months=12, chunk_size=5000, today=None, log=None):
+    """
+    Переносит события старых месяцев из таблицы в сжатые файлы хранилища
+
+    Каждый месяц сохраняется в archive/audit/ГГГГ-ММ.jsonl.gz (по событию
+    в строке) и только после этого удаляется из таблицы.
+
+    Args:
+        keep_months (int): Сколько последних месяцев оставить в таблице
+        chunk_size (int): Размер пачки при чтении и удалении
+        today (date): Текущая дата (по умолчанию сегодня)
+        log: Функция для вывода прогресса
+
+    Returns:
+        dict: Период ГГГГММ -> (имя файла, количество событий)
+    """
+    log = log or (lambda message: None)
+    today = today or timezone.localdate()
+    months = today.year * 12 + today.month - 1 - keep_months
+    cutoff = (months // 12) * 100 + months % 12 + 1
+
+    rotated = {}
+    periods = AuditEvent.objects.filter(period__lte=cutoff).order_by().values_list('period', flat=True).distinct()
+    for period in sorted(periods):
+        queryset = AuditEvent.objects.filter(period=period).order_by('pk')
+        count = 0
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+            with gzip.GzipFile(fileobj=spool, mode='wb') as output:
+                last_pk = 0
+                while True:
+                    chunk = list(queryset.filter(pk__gt=last_pk).values()[:chunk_size])
+                    if not chunk:
+                        break
+                    for row in chunk:
+                        row['occurred_at'] = row['occurred_at'].isoformat()
+                        output.write(json.dumps(row, ensure_ascii=False).encode('utf-8') + b'\n')
+                    count += len(chunk)
+                    last_pk = chunk[-1]['id']
+            spool.seek(0)
+            name = default_storage.save(
+                f'{AUDIT_ARCHIVE_DIR}/{period // 100}-{period % 100:02d}.jsonl.gz',
+                File(spool, name=f'{period}.jsonl.gz'),
+            )
+
+        # Удаляем пачками по pk, чтобы не держать длинную блокировку
+        while True:
+            pks = list(queryset.filter(pk__lte=last_pk).values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+            AuditEvent.objects.filter(pk__in=pks).purge()
+        rotated[period] = (name, count)
+        log(f"{period}: {count} -> {name}")
+    return rotated
@@ -0,0 +1,132 @@
+# students/auth_cache.py
+import uuid
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import router
+from django.utils.crypto import constant_time_compare
+
+# Снимок пользователя хранится в общем для воркеров кэше (Redis/Memcached),
+# чтобы сброс после изменения прав был виден всем процессам
+# (settings.AUTH_SNAPSHOT_CACHE, None - без снимков)
+DEFAULT_SNAPSHOT_CACHE = None
+DEFAULT_SNAPSHOT_TIMEOUT = 300
+
+# Поколение снимков: меняется при массовых изменениях пользователей, групп
+# и прав, после чего все ранее сохранённые снимки считаются устаревшими
+GENERATION_KEY = 'auth-snapshot:generation'
+
+# Поля пользователя, попадающие в снимок (пароль и личные данные - нет)
+SNAPSHOT_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+
+def snapshot_key(user_id):
+    return f'auth-snapshot:{user_id}'
+
+
+def cache_alias():
+    return getattr(settings, 'AUTH_SNAPSHOT_CACHE', DEFAULT_SNAPSHOT_CACHE)
+
+
+def get_cache():
+    return caches[cache_alias()]
+
+
+def make_snapshot(user, generation):
+    """
+    Собирает снимок пользователя: флаги, хэш сессии и вычисленные права
+
+    Returns:
+        dict: Снимок для кэша
+    """
+    return {
+        'fields': {name: getattr(user, name) for name in SNAPSHOT_FIELDS},
+        'session_hash': user.get_session_auth_hash(),
+        'user_permissions': sorted(user.get_user_permissions()),
+        'group_permissions': sorted(user.get_group_permissions()),
+        'generation': generation,
+    }
+
+
+def user_from_snapshot(snapshot):
+    """
+    Восстанавливает пользователя из снимка
+
+    Остальные поля (в том числе пароль) остаются отложенными: при обращении
+    они загружаются из БД, а save() записывает только поля снимка.
+    Права подставляются в кэш ModelBackend, поэтому has_perm не обращается к БД.
+    """
+    user_model = get_user_model()
+    fields = snapshot['fields']
+    names = [field.attname for field in user_model._meta.concrete_fields if field.attname in fields]
+    db = router.db_for_read(user_model)
+    user = user_model.from_db(db, names, [fields[name] for name in names])
+    user._user_perm_cache = set(snapshot['user_permissions'])
+    user._group_perm_cache = set(snapshot['group_permissions'])
+    user._perm_cache = user._user_perm_cache | user._group_perm_cache
+    return user
+
+
+def get_user(request):
+    """
+    Возвращает пользователя сессии без запроса к БД, если есть свежий снимок
+
+    Снимок - id, флаги is_active / is_staff / is_superuser и набор прав
+    пользователя; он проверяется по хэшу сессии так же, как это делает
+    django.contrib.auth, и сбрасывается при сохранении или удалении
+    пользователя и при массовых изменениях (invalidate_all).
+
+    Args:
+        request: HttpRequest с подключённой сессией
+
+    Returns:
+        User или AnonymousUser
+    """
+    if cache_alias() is None:
+        return auth.get_user(request)
+
+    session = request.session
+    user_id = session.get(SESSION_KEY)
+    if user_id is None or session.get(BACKEND_SESSION_KEY) not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    cache = get_cache()
+    key = snapshot_key(user_id)
+    # Снимок и текущее поколение читаются за одно обращение к кэшу
+    values = cache.get_many([key, GENERATION_KEY])
+    generation = values.get(GENERATION_KEY, '')
+    snapshot = values.get(key)
+    if snapshot is not None and snapshot['generation'] == generation:
+        session_hash = session.get(HASH_SESSION_KEY)
+        if session_hash and constant_time_compare(session_hash, snapshot['session_hash']):
+            user = user_from_snapshot(snapshot)
+            user.backend = session[BACKEND_SESSION_KEY]
+            return user
+
+    # Снимка нет или хэш не совпал: полная проверка через django.contrib.auth
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        timeout = getattr(settings, 'AUTH_SNAPSHOT_TIMEOUT', DEFAULT_SNAPSHOT_TIMEOUT)
+        cache.set(snapshot_key(user.pk), make_snapshot(user, generation), timeout)
+    return user
+
+
+def invalidate_user(sender, instance, **kwargs):
+    """
+    Сбрасывает снимок пользователя (обработчик post_save / post_delete)
+    """
+    if cache_alias() is not None:
+        get_cache().delete(snapshot_key(instance.pk))
+
+
+def invalidate_all(*args, **kwargs):
+    """
+    Делает устаревшими все снимки (обработчик m2m_changed групп и прав)
+
+    update() и bulk_update() по пользователям не отправляют post_save:
+    код, меняющий пользователей массово, вызывает invalidate_all() сам.
+    """
+    if cache_alias() is not None:
+        get_cache().set(GENERATION_KEY, uuid.uuid4().hex, None)
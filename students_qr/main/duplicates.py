@@ -0,0 +1,361 @@
+# students/duplicates.py
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+# Порог, начиная с которого пара студентов считается вероятным дубликатом
+DEFAULT_THRESHOLD = 0.75
+
+# Блоки крупнее этого размера не сравниваются попарно (защита от квадратичного роста)
+MAX_BLOCK_SIZE = 200
+
+# Огласовки (харакаты), танвины, шадда, сукун и надстрочный алиф
+ARABIC_DIACRITICS_RE = re.compile(r'[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]')
+ARABIC_TATWEEL = '\u0640'
+ARABIC_LETTER_MAP = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ى': 'ي',
+    'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+})
+
+# Варианты транслитерации арабских имён на английский, приводимые к одному виду
+ENGLISH_DIGRAPHS = [
+    ('ph', 'f'),
+    ('kh', 'k'),
+    ('gh', 'g'),
+    ('dh', 'd'),
+    ('th', 't'),
+    ('sh', 's'),
+    ('ck', 'k'),
+    ('ou', 'u'),
+    ('oo', 'u'),
+    ('ee', 'i'),
+]
+ENGLISH_LETTER_MAP = str.maketrans({
+    'q': 'k',
+    'c': 'k',
+    'z': 's',
+    'j': 'g',
+    'y': 'i',
+    'w': 'u',
+})
+ENGLISH_PARTICLES = {'al', 'el'}
+VOWELS = set('aeiou')
+
+
+def normalize_arabic_name(name):
+    """
+    Нормализует ФИО на арабском для сравнения
+
+    Убирает огласовки и татвиль, приводит варианты алифа, йа и та марбуты
+    к одной форме, сортирует слова имени.
+
+    Args:
+        name (str): ФИО на арабском
+
+    Returns:
+        str: Нормализованный ключ (пустая строка, если букв нет)
+    """
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKC', name)
+    name = ARABIC_DIACRITICS_RE.sub('', name).replace(ARABIC_TATWEEL, '')
+    name = name.translate(ARABIC_LETTER_MAP)
+    words = re.findall(r'[\u0621-\u064A]+', name)
+    return ' '.join(sorted(words))
+
+
+def _phonetic_word(word):
+    for src, dst in ENGLISH_DIGRAPHS:
+        word = word.replace(src, dst)
+    word = word.translate(ENGLISH_LETTER_MAP)
+    if not word:
+        return ''
+    # Первая буква сохраняется, гласные внутри слова отбрасываются
+    key = word[0] + ''.join(ch for ch in word[1:] if ch not in VOWELS and ch != 'h')
+    # Удвоенные буквы схлопываются: Mohammed -> mhmd
+    return re.sub(r'(.)\1+', r'\1', key)
+
+
+def english_phonetic_key(name):
+    """
+    Строит фонетический ключ ФИО на английском
+
+    Разные транслитерации одного арабского имени (Mohamed / Muhammad,
+    Youssef / Yusuf) дают одинаковый ключ.
+
+    Args:
+        name (str): ФИО на английском
+
+    Returns:
+        str: Фонетический ключ (пустая строка, если букв нет)
+    """
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(ch for ch in name if not unicodedata.combining(ch)).lower()
+    words = [w for w in re.findall(r'[a-z]+', name) if w not in ENGLISH_PARTICLES]
+    keys = [_phonetic_word(w) for w in words]
+    return ' '.join(sorted(k for k in keys if k))
+
+
+def blocking_keys(arabic_key, english_key, birth_date):
+    """
+    Возвращает ключи блоков, в которые попадает студент
+
+    Сравниваются только студенты, имеющие хотя бы один общий блок.
+
+    Args:
+        arabic_key (str): Нормализованное ФИО на арабском
+        english_key (str): Фонетический ключ ФИО на английском
+        birth_date (date): Дата рождения
+
+    Returns:
+        list: Список ключей блоков
+    """
+    keys = []
+    if arabic_key:
+        keys.append(('ar', arabic_key))
+    if english_key:
+        keys.append(('en', english_key))
+    if birth_date:
+        keys.append(('bd', birth_date))
+    return keys
+
+
+def birth_date_similarity(first, second):
+    """
+    Сходство дат рождения с учётом типичных опечаток
+
+    Совпадение - 1; переставленные день и месяц или ошибка в одной
+    из трёх частей даты - 0.5; иначе 0.
+    """
+    if not first or not second:
+        return 0.0
+    if first == second:
+        return 1.0
+    if (first.day, first.month, first.year) == (second.month, second.day, second.year):
+        return 0.5
+    same_parts = (first.day == second.day) + (first.month == second.month) + (first.year == second.year)
+    return 0.5 if same_parts == 2 else 0.0
+
+
+def similarity(first, second):
+    """
+    Оценивает сходство двух записей студентов
+
+    Совпадения ФИО на обоих языках достаточно, чтобы пара прошла порог
+    даже при опечатке в дате рождения.
+
+    Args:
+        first (dict): Запись с ключами arabic_key, english_key, birth_date
+        second (dict): Запись с теми же ключами
+
+    Returns:
+        float: Оценка от 0 до 1
+    """
+    def ratio(a, b):
+        if not a or not b:
+            return 0.0
+        if a == b:
+            return 1.0
+        return SequenceMatcher(None, a, b).ratio()
+
+    score = 0.45 * ratio(first['arabic_key'], second['arabic_key'])
+    score += 0.35 * ratio(first['english_key'], second['english_key'])
+    score += 0.2 * birth_date_similarity(first['birth_date'], second['birth_date'])
+    return score
+
+
+def _record(key, full_name_arabic, full_name_english, birth_date):
+    return {
+        'key': key,
+        'arabic_key': normalize_arabic_name(full_name_arabic),
+        'english_key': english_phonetic_key(full_name_english),
+        'birth_date': birth_date,
+    }
+
+
+def _block_condition(record):
+    from django.db.models import Q
+
+    condition = Q()
+    for kind, value in blocking_keys(record['arabic_key'], record['english_key'], record['birth_date']):
+        if kind == 'ar':
+            condition |= Q(arabic_name_key=value)
+        elif kind == 'en':
+            condition |= Q(english_name_key=value)
+        else:
+            condition |= Q(birth_date=value)
+    return condition
+
+
+def _block_order(record):
+    # Сначала совпавшие по имени, затем только по дате рождения;
+    # pk делает выбор первых MAX_BLOCK_SIZE записей воспроизводимым
+    from django.db.models import Case, IntegerField, Value, When
+
+    return Case(
+        When(arabic_name_key=record['arabic_key'], then=Value(0)),
+        When(english_name_key=record['english_key'], then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+
+
+def find_duplicate_candidates(full_name_arabic, full_name_english, birth_date,
+                              exclude_pk=None, threshold=DEFAULT_THRESHOLD):
+    """
+    Ищет в базе вероятные дубликаты для одной записи
+
+    Используется при валидации формы: кандидаты выбираются по индексированным
+    ключам блоков среди студентов и архивных студентов.
+
+    Args:
+        full_name_arabic (str): ФИО на арабском
+        full_name_english (str): ФИО на английском
+        birth_date (date): Дата рождения
+        exclude_pk (int): ID студента, который не нужно учитывать (при редактировании)
+        threshold (float): Минимальная оценка сходства
+
+    Returns:
+        list: Пары (студент или архивный студент, оценка), отсортированные по убыванию оценки
+    """
+    from .models import ArchivedStudent, Student
+
+    record = _record(exclude_pk, full_name_arabic, full_name_english, birth_date)
+    condition = _block_condition(record)
+    if not condition:
+        return []
+
+    candidates = Student.objects.filter(condition)
+    if exclude_pk:
+        candidates = candidates.exclude(pk=exclude_pk)
+    candidates = candidates.annotate(block_order=_block_order(record)).order_by('block_order', 'pk')
+    archived = ArchivedStudent.objects.filter(condition).annotate(
+        block_order=_block_order(record)
+    ).order_by('block_order', 'pk')
+
+    matches = []
+    for student in list(candidates[:MAX_BLOCK_SIZE]) + list(archived[:MAX_BLOCK_SIZE]):
+        other = _record(student.pk, student.full_name_arabic, student.full_name_english, student.birth_date)
+        score = similarity(record, other)
+        if score >= threshold:
+            matches.append((student, score))
+    matches.sort(key=lambda match: match[1], reverse=True)
+    return matches
+
+
+def split_block(block_key, members, records):
+    """
+    Делит слишком крупный блок по вторичному ключу
+
+    Блоки по имени делятся по году рождения, блоки по дате рождения -
+    по первой букве фонетического ключа имени.
+
+    Returns:
+        list: Списки ключей записей
+    """
+    if block_key[0] == 'bd':
+        def secondary(record):
+            return record['english_key'][:1] or record['arabic_key'][:1]
+    else:
+        def secondary(record):
+            return record['birth_date'].year if record['birth_date'] else None
+    parts = defaultdict(list)
+    for key in members:
+        parts[secondary(records[key])].append(key)
+    return list(parts.values())
+
+
+def find_duplicate_groups(queryset=None, threshold=DEFAULT_THRESHOLD, include_archived=True):
+    """
+    Находит группы вероятных дубликатов во всём реестре
+
+    Реестр читается одним проходом, записи раскладываются по блокам,
+    попарно сравниваются только записи внутри блока. Блоки крупнее
+    MAX_BLOCK_SIZE делятся по вторичному ключу; то, что и после этого
+    слишком велико, не сравнивается и возвращается отдельным списком.
+
+    Args:
+        queryset: QuerySet студентов (по умолчанию все студенты)
+        threshold (float): Минимальная оценка сходства
+        include_archived (bool): Сравнивать также с архивными студентами
+
+    Returns:
+        tuple: Группы вида {'ids': [...], 'archived_ids': [...], 'pairs': [(ключ1, ключ2, оценка), ...]},
+            где ключ - ('student', id) или ('archived', id), и пропущенные блоки (вид, значение, размер)
+    """
+    from .models import ArchivedStudent, Student
+
+    if queryset is None:
+        queryset = Student.objects.all()
+    sources = [('student', queryset)]
+    if include_archived:
+        sources.append(('archived', ArchivedStudent.objects.all()))
+
+    records = {}
+    blocks = defaultdict(list)
+    for source, source_queryset in sources:
+        rows = source_queryset.values_list('pk', 'full_name_arabic', 'full_name_english', 'birth_date')
+        for pk, full_name_arabic, full_name_english, birth_date in rows.iterator(chunk_size=2000):
+            record = _record((source, pk), full_name_arabic, full_name_english, birth_date)
+            records[record['key']] = record
+            for block_key in blocking_keys(record['arabic_key'], record['english_key'], record['birth_date']):
+                blocks[block_key].append(record['key'])
+
+    # Объединение найденных пар в группы (система непересекающихся множеств)
+    parent = {}
+
+    def find(key):
+        while parent.get(key, key) != key:
+            key = parent[key]
+        return key
+
+    compared = set()
+    pairs = []
+    skipped = []
+    for block_key, members in blocks.items():
+        if len(members) < 2:
+            continue
+        parts = [members] if len(members) <= MAX_BLOCK_SIZE else split_block(block_key, members, records)
+        for part in parts:
+            if len(part) > MAX_BLOCK_SIZE:
+                skipped.append((block_key[0], block_key[1], len(part)))
+                continue
+            for i, first in enumerate(part):
+                for second in part[i + 1:]:
+                    pair = (first, second) if first < second else (second, first)
+                    if pair in compared:
+                        continue
+                    compared.add(pair)
+                    score = similarity(records[first], records[second])
+                    if score >= threshold:
+                        pairs.append((pair[0], pair[1], score))
+                        root_a, root_b = find(first), find(second)
+                        if root_a != root_b:
+                            parent[root_b] = root_a
+
+    groups = defaultdict(lambda: {'keys': set(), 'pairs': []})
+    for first, second, score in pairs:
+        group = groups[find(first)]
+        group['keys'].update((first, second))
+        group['pairs'].append((first, second, score))
+
+    result = []
+    for group in groups.values():
+        # Пары только из архивных студентов не интересны: их уже нельзя объединить
+        if not any(source == 'student' for source, pk in group['keys']):
+            continue
+        result.append({
+            'ids': sorted(pk for source, pk in group['keys'] if source == 'student'),
+            'archived_ids': sorted(pk for source, pk in group['keys'] if source == 'archived'),
+            'pairs': group['pairs'],
+        })
+    return result, skipped
@@ -0,0 +1,173 @@
+# students/expiry.py
+import time
+from django.db import transaction
+from django.utils import timezone
+from . import audit
+from .models import Certificate, Student, StatusChangeRecord
+
+DEFAULT_CHUNK_SIZE = 500
+
+# Статусы, при которых прошедшая дата окончания требует проверки
+OVERDUE_STATUSES = ('studying',)
+
+
+def chunked_queryset(queryset, chunk_size):
+    """
+    Перебирает QuerySet пачками по первичному ключу (без OFFSET)
+    """
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def expired_certificates(today):
+    """
+    Справки, срок действия которых истёк, но которые ещё не помечены
+
+    Args:
+        today (date): Дата, на которую проверяется срок действия
+
+    Returns:
+        QuerySet: Справки с истёкшим сроком
+    """
+    return Certificate.objects.filter(
+        is_expired=False,
+        certificate_validity_period__lt=today,
+    ).only('pk', 'is_expired', 'certificate_validity_period', *audit.repr_fields(Certificate))
+
+
+def overdue_students(today):
+    """
+    Студенты, у которых прошла предполагаемая дата окончания, а статус не изменился
+
+    Args:
+        today (date): Дата, на которую проверяется окончание
+
+    Returns:
+        QuerySet: Студенты, ещё не отмеченные для проверки
+    """
+    return Student.objects.filter(
+        current_status__in=OVERDUE_STATUSES,
+        expected_end_date__lt=today,
+        is_overdue=False,
+    ).only('pk', 'current_status', 'expected_end_date', 'is_overdue', *audit.repr_fields(Student))
+
+
+def sweep_certificates(today, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Помечает справки с истёкшим сроком действия
+
+    Args:
+        today (date): Дата, на которую проверяется срок действия
+        dry_run (bool): Только подсчитать, ничего не изменяя
+        chunk_size (int): Размер пачки для bulk_update
+
+    Returns:
+        int: Количество справок с истёкшим сроком
+    """
+    changed = 0
+    queryset = expired_certificates(today)
+    for chunk in chunked_queryset(queryset, chunk_size):
+        changed += len(chunk)
+        if dry_run:
+            continue
+        records = []
+        for certificate in chunk:
+            certificate.is_expired = True
+            records.append(StatusChangeRecord(
+                model_name='Certificate',
+                object_id=certificate.pk,
+                field_name='is_expired',
+                old_value='False',
+                new_value='True',
+                reason=f"Срок действия до {certificate.certificate_validity_period:%d.%m.%Y}",
+            ))
+        with transaction.atomic():
+            Certificate.objects.bulk_update(chunk, ['is_expired'])
+            StatusChangeRecord.objects.bulk_create(records)
+            audit.record_bulk_update(chunk, {certificate.pk: {'is_expired': False} for certificate in chunk}, ['is_expired'])
+    return changed
+
+
+def sweep_students(today, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Отмечает для проверки студентов с прошедшей датой окончания
+
+    Статус не меняется и дата фактического окончания не заполняется:
+    выпуск подтверждает сотрудник. Отметки студентов, статус или срок
+    которых уже исправили, снимаются.
+
+    Args:
+        today (date): Дата, на которую проверяется окончание
+        dry_run (bool): Только подсчитать, ничего не изменяя
+        chunk_size (int): Размер пачки для bulk_update
+
+    Returns:
+        int: Количество отмеченных студентов
+    """
+    changed = 0
+    queryset = overdue_students(today)
+    if dry_run:
+        return queryset.count()
+
+    # Снятие отметок тоже пачками через bulk_update, чтобы изменения попали в журнал аудита
+    stale = Student.objects.filter(is_overdue=True).exclude(
+        current_status__in=OVERDUE_STATUSES,
+        expected_end_date__lt=today,
+    ).only('pk', 'is_overdue', *audit.repr_fields(Student))
+    for chunk in chunked_queryset(stale, chunk_size):
+        for student in chunk:
+            student.is_overdue = False
+        with transaction.atomic():
+            Student.objects.bulk_update(chunk, ['is_overdue'])
+            audit.record_bulk_update(chunk, {student.pk: {'is_overdue': True} for student in chunk}, ['is_overdue'])
+
+    # После обновления студенты выпадают из выборки, поэтому пачки берутся по pk
+    for chunk in chunked_queryset(queryset, chunk_size):
+        records = []
+        for student in chunk:
+            student.is_overdue = True
+            records.append(StatusChangeRecord(
+                model_name='Student',
+                object_id=student.pk,
+                field_name='is_overdue',
+                old_value='False',
+                new_value='True',
+                reason=f"Предполагаемая дата окончания {student.expected_end_date:%d.%m.%Y}",
+            ))
+        with transaction.atomic():
+            Student.objects.bulk_update(chunk, ['is_overdue'])
+            StatusChangeRecord.objects.bulk_create(records)
+            audit.record_bulk_update(chunk, {student.pk: {'is_overdue': False} for student in chunk}, ['is_overdue'])
+        changed += len(chunk)
+    return changed
+
+
+def run_sweep(today=None, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Выполняет полную проверку сроков: справки и статусы студентов
+
+    Args:
+        today (date): Дата проверки (по умолчанию текущая)
+        dry_run (bool): Только подсчитать, ничего не изменяя
+        chunk_size (int): Размер пачки для bulk_update
+
+    Returns:
+        dict: Количество изменений и затраченное время по каждому этапу
+    """
+    if today is None:
+        today = timezone.localdate()
+
+    result = {}
+    for name, sweep in (('certificates', sweep_certificates), ('students', sweep_students)):
+        started = time.perf_counter()
+        count = sweep(today, dry_run=dry_run, chunk_size=chunk_size)
+        result[name] = {
+            'count': count,
+            'seconds': time.perf_counter() - started,
+        }
+    return result
@@ -1,7 +1,9 @@
 # students/forms.py
+import zipfile
 from django import forms
-from .models import Student, Certificate, Diploma, PaymentReceipt, StudentUniversity
+from .models import Student, Certificate, Diploma, PaymentReceipt, StudentUniversity, ArchivedStudent
 from django.forms import inlineformset_factory
+from .duplicates import find_duplicate_candidates
 
 
 class CertificateForm(forms.ModelForm):
@@ -48,6 +50,11 @@ class CertificateForm(forms.ModelForm):
             'certificate_scan': 'Скан справки'
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Пустой номер присваивается автоматически при сохранении
+        self.fields['certificate_number'].required = False
+
 class DiplomaForm(forms.ModelForm):
     class Meta:
         model = Diploma
@@ -82,6 +89,12 @@ class DiplomaForm(forms.ModelForm):
             'diploma_scan': 'Скан диплома'
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Пустые номера присваиваются автоматически при сохранении
+        self.fields['diploma_number'].required = False
+        self.fields['registration_number'].required = False
+
 class PaymentReceiptForm(forms.ModelForm):
     class Meta:
         model = PaymentReceipt
@@ -96,7 +109,27 @@ class PaymentReceiptForm(forms.ModelForm):
         }
 
 
+class ReceiptArchiveForm(forms.Form):
+    archive = forms.FileField(
+        label='ZIP-архив с чеками',
+        widget=forms.ClearableFileInput(attrs={'accept': '.zip,application/zip'}),
+        help_text='Файлы в архиве должны называться по номеру паспорта студента, например A1234567.pdf',
+    )
+
+    def clean_archive(self):
+        archive = self.cleaned_data['archive']
+        if not zipfile.is_zipfile(archive):
+            raise forms.ValidationError('Файл не является ZIP-архивом')
+        archive.seek(0)
+        return archive
+
+
 class StudentForm(forms.ModelForm):
+    confirm_not_duplicate = forms.BooleanField(
+        required=False,
+        label='Это другой человек, сохранить несмотря на совпадения'
+    )
+
     class Meta:
         model = Student
         fields = [
@@ -144,6 +177,44 @@ class StudentForm(forms.ModelForm):
             'passport_scan': 'Скан паспорта *',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.duplicate_candidates = []
+
+    def clean_passport_number(self):
+        passport_number = self.cleaned_data['passport_number']
+        if ArchivedStudent.objects.filter(passport_number=passport_number).exists():
+            raise forms.ValidationError(
+                "Студент с таким номером паспорта находится в архиве. "
+                "Откройте его карточку или восстановите его из архива."
+            )
+        return passport_number
+
+    def clean(self):
+        cleaned_data = super().clean()
+        full_name_arabic = cleaned_data.get('full_name_arabic')
+        full_name_english = cleaned_data.get('full_name_english')
+        birth_date = cleaned_data.get('birth_date')
+
+        if full_name_arabic or full_name_english:
+            self.duplicate_candidates = find_duplicate_candidates(
+                full_name_arabic,
+                full_name_english,
+                birth_date,
+                exclude_pk=self.instance.pk,
+            )
+
+        if self.duplicate_candidates and not cleaned_data.get('confirm_not_duplicate'):
+            names = ', '.join(
+                f"{student} (в архиве)" if isinstance(student, ArchivedStudent) else str(student)
+                for student, score in self.duplicate_candidates[:5]
+            )
+            raise forms.ValidationError(
+                f"Возможно, студент уже есть в базе: {names}. "
+                f"Проверьте данные или подтвердите, что это другой человек."
+            )
+        return cleaned_data
+
 class StudentUniversityForm(forms.ModelForm):
     class Meta:
         model = StudentUniversity
@@ -0,0 +1,354 @@
+# students/loadtest.py
+import bisect
+import datetime
+import http.cookiejar
+import json
+import math
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+
+# Доли запросов по умолчанию: сканирование QR, просмотр сотрудниками, выдача справок
+DEFAULT_MIX = {
+    'scan': 0.80,
+    'browse': 0.18,
+    'issue': 0.02,
+}
+
+# Параметр распределения Ципфа: популярность документа ~ 1 / rank^s
+DEFAULT_ZIPF_S = 1.1
+
+# Коды ответа, которые считаются успешными для каждого вида запроса.
+# Страницы документов закрыты входом, поэтому сканирование выполняется
+# под сотрудником: редирект на страницу входа означал бы ошибку.
+EXPECTED_STATUSES = {
+    'scan_certificate': {200},
+    'scan_diploma': {200},
+    'student_list': {200},
+    'student_detail': {200},
+    'add_certificate': {302},
+}
+
+# Ответ ограничителя частоты (main/ratelimit.py): считается отдельно от ошибок
+THROTTLED_STATUS = 429
+
+
+def staff_username(prefix, number):
+    """
+    Логин сотрудника виртуального пользователя number (создаёт seed_loadtest)
+
+    У каждого виртуального пользователя своя учётная запись: ограничения
+    частоты по пользователю не складываются для всех потоков.
+    """
+    return f'{prefix}-{number}'
+
+
+class NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """
+    Не следует за редиректами: нужен код ответа самой страницы
+    """
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class ZipfSampler:
+    """
+    Выбор документа с распределением Ципфа (несколько документов сканируют часто)
+    """
+
+    def __init__(self, items, s=DEFAULT_ZIPF_S, seed=None):
+        self.items = list(items)
+        random.Random(seed).shuffle(self.items)
+        total = 0.0
+        self.cumulative = []
+        for rank in range(1, len(self.items) + 1):
+            total += 1.0 / rank ** s
+            self.cumulative.append(total)
+        self.total = total
+
+    def sample(self, rng):
+        index = bisect.bisect_left(self.cumulative, rng.random() * self.total)
+        return self.items[min(index, len(self.items) - 1)]
+
+
+def percentile(values, fraction):
+    """
+    Перцентиль по отсортированному списку (метод ближайшего ранга)
+    """
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+class Client:
+    """
+    HTTP-клиент одного виртуального пользователя (свои cookie и сессия)
+    """
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies),
+            NoRedirectHandler(),
+        )
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, path, data=None, content_type=None):
+        url = self.base_url + path
+        headers = {'Referer': url}
+        if content_type:
+            headers['Content-Type'] = content_type
+        request = urllib.request.Request(url, data=data, headers=headers)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code
+
+    def login(self, username, password):
+        self.request('/login/')
+        data = urllib.parse.urlencode({
+            'username': username,
+            'password': password,
+            'csrfmiddlewaretoken': self.csrf_token(),
+        }).encode()
+        status = self.request('/login/', data, 'application/x-www-form-urlencoded')
+        return status == 302
+
+    def post_multipart(self, path, fields):
+        boundary = uuid.uuid4().hex
+        lines = []
+        for name, value in fields.items():
+            lines.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n')
+        lines.append(f'--{boundary}--\r\n')
+        return self.request(path, ''.join(lines).encode('utf-8'), f'multipart/form-data; boundary={boundary}')
+
+
+def certificate_form_data(csrf_token):
+    today = datetime.date.today()
+    return {
+        'csrfmiddlewaretoken': csrf_token,
+        'certificate_type': 'studying',
+        'certificate_number': f'LT-{uuid.uuid4().hex[:10]}',
+        'issue_date': today.isoformat(),
+        'issuing_institution': 'Load Test University',
+        'major': 'Load testing',
+        'education_level': 'bachelor',
+        'course': '1',
+        'study_form': 'full_time',
+        'study_period_start': (today - datetime.timedelta(days=365)).isoformat(),
+        'study_period_end': (today + datetime.timedelta(days=365)).isoformat(),
+        'purpose': 'other',
+    }
+
+
+class LoadTest:
+    """
+    Нагрузочный тест: виртуальные пользователи в потоках выполняют смесь запросов
+
+    Args:
+        base_url (str): Адрес локального сервера
+        certificates (list): Пары (student_id, certificate_id)
+        diplomas (list): Пары (student_id, diploma_id)
+        student_ids (list): ID студентов для просмотра сотрудниками
+        username (str): Префикс логинов сотрудников (см. staff_username)
+        password (str): Пароль сотрудников
+        mix (dict): Доли видов запросов scan / browse / issue
+        concurrency (int): Количество виртуальных пользователей
+        duration (float): Длительность теста в секундах
+        seed (int): Зерно генератора случайных чисел
+    """
+
+    def __init__(self, base_url, certificates, diplomas, student_ids, username, password,
+                 mix=None, concurrency=10, duration=30, zipf_s=DEFAULT_ZIPF_S, seed=None):
+        self.base_url = base_url
+        self.documents = ZipfSampler(
+            [('certificate', student_id, pk) for student_id, pk in certificates]
+            + [('diploma', student_id, pk) for student_id, pk in diplomas],
+            s=zipf_s,
+            seed=seed,
+        )
+        self.students = ZipfSampler(student_ids, s=zipf_s, seed=seed)
+        self.username = username
+        self.password = password
+        self.mix = mix or DEFAULT_MIX
+        self.concurrency = concurrency
+        self.duration = duration
+        self.seed = seed
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.throttled = defaultdict(int)
+        self.failures = []
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, started, status):
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples[endpoint].append(elapsed)
+            self.statuses[endpoint][status] += 1
+            if status == THROTTLED_STATUS:
+                self.throttled[endpoint] += 1
+            elif status not in EXPECTED_STATUSES[endpoint]:
+                self.errors[endpoint] += 1
+
+    def call(self, endpoint, func, *args):
+        started = time.perf_counter()
+        try:
+            status = func(*args)
+        except Exception as error:
+            status = type(error).__name__
+        self.record(endpoint, started, status)
+
+    def worker(self, number, deadline):
+        rng = random.Random(None if self.seed is None else self.seed + number)
+        kinds = list(self.mix)
+        weights = [self.mix[kind] for kind in kinds]
+        staff = Client(self.base_url)
+        username = staff_username(self.username, number)
+        if not staff.login(username, self.password):
+            raise RuntimeError(
+                f'Не удалось войти под сотрудником {username}: проверьте --username / --password '
+                f'и создайте не меньше {self.concurrency} сотрудников (seed_loadtest --users)'
+            )
+
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            if kind == 'scan':
+                document_type, student_id, pk = self.documents.sample(rng)
+                self.call(
+                    f'scan_{document_type}',
+                    staff.request,
+                    f'/student/{student_id}/{document_type}/{pk}/',
+                )
+                continue
+
+            student_id = self.students.sample(rng)
+            if kind == 'browse':
+                if rng.random() < 0.3:
+                    self.call('student_list', staff.request, '/')
+                else:
+                    self.call('student_detail', staff.request, f'/student/{student_id}/')
+            else:
+                path = f'/student/{student_id}/add-certificate/'
+                staff.request(path)
+                self.call('add_certificate', staff.post_multipart, path, certificate_form_data(staff.csrf_token()))
+
+    def run(self):
+        """
+        Запускает тест и возвращает отчёт
+
+        Исключения виртуальных пользователей не теряются: они попадают в
+        отчёт (worker_failures), а если упали все потоки - тест прерывается.
+
+        Returns:
+            dict: Сводка по каждому виду запроса и в целом
+        """
+        started = time.perf_counter()
+        deadline = started + self.duration
+
+        def target(number):
+            try:
+                self.worker(number, deadline)
+            except Exception as error:
+                with self.lock:
+                    self.failures.append(f"Поток {number}: {type(error).__name__}: {error}")
+
+        threads = [threading.Thread(target=target, args=(number,)) for number in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if len(self.failures) == self.concurrency:
+            raise RuntimeError(self.failures[0])
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        endpoints = {}
+        total = 0
+        total_errors = 0
+        total_throttled = 0
+        for endpoint, samples in sorted(self.samples.items()):
+            samples.sort()
+            total += len(samples)
+            total_errors += self.errors[endpoint]
+            total_throttled += self.throttled[endpoint]
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'throughput_rps': len(samples) / elapsed,
+                'p50_ms': percentile(samples, 0.50) * 1000,
+                'p95_ms': percentile(samples, 0.95) * 1000,
+                'p99_ms': percentile(samples, 0.99) * 1000,
+                'mean_ms': statistics.fmean(samples) * 1000,
+                'error_rate': self.errors[endpoint] / len(samples),
+                'throttled_rate': self.throttled[endpoint] / len(samples),
+                'statuses': {str(status): count for status, count in self.statuses[endpoint].items()},
+            }
+        return {
+            'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'base_url': self.base_url,
+            'duration_s': elapsed,
+            'concurrency': self.concurrency,
+            'mix': self.mix,
+            'total_requests': total,
+            'throughput_rps': total / elapsed if elapsed else 0,
+            'error_rate': total_errors / total if total else 0,
+            'throttled_rate': total_throttled / total if total else 0,
+            'worker_failures': list(self.failures),
+            'note': (
+                "Часть запросов отклонена ограничителем частоты (429): задержки и пропускная "
+                "способность относятся к ограничителю. Запустите сервер с RATE_LIMITS_ENABLED=False."
+                if total_throttled else ''
+            ),
+            'endpoints': endpoints,
+        }
+
+
+def compare_reports(current, baseline):
+    """
+    Сравнивает отчёт с сохранённым ранее
+
+    Returns:
+        dict: endpoint -> {метрика: (было, стало, изменение в %)}
+    """
+    result = {}
+    for endpoint, stats in current['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(endpoint)
+        if not previous:
+            continue
+        result[endpoint] = {}
+        for metric in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'error_rate', 'throttled_rate'):
+            if metric not in previous:
+                continue
+            before, after = previous[metric], stats[metric]
+            change = (after - before) / before * 100 if before else None
+            result[endpoint][metric] = (before, after, change)
+    return result
+
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
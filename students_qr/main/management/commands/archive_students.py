@@ -0,0 +1,50 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from main.archive import DEFAULT_CHUNK_SIZE, archive_students
+
+
+class Command(BaseCommand):
+    help = 'Переносит выпускников и отчисленных студентов с документами и файлами в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать количество студентов для архивации, ничего не перенося',
+        )
+        parser.add_argument(
+            '--date',
+            help='Дата, от которой отсчитывается срок, в формате ГГГГ-ММ-ДД (по умолчанию сегодня)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Максимальное количество студентов за запуск',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Сколько студентов читается из базы за раз',
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Неверная дата: {options['date']}")
+
+        result = archive_students(
+            today=today,
+            limit=options['limit'],
+            dry_run=options['dry_run'],
+            chunk_size=options['chunk_size'],
+            log=self.stdout.write,
+        )
+
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(f"{prefix}Перенесено в архив: {result['archived']}"))
+        if result['failed']:
+            self.stdout.write(self.style.ERROR(f"Ошибок: {result['failed']}"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from main.numbering import NUMBER_CONSTRAINTS, find_duplicate_numbers, renumber_duplicates
+
+
+class Command(BaseCommand):
+    help = (
+        'Ищет справки и дипломы с повторяющимися номерами, из-за которых нельзя добавить '
+        'ограничения уникальности. С --fix первый документ группы сохраняет номер, '
+        'остальные получают новые номера из серии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Перенумеровать повторы')
+
+    def handle(self, *args, **options):
+        total = 0
+        for constraint_name, (model, fields, number_field, number_type) in NUMBER_CONSTRAINTS.items():
+            groups = find_duplicate_numbers(constraint_name)
+            if not groups:
+                continue
+            total += len(groups)
+            self.stdout.write(f"{constraint_name}: групп повторов {len(groups)}")
+            for pks in groups:
+                self.stdout.write(f"  {model._meta.verbose_name_plural} {', '.join(map(str, pks))}")
+            if options['fix']:
+                renumbered = renumber_duplicates(constraint_name, log=lambda message: self.stdout.write(f"  {message}"))
+                self.stdout.write(self.style.SUCCESS(f"  Перенумеровано: {renumbered}"))
+
+        if not total:
+            self.stdout.write(self.style.SUCCESS("Повторяющихся номеров нет"))
+        elif not options['fix']:
+            self.stdout.write(self.style.WARNING("Для перенумерации запустите команду с --fix"))
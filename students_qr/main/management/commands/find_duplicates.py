@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand
+from main.duplicates import (
+    DEFAULT_THRESHOLD,
+    MAX_BLOCK_SIZE,
+    english_phonetic_key,
+    find_duplicate_groups,
+    normalize_arabic_name,
+)
+from main.models import ArchivedStudent, Student
+
+
+class Command(BaseCommand):
+    help = 'Ищет вероятные дубликаты студентов во всём реестре'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help='Минимальная оценка сходства (0..1)',
+        )
+        parser.add_argument(
+            '--rebuild-keys',
+            action='store_true',
+            help='Пересчитать ключи дубликатов для всех студентов перед поиском',
+        )
+        parser.add_argument(
+            '--no-archived',
+            action='store_true',
+            help='Не сравнивать с архивными студентами',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Размер пачки при пересчёте ключей',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild_keys']:
+            self.rebuild_keys(options['chunk_size'])
+
+        groups, skipped = find_duplicate_groups(
+            threshold=options['threshold'],
+            include_archived=not options['no_archived'],
+        )
+        for kind, value, size in skipped:
+            self.stdout.write(self.style.WARNING(
+                f'Блок {kind}={value} не проверен: {size} записей (больше {MAX_BLOCK_SIZE})'
+            ))
+        if not groups:
+            self.stdout.write(self.style.SUCCESS('Вероятных дубликатов не найдено'))
+            return
+
+        students = Student.objects.in_bulk({pk for group in groups for pk in group['ids']})
+        archived = ArchivedStudent.objects.in_bulk({pk for group in groups for pk in group['archived_ids']})
+        people = {('student', pk): student for pk, student in students.items()}
+        people.update({('archived', pk): student for pk, student in archived.items()})
+        for number, group in enumerate(groups, start=1):
+            self.stdout.write(f'Группа {number}:')
+            keys = [('student', pk) for pk in group['ids']] + [('archived', pk) for pk in group['archived_ids']]
+            for key in keys:
+                student = people[key]
+                birth_date = f'{student.birth_date:%d.%m.%Y}' if student.birth_date else '-'
+                self.stdout.write(
+                    f'  {self.label(key)} {student.full_name_english} / {student.full_name_arabic}, '
+                    f'паспорт {student.passport_number}, {birth_date}'
+                )
+            for first, second, score in group['pairs']:
+                self.stdout.write(f'    {self.label(first)} ~ {self.label(second)}: {score:.2f}')
+
+        self.stdout.write(self.style.WARNING(f'Найдено групп: {len(groups)}'))
+
+    @staticmethod
+    def label(key):
+        source, pk = key
+        return f'#{pk} (архив)' if source == 'archived' else f'#{pk}'
+
+    def rebuild_keys(self, chunk_size):
+        batch = []
+        updated = 0
+        for student in Student.objects.only('pk', 'full_name_arabic', 'full_name_english').iterator(chunk_size=chunk_size):
+            student.arabic_name_key = normalize_arabic_name(student.full_name_arabic)
+            student.english_name_key = english_phonetic_key(student.full_name_english)
+            batch.append(student)
+            if len(batch) >= chunk_size:
+                Student.objects.bulk_update(batch, ['arabic_name_key', 'english_name_key'])
+                updated += len(batch)
+                batch = []
+        if batch:
+            Student.objects.bulk_update(batch, ['arabic_name_key', 'english_name_key'])
+            updated += len(batch)
+        self.stdout.write(f'Ключи пересчитаны: {updated}')
@@ -0,0 +1,42 @@
+import zipfile
+from django.core.management.base import BaseCommand, CommandError
+from main.receipts_import import DEFAULT_WORKERS, import_receipts
+
+
+class Command(BaseCommand):
+    help = 'Загружает чеки оплаты из ZIP-архива банка (файлы названы по номеру паспорта)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive', help='Путь к ZIP-архиву')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help='Количество потоков для сохранения файлов',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только сопоставить файлы со студентами, ничего не сохраняя',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            result = import_receipts(
+                options['archive'],
+                workers=options['workers'],
+                dry_run=options['dry_run'],
+                log=self.stdout.write,
+            )
+        except (OSError, zipfile.BadZipFile) as error:
+            raise CommandError(f"Не удалось прочитать архив: {error}")
+
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(
+            f"{prefix}Сопоставлено файлов: {result['matched']} (студентов: {result['students']}), "
+            f"создано чеков: {result['created']} ({result['seconds']:.3f} с)"
+        )
+        if result['unmatched']:
+            self.stdout.write(self.style.WARNING(f"Не загружено файлов: {len(result['unmatched'])}"))
+            for filename, reason in result['unmatched']:
+                self.stdout.write(f"  {filename}: {reason}")
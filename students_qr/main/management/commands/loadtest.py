@@ -0,0 +1,109 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from main.loadtest import (
+    DEFAULT_MIX,
+    DEFAULT_ZIPF_S,
+    LoadTest,
+    compare_reports,
+    load_report,
+    save_report,
+)
+from main.models import Certificate, Diploma, Student
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        kind, _, share = part.partition('=')
+        kind = kind.strip()
+        if kind not in DEFAULT_MIX:
+            raise CommandError(f"Неизвестный вид запросов: {kind} (доступны: {', '.join(DEFAULT_MIX)})")
+        mix[kind] = float(share)
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест локального сервера: сканирование QR-кодов (распределение Ципфа), '
+        'просмотр сотрудниками и выдача справок. Сервер запускается отдельно, '
+        'база заполняется командой seed_loadtest (сотрудник на каждого пользователя). '
+        'Чтобы измерять приложение, а не ограничитель частоты, сервер запускается '
+        'с RATE_LIMITS_ENABLED=False.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Адрес сервера')
+        parser.add_argument('--duration', type=float, default=30, help='Длительность, секунд')
+        parser.add_argument('--concurrency', type=int, default=10, help='Количество виртуальных пользователей')
+        parser.add_argument(
+            '--mix',
+            type=parse_mix,
+            default=DEFAULT_MIX,
+            help='Доли запросов, например scan=0.8,browse=0.18,issue=0.02',
+        )
+        parser.add_argument('--zipf', type=float, default=DEFAULT_ZIPF_S, help='Параметр распределения Ципфа')
+        parser.add_argument('--username', default='loadtest', help='Префикс логинов сотрудников (loadtest-0, loadtest-1, ...)')
+        parser.add_argument('--password', required=True, help='Пароль сотрудников (задаётся в seed_loadtest)')
+        parser.add_argument('--seed', type=int, default=None, help='Зерно генератора случайных чисел')
+        parser.add_argument('--output', help='Сохранить отчёт в JSON-файл')
+        parser.add_argument('--compare', help='Сравнить с сохранённым ранее отчётом')
+
+    def handle(self, *args, **options):
+        certificates = list(Certificate.objects.values_list('student_id', 'id'))
+        diplomas = list(Diploma.objects.values_list('student_id', 'id'))
+        student_ids = list(Student.objects.values_list('id', flat=True))
+        if not (certificates or diplomas) or not student_ids:
+            raise CommandError('В базе нет документов: выполните manage.py seed_loadtest')
+
+        test = LoadTest(
+            options['url'],
+            certificates,
+            diplomas,
+            student_ids,
+            options['username'],
+            options['password'],
+            mix=options['mix'],
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            zipf_s=options['zipf'],
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f"Нагрузка на {options['url']}: {options['concurrency']} пользователей, {options['duration']:.0f} с"
+        )
+        try:
+            report = test.run()
+        except RuntimeError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(
+            f"{'Запрос':<20}{'кол-во':>8}{'rps':>9}{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}{'ошибки':>9}{'429':>9}"
+        )
+        for endpoint, stats in report['endpoints'].items():
+            self.stdout.write(
+                f"{endpoint:<20}{stats['requests']:>8}{stats['throughput_rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+                f"{stats['error_rate']:>9.1%}{stats['throttled_rate']:>9.1%}"
+            )
+        self.stdout.write(
+            f"Всего: {report['total_requests']} запросов, {report['throughput_rps']:.1f} rps, "
+            f"ошибок {report['error_rate']:.1%}, отклонено ограничителем (429) {report['throttled_rate']:.1%}"
+        )
+        if report['note']:
+            self.stderr.write(self.style.WARNING(report['note']))
+        for failure in report['worker_failures']:
+            self.stderr.write(self.style.ERROR(f"Виртуальный пользователь остановлен: {failure}"))
+
+        if options['compare']:
+            if not os.path.exists(options['compare']):
+                raise CommandError(f"Файл не найден: {options['compare']}")
+            for endpoint, metrics in compare_reports(report, load_report(options['compare'])).items():
+                changes = ', '.join(
+                    f"{metric} {before:.2f} → {after:.2f}" + (f" ({change:+.1f}%)" if change is not None else '')
+                    for metric, (before, after, change) in metrics.items()
+                )
+                self.stdout.write(f"{endpoint}: {changes}")
+
+        if options['output']:
+            save_report(report, options['output'])
+            self.stdout.write(self.style.SUCCESS(f"Отчёт сохранён: {options['output']}"))
@@ -0,0 +1,97 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Код, выполняемый в отдельном процессе: холодный старт Django
+PROBE = r"""
+import json, os, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_done = time.perf_counter()
+heavy = [name for name in {heavy} if name in sys.modules]
+from main.warmup import warm_up
+warm_up_started = time.perf_counter()
+warm_up()
+finished = time.perf_counter()
+print(json.dumps({{
+    'setup': setup_done - started,
+    'urls': urls_done - setup_done,
+    'warm_up': finished - warm_up_started,
+    'heavy': heavy,
+}}))
+"""
+
+# Модули, которые не должны загружаться при старте manage.py
+HEAVY_MODULES = ['qrcode', 'PIL.Image', 'brotli']
+
+
+class Command(BaseCommand):
+    help = 'Измеряет время холодного старта: django.setup(), URL-конфигурация и прогрев'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Количество запусков',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Вывести результат в формате JSON',
+        )
+
+    def handle(self, *args, **options):
+        probe = PROBE.format(heavy=repr(HEAVY_MODULES))
+        env = {'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+
+        samples = []
+        for _ in range(options['runs']):
+            result = subprocess.run(
+                [sys.executable, '-c', probe],
+                capture_output=True,
+                text=True,
+                env={**os.environ, **env},
+                cwd=str(settings.BASE_DIR),
+            )
+            if result.returncode != 0:
+                self.stderr.write(result.stderr)
+                return
+            samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        summary = {
+            stage: {
+                'min_ms': min(sample[stage] for sample in samples) * 1000,
+                'median_ms': statistics.median(sample[stage] for sample in samples) * 1000,
+            }
+            for stage in ('setup', 'urls', 'warm_up')
+        }
+        summary['heavy_modules_before_warm_up'] = samples[-1]['heavy']
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        labels = {
+            'setup': 'django.setup()',
+            'urls': 'URL-конфигурация',
+            'warm_up': 'Прогрев',
+        }
+        for stage, label in labels.items():
+            self.stdout.write(
+                f"{label}: медиана {summary[stage]['median_ms']:.1f} мс, "
+                f"минимум {summary[stage]['min_ms']:.1f} мс"
+            )
+        heavy = summary['heavy_modules_before_warm_up']
+        if heavy:
+            self.stdout.write(self.style.WARNING(f"Тяжёлые модули загружены до прогрева: {', '.join(heavy)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS('Тяжёлые модули до прогрева не загружаются'))
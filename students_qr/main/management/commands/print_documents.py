@@ -0,0 +1,92 @@
+import argparse
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from main.models import Certificate, Diploma
+from main.printing import print_documents
+
+
+def iso_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Неверная дата: {value} (ожидается ГГГГ-ММ-ДД)")
+
+
+class Command(BaseCommand):
+    help = 'Формирует PDF для печати выбранных справок и дипломов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Путь к создаваемому PDF-файлу')
+        parser.add_argument(
+            '--certificates',
+            nargs='*',
+            type=int,
+            default=[],
+            help='ID справок',
+        )
+        parser.add_argument(
+            '--diplomas',
+            nargs='*',
+            type=int,
+            default=[],
+            help='ID дипломов',
+        )
+        parser.add_argument(
+            '--issued-from',
+            type=iso_date,
+            help='Все документы, выданные начиная с даты (ГГГГ-ММ-ДД)',
+        )
+        parser.add_argument(
+            '--issued-to',
+            type=iso_date,
+            help='Все документы, выданные до даты включительно (ГГГГ-ММ-ДД)',
+        )
+        parser.add_argument(
+            '--base-url',
+            help='Адрес сайта для ссылок в QR-кодах, например https://example.com '
+                 '(по умолчанию settings.SITE_URL)',
+        )
+
+    def handle(self, *args, **options):
+        # Через call_command значения могут прийти строками, минуя argparse
+        for option in ('issued_from', 'issued_to'):
+            if isinstance(options[option], str):
+                try:
+                    options[option] = iso_date(options[option])
+                except argparse.ArgumentTypeError as error:
+                    raise CommandError(str(error))
+
+        # Сканер телефона не откроет относительную ссылку: нужен полный адрес сайта
+        base_url = options['base_url'] or getattr(settings, 'SITE_URL', '')
+        if not base_url:
+            raise CommandError('Не задан адрес сайта для QR-кодов: укажите --base-url или SITE_URL в настройках')
+        if not base_url.startswith(('http://', 'https://')):
+            raise CommandError(f'Адрес сайта должен начинаться с http:// или https://: {base_url}')
+
+        certificates = Certificate.objects.none()
+        diplomas = Diploma.objects.none()
+
+        if options['certificates']:
+            certificates = Certificate.objects.filter(id__in=options['certificates'])
+        if options['diplomas']:
+            diplomas = Diploma.objects.filter(id__in=options['diplomas'])
+
+        if options['issued_from'] or options['issued_to']:
+            date_filter = {}
+            if options['issued_from']:
+                date_filter['issue_date__gte'] = options['issued_from']
+            if options['issued_to']:
+                date_filter['issue_date__lte'] = options['issued_to']
+            certificates = certificates | Certificate.objects.filter(**date_filter)
+            diplomas = diplomas | Diploma.objects.filter(**date_filter)
+
+        total = certificates.count() + diplomas.count()
+        if not total:
+            raise CommandError('Не выбрано ни одного документа')
+
+        with open(options['output'], 'wb') as output:
+            for chunk in print_documents(certificates, diplomas, base_url=base_url):
+                output.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Страниц: {total}, файл: {options['output']}"))
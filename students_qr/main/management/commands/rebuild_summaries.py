@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from main.summary import DEFAULT_CHUNK_SIZE, rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводки по студентам (количество документов, текущий университет)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Количество студентов в одной пачке',
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_summaries(chunk_size=options['chunk_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Сводок пересчитано: {total}"))
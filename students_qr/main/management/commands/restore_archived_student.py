@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.archive import restore_student
+from main.models import ArchivedStudent
+
+
+class Command(BaseCommand):
+    help = 'Восстанавливает студента из архива в основные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('student_id', nargs='?', type=int, help='ID студента')
+        parser.add_argument('--passport', help='Номер паспорта (вместо ID)')
+
+    def handle(self, *args, **options):
+        archived = ArchivedStudent.objects.all()
+        if options['passport']:
+            archived = archived.filter(passport_number=options['passport'])
+        elif options['student_id'] is not None:
+            archived = archived.filter(student_id=options['student_id'])
+        else:
+            raise CommandError('Укажите ID студента или --passport')
+
+        student_id = archived.values_list('student_id', flat=True).first()
+        if student_id is None:
+            raise CommandError('Студент в архиве не найден')
+
+        student = restore_student(student_id)
+        self.stdout.write(self.style.SUCCESS(f"Восстановлен: {student}"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.snapshot import restore_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Восстанавливает данные main и медиафайлы из снимка, созданного командой snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive', help='Путь к архиву снимка')
+        parser.add_argument(
+            '--base',
+            action='append',
+            default=[],
+            help='Предыдущий снимок, из которого берутся файлы инкрементального (можно несколько)',
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Удалить существующие данные main перед восстановлением',
+        )
+        parser.add_argument('--database', default='default', help='Алиас базы данных')
+
+    def handle(self, *args, **options):
+        try:
+            result = restore_snapshot(
+                options['archive'],
+                bases=options['base'],
+                replace=options['replace'],
+                using=options['database'],
+                log=self.stdout.write,
+            )
+        except FileNotFoundError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(f"Файлов восстановлено: {result['media_restored']}"))
+        if result['media_missing']:
+            self.stdout.write(self.style.WARNING(
+                f"Не найдено файлов: {len(result['media_missing'])} - укажите предыдущие снимки через --base"
+            ))
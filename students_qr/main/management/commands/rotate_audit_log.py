@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from main.audit import rotate_audit_log
+
+
+class Command(BaseCommand):
+    help = 'Переносит события журнала аудита за старые месяцы в сжатые файлы хранилища'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=12,
+            help='Сколько последних месяцев оставить в таблице',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Размер пачки при чтении и удалении',
+        )
+
+    def handle(self, *args, **options):
+        rotated = rotate_audit_log(
+            keep_months=options['keep_months'],
+            chunk_size=options['chunk_size'],
+            log=self.stdout.write,
+        )
+        total = sum(count for name, count in rotated.values())
+        self.stdout.write(self.style.SUCCESS(f"Месяцев перенесено: {len(rotated)}, событий: {total}"))
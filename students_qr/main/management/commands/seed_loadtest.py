@@ -0,0 +1,138 @@
+import datetime
+import random
+from io import BytesIO
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from main.duplicates import english_phonetic_key, normalize_arabic_name
+from main.loadtest import staff_username
+from main.models import Certificate, Diploma, Student
+from main.summary import refresh_summaries
+
+FIRST_NAMES = ['Mohamed', 'Ahmed', 'Mahmoud', 'Omar', 'Youssef', 'Mostafa', 'Karim', 'Hassan', 'Amr', 'Khaled']
+LAST_NAMES = ['Ali', 'Ibrahim', 'Hassan', 'Saad', 'Fathy', 'Mansour', 'Nasser', 'Salem', 'Farouk', 'Hamdy']
+ARABIC_FIRST = ['محمد', 'أحمد', 'محمود', 'عمر', 'يوسف', 'مصطفى', 'كريم', 'حسن', 'عمرو', 'خالد']
+ARABIC_LAST = ['علي', 'إبراهيم', 'حسن', 'سعد', 'فتحي', 'منصور', 'ناصر', 'سالم', 'فاروق', 'حمدي']
+
+# Общий для всех тестовых студентов скан паспорта
+PASSPORT_SCAN = 'passport_scans/loadtest.png'
+
+
+def ensure_passport_scan():
+    """
+    Создаёт в хранилище файл скана паспорта для тестовых студентов
+
+    Returns:
+        str: Имя файла в хранилище
+    """
+    if default_storage.exists(PASSPORT_SCAN):
+        return PASSPORT_SCAN
+    buffer = BytesIO()
+    Image.new('L', (600, 400), 230).save(buffer, format='PNG', optimize=True)
+    return default_storage.save(PASSPORT_SCAN, ContentFile(buffer.getvalue()))
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу тестовыми студентами и документами для нагрузочного теста'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000, help='Количество студентов')
+        parser.add_argument('--certificates', type=int, default=2, help='Справок на студента')
+        parser.add_argument('--diplomas', type=int, default=1, help='Дипломов на студента')
+        parser.add_argument('--users', type=int, default=10, help='Сотрудников (по одному на виртуального пользователя)')
+        parser.add_argument('--username', default='loadtest', help='Префикс логинов сотрудников для теста')
+        parser.add_argument('--password', required=True, help='Пароль сотрудников для теста')
+        parser.add_argument('--seed', type=int, default=1, help='Зерно генератора случайных чисел')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        # Команда создаёт сотрудников с известным паролем: только для отладочных баз
+        if not settings.DEBUG:
+            raise CommandError('seed_loadtest выполняется только при DEBUG=True')
+
+        rng = random.Random(options['seed'])
+        prefix = f"LT{options['seed']}-"
+        start = Student.objects.filter(passport_number__startswith=prefix).count()
+        today = datetime.date.today()
+        passport_scan = ensure_passport_scan()
+
+        students = []
+        for number in range(start, start + options['students']):
+            first, last = rng.randrange(10), rng.randrange(10)
+            full_name_english = f"{FIRST_NAMES[first]} {LAST_NAMES[last]} {number}"
+            full_name_arabic = f"{ARABIC_FIRST[first]} {ARABIC_LAST[last]}"
+            students.append(Student(
+                full_name_english=full_name_english,
+                full_name_arabic=full_name_arabic,
+                arabic_name_key=normalize_arabic_name(full_name_arabic),
+                english_name_key=english_phonetic_key(full_name_english),
+                passport_number=f"{prefix}{number}",
+                birth_date=datetime.date(1995, 1, 1) + datetime.timedelta(days=rng.randrange(3650)),
+                gender=rng.choice('MF'),
+                citizenship='Egypt',
+                country_of_residence='Russia',
+                major='Computer Science',
+                study_duration=4,
+                start_date=today - datetime.timedelta(days=rng.randrange(1460)),
+                phone_number=f"+20{rng.randrange(10 ** 9, 10 ** 10)}",
+                email=f"student{number}@example.com",
+                passport_scan=passport_scan,
+            ))
+        students = Student.objects.bulk_create(students, batch_size=500)
+        # Не все СУБД возвращают pk из bulk_create
+        if students and students[0].pk is None:
+            students = list(Student.objects.filter(passport_number__startswith=prefix).order_by('-pk')[:len(students)])
+
+        certificates = []
+        diplomas = []
+        for student in students:
+            for number in range(options['certificates']):
+                certificates.append(Certificate(
+                    student=student,
+                    certificate_type='studying',
+                    certificate_number=f"{student.passport_number}-C{number}",
+                    issue_date=today,
+                    issuing_institution='Load Test University',
+                    major=student.major,
+                    education_level='bachelor',
+                    course=1,
+                    study_form='full_time',
+                    study_period_start=student.start_date,
+                    study_period_end=student.start_date + datetime.timedelta(days=1460),
+                    certificate_validity_period=today + datetime.timedelta(days=rng.randrange(-90, 365)),
+                    purpose='other',
+                ))
+            for number in range(options['diplomas']):
+                diplomas.append(Diploma(
+                    student=student,
+                    diploma_type='bachelor',
+                    diploma_number=f"{student.passport_number}-D{number}",
+                    diploma_series='LT',
+                    registration_number=f"R-{student.passport_number}-{number}",
+                    issue_date=today,
+                    major=student.major,
+                    education_level='bachelor',
+                    issuing_organization='Load Test University',
+                ))
+        Certificate.objects.bulk_create(certificates, batch_size=500)
+        Diploma.objects.bulk_create(diplomas, batch_size=500)
+        refresh_summaries(student.pk for student in students)
+
+        user_model = get_user_model()
+        for number in range(options['users']):
+            user, created = user_model.objects.get_or_create(
+                username=staff_username(options['username'], number),
+                defaults={'is_staff': True},
+            )
+            user.is_staff = True
+            user.set_password(options['password'])
+            user.save()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Студентов: {len(students)}, справок: {len(certificates)}, дипломов: {len(diplomas)}, "
+            f"сотрудников: {options['users']} ({staff_username(options['username'], 0)}...)"
+        ))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from main.models import SlowQuery
+from main.slow_queries import top_queries
+
+
+class Command(BaseCommand):
+    help = 'Показывает самые тяжёлые медленные запросы с планами EXPLAIN'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--order',
+            choices=['total', 'max', 'avg', 'calls'],
+            default='total',
+            help='Сортировка: по суммарному, максимальному, среднему времени или количеству',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Количество запросов',
+        )
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Выводить план запроса',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Очистить накопленную статистику',
+        )
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f"Удалено записей: {deleted}"))
+            return
+
+        queries = list(top_queries(options['order'], options['limit']))
+        if not queries:
+            self.stdout.write("Медленных запросов не найдено")
+            return
+
+        for number, query in enumerate(queries, 1):
+            self.stdout.write(self.style.WARNING(
+                f"{number}. {query.calls} раз, всего {query.total_ms:.0f} мс, "
+                f"среднее {query.avg_ms:.0f} мс, максимум {query.max_ms:.0f} мс"
+            ))
+            self.stdout.write(f"   {query.view or '-'} / {query.location or '-'}")
+            self.stdout.write(f"   {query.sql}")
+            if options['plans'] and query.plan:
+                for line in query.plan.splitlines():
+                    self.stdout.write(f"     {line}")
@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from main.snapshot import DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS, read_manifest, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Создаёт согласованный снимок данных main и медиафайлов в виде tar-архива'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Путь к архиву или '-' для вывода в stdout")
+        parser.add_argument(
+            '--incremental',
+            metavar='PREVIOUS',
+            help='Предыдущий снимок: файлы с теми же хэшами в архив не попадают',
+        )
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Объектов в пачке')
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Потоков для хэширования файлов')
+        parser.add_argument('--gzip', action='store_true', help='Сжимать архив gzip')
+        parser.add_argument('--database', default='default', help='Алиас базы данных')
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['incremental']:
+            if not os.path.exists(options['incremental']):
+                raise CommandError(f"Снимок не найден: {options['incremental']}")
+            previous = read_manifest(options['incremental'])
+
+        to_stdout = options['output'] == '-'
+        # При выводе в stdout прогресс пишется в stderr, чтобы не портить архив
+        log_stream = self.stderr if to_stdout else self.stdout
+        write_options = dict(
+            name=os.path.basename(options['output']) if not to_stdout else '',
+            previous=previous,
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            compress=options['gzip'],
+            using=options['database'],
+            log=log_stream.write,
+        )
+
+        if to_stdout:
+            manifest = write_snapshot(sys.stdout.buffer, **write_options)
+        else:
+            tmp_path = f"{options['output']}.tmp"
+            try:
+                with open(tmp_path, 'wb') as output:
+                    manifest = write_snapshot(output, **write_options)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            os.replace(tmp_path, options['output'])
+            # Манифест рядом с архивом: следующему инкрементальному снимку не нужно читать архив
+            with open(f"{options['output']}.manifest.json", 'w', encoding='utf-8') as sidecar:
+                json.dump(manifest, sidecar, ensure_ascii=False, indent=2)
+
+        log_stream.write(
+            f"Файлов: {manifest['media_files']}, записано: {manifest['media_written']}, "
+            f"пропущено (есть в предыдущем снимке): {manifest['media_skipped']}, "
+            f"время: {manifest['seconds']:.2f} с"
+        )
+        if manifest['media_missing']:
+            log_stream.write(self.style.WARNING(f"Файлы не найдены в хранилище: {len(manifest['media_missing'])}"))
@@ -0,0 +1,42 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from main.expiry import DEFAULT_CHUNK_SIZE, run_sweep
+
+
+class Command(BaseCommand):
+    help = 'Помечает справки с истёкшим сроком и отмечает для проверки студентов после даты окончания'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать количество изменений, не сохраняя их',
+        )
+        parser.add_argument(
+            '--date',
+            help='Дата проверки в формате ГГГГ-ММ-ДД (по умолчанию сегодня)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Размер пачки для bulk_update',
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Неверная дата: {options['date']}")
+
+        result = run_sweep(today=today, dry_run=options['dry_run'], chunk_size=options['chunk_size'])
+
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        labels = {
+            'certificates': 'Справок с истёкшим сроком',
+            'students': 'Студентов отмечено для проверки',
+        }
+        for name, stats in result.items():
+            self.stdout.write(f"{prefix}{labels[name]}: {stats['count']} ({stats['seconds']:.3f} с)")
@@ -0,0 +1,186 @@
+# students/middleware.py
+import mimetypes
+import os
+import re
+from functools import partial
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware, auser
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from . import audit, auth_cache, slow_queries
+from .static_storage import ENCODINGS
+
+# Кэширование на год для файлов с хэшем в имени
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Файлы без хэша могут измениться при следующем деплое
+DEFAULT_CACHE_CONTROL = 'public, max-age=300'
+
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+
+def parse_accept_encoding(header):
+    """
+    Возвращает набор кодировок, которые принимает клиент (без q=0)
+    """
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = params.strip().replace(' ', '')
+        if quality in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding)
+    return accepted
+
+
+class PrecompressedStaticMiddleware:
+    """
+    Отдаёт статику из STATIC_ROOT с учётом заранее сжатых копий
+
+    Для файлов с хэшем в имени выставляется кэширование на год (immutable),
+    при поддержке клиентом отдаётся .br или .gz копия файла.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.static_url = settings.STATIC_URL
+        self.static_root = settings.STATIC_ROOT
+        # Имя -> (путь, время изменения, список доступных сжатых копий)
+        self.files = {}
+        self.hashed_names = None
+
+    def __call__(self, request):
+        if (
+            self.static_root
+            and request.method in ('GET', 'HEAD')
+            and request.path.startswith(self.static_url)
+        ):
+            response = self.serve(request, request.path[len(self.static_url):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def find(self, name):
+        info = self.files.get(name)
+        if info is not None:
+            return info
+        try:
+            path = safe_join(self.static_root, name)
+        except ValueError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        variants = [
+            (path + extension, encoding)
+            for extension, encoding in ENCODINGS
+            if os.path.isfile(path + extension)
+        ]
+        info = (path, os.stat(path).st_mtime, variants)
+        # В DEBUG файлы меняются без перезапуска, поэтому не запоминаем
+        if not settings.DEBUG:
+            self.files[name] = info
+        return info
+
+    def serve(self, request, name):
+        info = self.find(name)
+        if info is None:
+            return None
+        original_path, mtime, variants = info
+        path = original_path
+
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime):
+            return HttpResponseNotModified()
+
+        content_type, _ = mimetypes.guess_type(original_path)
+        encoding = None
+        accepted = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        for variant_path, variant_encoding in variants:
+            if variant_encoding in accepted:
+                path, encoding = variant_path, variant_encoding
+                break
+
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+            filename=os.path.basename(original_path),
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if variants:
+            response['Vary'] = 'Accept-Encoding'
+        response['Last-Modified'] = http_date(mtime)
+        response['Cache-Control'] = (
+            IMMUTABLE_CACHE_CONTROL if self.is_hashed(name) else DEFAULT_CACHE_CONTROL
+        )
+        return response
+
+    def is_hashed(self, name):
+        if self.hashed_names is None:
+            hashed_files = getattr(staticfiles_storage, 'hashed_files', None) or {}
+            self.hashed_names = set(hashed_files.values()) - set(hashed_files)
+        if self.hashed_names:
+            return name in self.hashed_names
+        return bool(HASHED_NAME_RE.search(name))
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware, берущий пользователя из кэшированного снимка
+
+    Проверки login_required / admin_required и контекстный процессор
+    user_permissions обходятся без запроса к таблице пользователей.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: self.get_user(request))
+        request.auser = partial(auser, request)
+
+    @staticmethod
+    def get_user(request):
+        if not hasattr(request, '_cached_user'):
+            request._cached_user = auth_cache.get_user(request)
+        return request._cached_user
+
+
+class AuditContextMiddleware:
+    """
+    Связывает события журнала аудита с текущим запросом и пользователем
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = audit.bind_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            audit.unbind_request(token)
+
+
+class SlowQueryMiddleware:
+    """
+    Относит медленные запросы (дольше SLOW_QUERY_THRESHOLD_MS) к текущему
+    HTTP-запросу (main/slow_queries.py)
+
+    Стоит первой в MIDDLEWARE, чтобы учитывались и запросы сессий и
+    аутентификации. Сами запросы замеряет QueryTimer, который ставится на
+    каждое соединение в MainConfig.ready - в том числе в командах manage.py.
+    """
+
+    def __init__(self, get_response):
+        if slow_queries.threshold_ms() is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with slow_queries.capture(request):
+            return self.get_response(request)
@@ -1,5 +1,13 @@
 from django.db import models
 from django.core.validators import RegexValidator
+from django.utils import timezone
+from .duplicates import normalize_arabic_name, english_phonetic_key
+
+QR_FORMAT_CHOICES = [
+    ('png', 'PNG'),
+    ('webp', 'WebP'),
+    ('svg', 'SVG'),
+]
 
 class Student(models.Model):
     # Основная информация
@@ -56,6 +64,12 @@ class Student(models.Model):
         blank=True,
         verbose_name="Фактическая дата окончания"
     )
+    # Выставляется sweep_expired: дата окончания прошла, а статус никто не подтвердил
+    is_overdue = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name="Требует проверки статуса"
+    )
     
     # Контактные данные
     phone_regex = RegexValidator(
@@ -75,14 +89,49 @@ class Student(models.Model):
         verbose_name="Скан паспорта"
     )
     
+    # Ключи для поиска дубликатов (заполняются автоматически)
+    arabic_name_key = models.CharField(
+        max_length=200,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name="Нормализованное ФИО на арабском"
+    )
+    english_name_key = models.CharField(
+        max_length=200,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name="Фонетический ключ ФИО на английском"
+    )
+    
     # Методы
     def __str__(self):
         return f"{self.full_name_english} ({self.passport_number})"
     
+    def save(self, *args, **kwargs):
+        self.arabic_name_key = normalize_arabic_name(self.full_name_arabic)
+        self.english_name_key = english_phonetic_key(self.full_name_english)
+        # Статус подтверждён или срок продлён - отметка проверки больше не нужна
+        if self.is_overdue and (
+            self.current_status != 'studying'
+            or (self.expected_end_date and self.expected_end_date >= timezone.localdate())
+        ):
+            self.is_overdue = False
+        super().save(*args, **kwargs)
+    
     
     class Meta:
         verbose_name = "Студент"
         verbose_name_plural = "Студенты"
+        indexes = [
+            models.Index(fields=['current_status', 'expected_end_date'], name='student_status_end_idx'),
+            models.Index(fields=['is_overdue'], condition=models.Q(is_overdue=True), name='student_overdue_idx'),
+            models.Index(fields=['gender'], name='student_gender_idx'),
+            models.Index(fields=['country_of_residence'], name='student_country_idx'),
+            # Блок поиска дубликатов по дате рождения (duplicates.py)
+            models.Index(fields=['birth_date'], name='student_birth_date_idx'),
+        ]
 
 
 
@@ -176,6 +225,12 @@ class Diploma(models.Model):
         null=True, 
         blank=True,
     )
+    diploma_qr_format = models.CharField(
+        max_length=10,
+        choices=QR_FORMAT_CHOICES,
+        blank=True,
+        verbose_name="Формат qr диплома"
+    )
     
     
     def __str__(self):
@@ -184,6 +239,22 @@ class Diploma(models.Model):
     class Meta:
         verbose_name = "Диплом"
         verbose_name_plural = "Дипломы"
+        indexes = [
+            models.Index(fields=['diploma_type'], name='diploma_type_idx'),
+            models.Index(fields=['document_status'], name='diploma_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['issuing_organization', 'diploma_series', 'diploma_number'],
+                name='diploma_number_unique',
+                violation_error_message="Диплом с такими серией и номером уже выдан этой организацией",
+            ),
+            models.UniqueConstraint(
+                fields=['issuing_organization', 'registration_number'],
+                name='diploma_registration_unique',
+                violation_error_message="Диплом с таким регистрационным номером уже выдан этой организацией",
+            ),
+        ]
 
 
 class Certificate(models.Model):
@@ -266,6 +337,10 @@ class Certificate(models.Model):
         blank=True,
         verbose_name="Период действия справки"
     )
+    is_expired = models.BooleanField(
+        default=False,
+        verbose_name="Срок действия истёк"
+    )
     
     # Цель выдачи
     purpose = models.CharField(
@@ -288,6 +363,12 @@ class Certificate(models.Model):
         null=True, 
         blank=True
     )
+    certificate_qr_format = models.CharField(
+        max_length=10,
+        choices=QR_FORMAT_CHOICES,
+        blank=True,
+        verbose_name="Формат qr справки"
+    )
     
     def __str__(self):
         return f"Справка {self.certificate_number}"
@@ -295,6 +376,18 @@ class Certificate(models.Model):
     class Meta:
         verbose_name = "Справка"
         verbose_name_plural = "Справки"
+        indexes = [
+            models.Index(fields=['is_expired', 'certificate_validity_period'], name='certificate_validity_idx'),
+            models.Index(fields=['certificate_type'], name='certificate_type_idx'),
+            models.Index(fields=['purpose'], name='certificate_purpose_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['issuing_institution', 'certificate_number'],
+                name='certificate_number_unique',
+                violation_error_message="Справка с таким номером уже выдана этим учреждением",
+            ),
+        ]
 
 class PaymentReceipt(models.Model):
     student = models.ForeignKey(
@@ -322,3 +415,245 @@ class PaymentReceipt(models.Model):
         verbose_name_plural = "Чеки оплаты"
         ordering = ['-upload_date']
 
+
+class StudentSummary(models.Model):
+    """
+    Сводка по студенту для списков: одна узкая строка вместо подзапросов
+    к связанным таблицам. Поддерживается сигналами (см. summary.py).
+    """
+    student = models.OneToOneField(
+        Student,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='summary',
+        verbose_name="Студент"
+    )
+    certificates_count = models.PositiveIntegerField(default=0, verbose_name="Справок")
+    diplomas_count = models.PositiveIntegerField(default=0, verbose_name="Дипломов")
+    receipts_count = models.PositiveIntegerField(default=0, verbose_name="Чеков оплаты")
+    current_university = models.CharField(max_length=200, blank=True, verbose_name="Текущий университет")
+    last_issue_date = models.DateField(null=True, blank=True, verbose_name="Дата последнего документа")
+
+    def __str__(self):
+        return f"Сводка {self.student_id}"
+
+    class Meta:
+        verbose_name = "Сводка по студенту"
+        verbose_name_plural = "Сводки по студентам"
+
+
+class StatusChangeRecord(models.Model):
+    """
+    Запись об автоматическом изменении статуса (справки или студента)
+    """
+    model_name = models.CharField(max_length=50, verbose_name="Модель")
+    object_id = models.PositiveBigIntegerField(verbose_name="ID объекта")
+    field_name = models.CharField(max_length=50, verbose_name="Поле")
+    old_value = models.CharField(max_length=50, blank=True, verbose_name="Старое значение")
+    new_value = models.CharField(max_length=50, blank=True, verbose_name="Новое значение")
+    reason = models.CharField(max_length=200, blank=True, verbose_name="Причина")
+    changed_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата изменения")
+
+    def __str__(self):
+        return f"{self.model_name} #{self.object_id}: {self.field_name} {self.old_value} → {self.new_value}"
+
+    class Meta:
+        verbose_name = "Изменение статуса"
+        verbose_name_plural = "Изменения статусов"
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['model_name', 'object_id'], name='status_change_object_idx'),
+        ]
+
+
+class DocumentNumberSeries(models.Model):
+    """
+    Счётчик номеров документов для серии: учреждение + тип номера + год
+    """
+    NUMBER_TYPES = [
+        ('certificate', 'Номер справки'),
+        ('diploma', 'Номер диплома'),
+        ('registration', 'Регистрационный номер диплома'),
+    ]
+
+    institution = models.CharField(max_length=300, verbose_name="Учреждение")
+    number_type = models.CharField(max_length=20, choices=NUMBER_TYPES, verbose_name="Тип номера")
+    year = models.PositiveSmallIntegerField(verbose_name="Год")
+    next_value = models.PositiveIntegerField(default=1, verbose_name="Следующий свободный номер")
+
+    def __str__(self):
+        return f"{self.get_number_type_display()} {self.institution} {self.year}: {self.next_value}"
+
+    class Meta:
+        verbose_name = "Серия номеров"
+        verbose_name_plural = "Серии номеров"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['institution', 'number_type', 'year'],
+                name='document_number_series_unique',
+            ),
+        ]
+
+
+class ArchivedStudent(models.Model):
+    """
+    Студент, перенесённый в архив вместе с документами (см. archive.py).
+    Данные хранятся сжатым JSON, файлы - одним сжатым архивом в хранилище.
+    """
+    student_id = models.BigIntegerField(primary_key=True, verbose_name="ID студента")
+    passport_number = models.CharField(max_length=20, unique=True, verbose_name="Номер паспорта")
+    full_name_english = models.CharField(max_length=200, verbose_name="ФИО на английском")
+    full_name_arabic = models.CharField(max_length=200, blank=True, verbose_name="ФИО на арабском")
+    birth_date = models.DateField(null=True, blank=True, verbose_name="Дата рождения")
+    current_status = models.CharField(max_length=20, choices=Student.STATUS_CHOICES, verbose_name="Статус студента")
+    # Ключи для поиска дубликатов, как у Student
+    arabic_name_key = models.CharField(
+        max_length=200, blank=True, editable=False, db_index=True, verbose_name="Нормализованное ФИО на арабском"
+    )
+    english_name_key = models.CharField(
+        max_length=200, blank=True, editable=False, db_index=True, verbose_name="Фонетический ключ ФИО на английском"
+    )
+    data = models.BinaryField(verbose_name="Данные (сжатый JSON)")
+    # Файловое поле: архив попадает в снимки (snapshot.py) вместе с остальными файлами
+    media_archive = models.FileField(upload_to='archive/students/', max_length=255, blank=True, verbose_name="Архив файлов")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата архивации")
+
+    def __str__(self):
+        return f"{self.full_name_english} ({self.passport_number})"
+
+    def save(self, *args, **kwargs):
+        self.arabic_name_key = normalize_arabic_name(self.full_name_arabic)
+        self.english_name_key = english_phonetic_key(self.full_name_english)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Архивный студент"
+        verbose_name_plural = "Архивные студенты"
+        indexes = [
+            models.Index(fields=['birth_date'], name='archived_student_birth_idx'),
+        ]
+
+
+class ArchivedDocument(models.Model):
+    """
+    Узкий индекс документов архивных студентов для проверки по QR-коду и номеру
+    """
+    DOCUMENT_TYPES = [
+        ('certificate', 'Справка'),
+        ('diploma', 'Диплом'),
+        ('receipt', 'Чек оплаты'),
+    ]
+
+    archived_student = models.ForeignKey(
+        ArchivedStudent,
+        on_delete=models.CASCADE,
+        related_name='documents',
+        verbose_name="Архивный студент"
+    )
+    document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPES, verbose_name="Тип документа")
+    document_id = models.BigIntegerField(verbose_name="ID документа")
+    number = models.CharField(max_length=100, blank=True, verbose_name="Номер")
+    issue_date = models.DateField(null=True, blank=True, verbose_name="Дата выдачи")
+
+    def __str__(self):
+        return f"{self.get_document_type_display()} {self.number or self.document_id}"
+
+    class Meta:
+        verbose_name = "Архивный документ"
+        verbose_name_plural = "Архивные документы"
+        constraints = [
+            models.UniqueConstraint(fields=['document_type', 'document_id'], name='archived_document_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['number'], name='archived_document_number_idx'),
+        ]
+
+
+class AuditQuerySet(models.QuerySet):
+    """
+    Журнал только дополняется: изменение и удаление записей запрещены,
+    кроме ротации старых периодов (purge)
+    """
+
+    def update(self, **kwargs):
+        raise TypeError("Записи журнала аудита нельзя изменять")
+
+    def delete(self):
+        raise TypeError("Записи журнала аудита нельзя удалять, используйте ротацию")
+
+    def purge(self):
+        # Удаление без сигналов и проверок - только для ротации журнала
+        return self._raw_delete(self.db)
+
+
+class AuditEvent(models.Model):
+    """
+    Событие журнала аудита: создание, изменение, удаление объекта или просмотр
+    """
+    ACTIONS = [
+        ('create', 'Создание'),
+        ('update', 'Изменение'),
+        ('delete', 'Удаление'),
+        ('view', 'Просмотр'),
+    ]
+
+    occurred_at = models.DateTimeField(verbose_name="Время события")
+    # Месяц события в виде ГГГГММ: журнал ротируется по месяцам
+    period = models.PositiveIntegerField(verbose_name="Период")
+    action = models.CharField(max_length=10, choices=ACTIONS, verbose_name="Действие")
+    model_name = models.CharField(max_length=50, verbose_name="Модель")
+    object_id = models.BigIntegerField(verbose_name="ID объекта")
+    object_repr = models.CharField(max_length=200, blank=True, verbose_name="Объект")
+    # Без внешнего ключа: запись сохраняется и после удаления пользователя
+    user_id = models.IntegerField(null=True, blank=True, verbose_name="ID пользователя")
+    username = models.CharField(max_length=150, blank=True, verbose_name="Пользователь")
+    ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name="IP-адрес")
+    path = models.CharField(max_length=255, blank=True, verbose_name="Адрес запроса")
+    changes = models.JSONField(default=dict, blank=True, verbose_name="Изменения")
+
+    objects = AuditQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.model_name} #{self.object_id} ({self.username or '-'})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError("Записи журнала аудита нельзя изменять")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("Записи журнала аудита нельзя удалять, используйте ротацию")
+
+    class Meta:
+        verbose_name = "Событие аудита"
+        verbose_name_plural = "Журнал аудита"
+        ordering = ['-occurred_at']
+        indexes = [
+            models.Index(fields=['model_name', 'object_id', 'occurred_at'], name='audit_object_idx'),
+            models.Index(fields=['user_id', 'occurred_at'], name='audit_user_idx'),
+            models.Index(fields=['period'], name='audit_period_idx'),
+        ]
+
+
+class SlowQuery(models.Model):
+    """
+    Сводка медленных запросов одного вида (по отпечатку нормализованного SQL)
+    """
+    fingerprint = models.CharField(max_length=40, unique=True, verbose_name="Отпечаток")
+    sql = models.TextField(verbose_name="SQL")
+    calls = models.PositiveIntegerField(default=0, verbose_name="Количество")
+    total_ms = models.FloatField(default=0, verbose_name="Суммарное время, мс")
+    max_ms = models.FloatField(default=0, verbose_name="Максимальное время, мс")
+    view = models.CharField(max_length=200, blank=True, verbose_name="Представление")
+    location = models.CharField(max_length=300, blank=True, verbose_name="Место вызова")
+    plan = models.TextField(blank=True, verbose_name="План запроса")
+    first_seen = models.DateTimeField(auto_now_add=True, verbose_name="Впервые")
+    last_seen = models.DateTimeField(verbose_name="Последний раз")
+
+    def __str__(self):
+        return f"{self.fingerprint[:12]}: {self.calls} x {self.total_ms / max(self.calls, 1):.0f} мс"
+
+    class Meta:
+        verbose_name = "Медленный запрос"
+        verbose_name_plural = "Медленные запросы"
+        ordering = ['-total_ms']
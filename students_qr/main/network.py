@@ -0,0 +1,29 @@
+# students/network.py
+from django.conf import settings
+
+# Сколько обратных прокси стоит перед приложением (settings.TRUSTED_PROXY_COUNT);
+# 0 - X-Forwarded-For не учитывается, адрес клиента берётся из REMOTE_ADDR
+DEFAULT_TRUSTED_PROXY_COUNT = 0
+
+
+def client_ip(request):
+    """
+    Адрес клиента с учётом доверенных обратных прокси
+
+    Каждый прокси дописывает в конец X-Forwarded-For адрес, с которого к нему
+    пришёл запрос, поэтому клиент - N-й адрес с конца при N доверенных прокси.
+    Значения левее присылает сам клиент, им доверять нельзя.
+
+    Args:
+        request: Запрос
+
+    Returns:
+        str: IP-адрес или None
+    """
+    proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', DEFAULT_TRUSTED_PROXY_COUNT)
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        addresses = [address.strip() for address in forwarded.split(',') if address.strip()]
+        if addresses:
+            return addresses[-min(proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR') or None
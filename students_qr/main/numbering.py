@@ -0,0 +1,360 @@
+# students/numbering.py
+import threading
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import Count, F
+from .models import Certificate, Diploma, DocumentNumberSeries
+
+# Сколько номеров процесс резервирует за одно обращение к счётчику
+# (переопределяется settings.DOCUMENT_NUMBER_BLOCK_SIZE)
+DEFAULT_BLOCK_SIZE = 20
+
+# Шаблоны номеров по типу (переопределяются settings.DOCUMENT_NUMBER_FORMATS).
+# Доступны поля: code - код учреждения, year, yy - две последние цифры года,
+# number - порядковый номер в серии. Серия шаблона с годом начинается заново
+# каждый год, без года - продолжается.
+DEFAULT_FORMATS = {
+    'certificate': '{code}-{year}-{number:05d}',
+    'diploma': '{yy}{number:06d}',
+    'registration': '{code}/{year}/{number}',
+}
+
+# Уникальные номера документов: имя ограничения -> модель, поля ограничения,
+# поле номера и тип номера, которым поле заполняется автоматически
+NUMBER_CONSTRAINTS = {
+    'certificate_number_unique': (
+        Certificate, ('issuing_institution', 'certificate_number'), 'certificate_number', 'certificate',
+    ),
+    'diploma_number_unique': (
+        Diploma, ('issuing_organization', 'diploma_series', 'diploma_number'), 'diploma_number', 'diploma',
+    ),
+    'diploma_registration_unique': (
+        Diploma, ('issuing_organization', 'registration_number'), 'registration_number', 'registration',
+    ),
+}
+
+# Сколько раз документ с автоматическим номером сохраняется повторно, если
+# номер успел занять параллельно сохранённый документ
+MAX_SAVE_ATTEMPTS = 5
+
+# Зарезервированные, но ещё не выданные номера этого процесса:
+# (учреждение, тип, год) -> [следующий, конец блока)
+_blocks = {}
+_lock = threading.Lock()
+
+
+def get_block_size():
+    return getattr(settings, 'DOCUMENT_NUMBER_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)
+
+
+def get_format(number_type):
+    formats = {**DEFAULT_FORMATS, **getattr(settings, 'DOCUMENT_NUMBER_FORMATS', {})}
+    if number_type not in formats:
+        raise ValueError(f"Неизвестный тип номера: {number_type}")
+    return formats[number_type]
+
+
+def series_year(number_type, year):
+    """
+    Год серии номеров: 0 для шаблонов без года, чтобы номера не повторялись
+    после начала новой серии в следующем году
+    """
+    template = get_format(number_type)
+    return year if '{year' in template or '{yy' in template else 0
+
+
+def institution_code(institution):
+    """
+    Код учреждения для шаблона номера
+
+    Берётся из settings.DOCUMENT_NUMBER_INSTITUTION_CODES, иначе составляется
+    из первых букв слов названия (Cairo University -> CU).
+
+    Args:
+        institution (str): Название учреждения
+
+    Returns:
+        str: Код учреждения
+    """
+    codes = getattr(settings, 'DOCUMENT_NUMBER_INSTITUTION_CODES', {})
+    if institution in codes:
+        return codes[institution]
+    code = ''.join(word[0] for word in institution.split() if word[0].isalnum())
+    return code.upper()[:6] or 'DOC'
+
+
+def reserve_block(institution, number_type, year, size):
+    """
+    Резервирует в базе блок номеров серии
+
+    Строка счётчика блокируется только на время одного UPDATE, поэтому
+    процессы обращаются к ней раз в size документов, а не при каждом.
+
+    Args:
+        institution (str): Учреждение
+        number_type (str): Тип номера из DocumentNumberSeries.NUMBER_TYPES
+        year (int): Год выдачи
+        size (int): Размер блока
+
+    Returns:
+        tuple: Первый номер блока и номер, следующий за последним
+    """
+    with transaction.atomic():
+        series, created = DocumentNumberSeries.objects.get_or_create(
+            institution=institution,
+            number_type=number_type,
+            year=year,
+        )
+        series_queryset = DocumentNumberSeries.objects.filter(pk=series.pk)
+        series_queryset.update(next_value=F('next_value') + size)
+        end = series_queryset.values_list('next_value', flat=True).get()
+    return end - size, end
+
+
+def allocate_numbers(institution, number_type, year, count=1):
+    """
+    Выдаёт порядковые номера серии из блока, зарезервированного процессом
+
+    Номера уникальны, но процессы выдают их из разных блоков, поэтому
+    порядок выдачи не совпадает с порядком номеров, а номера блока,
+    не выданные до остановки процесса, остаются пропусками.
+
+    Args:
+        institution (str): Учреждение
+        number_type (str): Тип номера
+        year (int): Год выдачи
+        count (int): Сколько номеров нужно (пакетная выдача)
+
+    Returns:
+        list: Порядковые номера
+    """
+    key = (institution, number_type, year)
+    numbers = []
+    with _lock:
+        while len(numbers) < count:
+            start, end = _blocks.get(key, (0, 0))
+            if start >= end:
+                # Пакетной выдаче резервируется сразу весь недостающий диапазон
+                start, end = reserve_block(institution, number_type, year,
+                                           max(get_block_size(), count - len(numbers)))
+            take = min(end - start, count - len(numbers))
+            numbers.extend(range(start, start + take))
+            _blocks[key] = (start + take, end)
+    return numbers
+
+
+def format_number(institution, number_type, year, number):
+    """
+    Формирует строку номера по шаблону
+
+    Returns:
+        str: Номер документа
+    """
+    return get_format(number_type).format(
+        code=institution_code(institution),
+        year=year,
+        yy=f'{year % 100:02d}',
+        number=number,
+    )
+
+
+def next_numbers(institution, number_type, year, count=1):
+    """
+    Выдаёт готовые номера документов серии
+
+    Returns:
+        list: Строки номеров
+    """
+    return [
+        format_number(institution, number_type, year, number)
+        for number in allocate_numbers(institution, number_type, series_year(number_type, year), count)
+    ]
+
+
+def next_free_number(queryset, field, institution, number_type, year):
+    """
+    Выдаёт следующий номер серии, пропуская номера, уже занятые документами
+    (например, введёнными вручную)
+
+    Args:
+        queryset (QuerySet): Документы, среди которых номер должен быть уникален
+        field (str): Поле номера
+
+    Returns:
+        str: Номер документа
+    """
+    while True:
+        number = next_numbers(institution, number_type, year)[0]
+        if not queryset.filter(**{field: number}).exists():
+            return number
+
+
+def assign_certificate_number(certificate):
+    """
+    Присваивает справке номер, если он не введён вручную
+
+    Returns:
+        list: Имена полей, заполненных автоматически
+    """
+    if certificate.certificate_number:
+        return []
+    certificate.certificate_number = next_free_number(
+        Certificate.objects.filter(issuing_institution=certificate.issuing_institution),
+        'certificate_number',
+        certificate.issuing_institution,
+        'certificate',
+        certificate.issue_date.year,
+    )
+    return ['certificate_number']
+
+
+def assign_diploma_numbers(diploma):
+    """
+    Присваивает диплому номер и регистрационный номер, если они не введены вручную
+
+    Returns:
+        list: Имена полей, заполненных автоматически
+    """
+    year = diploma.issue_date.year
+    organization = diploma.issuing_organization
+    assigned = []
+    if not diploma.diploma_number:
+        diploma.diploma_number = next_free_number(
+            Diploma.objects.filter(issuing_organization=organization, diploma_series=diploma.diploma_series),
+            'diploma_number', organization, 'diploma', year,
+        )
+        assigned.append('diploma_number')
+    if not diploma.registration_number:
+        diploma.registration_number = next_free_number(
+            Diploma.objects.filter(issuing_organization=organization),
+            'registration_number', organization, 'registration', year,
+        )
+        assigned.append('registration_number')
+    return assigned
+
+
+def save_numbered(document, assign):
+    """
+    Присваивает документу пустые номера и сохраняет его
+
+    Если автоматический номер между проверкой и сохранением занял другой
+    документ, номер выдаётся заново. Номер, введённый вручную, не меняется.
+
+    Args:
+        document: Справка или диплом
+        assign: assign_certificate_number или assign_diploma_numbers
+
+    Raises:
+        IntegrityError: Номер уже занят (введён вручную или попытки исчерпаны)
+    """
+    assigned = assign(document)
+    for attempt in range(MAX_SAVE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                document.save()
+            return
+        except IntegrityError:
+            if not assigned or attempt == MAX_SAVE_ATTEMPTS - 1:
+                raise
+            for field in assigned:
+                setattr(document, field, '')
+            assign(document)
+
+
+def find_duplicate_numbers(constraint_name):
+    """
+    Ищет документы, нарушающие ограничение уникальности номера
+
+    Args:
+        constraint_name (str): Ключ NUMBER_CONSTRAINTS
+
+    Returns:
+        list: Списки ID документов с одинаковыми номерами (по возрастанию ID)
+    """
+    model, fields, number_field, number_type = NUMBER_CONSTRAINTS[constraint_name]
+    duplicates = (
+        model.objects.values(*fields)
+        .annotate(documents=Count('pk'))
+        .filter(documents__gt=1)
+        .order_by()
+    )
+    groups = []
+    for values in duplicates:
+        del values['documents']
+        groups.append(list(model.objects.filter(**values).order_by('pk').values_list('pk', flat=True)))
+    return groups
+
+
+def renumber_duplicates(constraint_name, log=None):
+    """
+    Устраняет повторы номеров перед добавлением ограничения: первый по ID
+    документ группы сохраняет номер, остальные получают новые из серии
+
+    Returns:
+        int: Количество перенумерованных документов
+    """
+    log = log or (lambda message: None)
+    model, fields, number_field, number_type = NUMBER_CONSTRAINTS[constraint_name]
+    institution_field = fields[0]
+    renumbered = 0
+    for pks in find_duplicate_numbers(constraint_name):
+        for document in model.objects.filter(pk__in=pks[1:]).order_by('pk'):
+            old_number = getattr(document, number_field)
+            scope = {name: getattr(document, name) for name in fields if name != number_field}
+            with transaction.atomic():
+                setattr(document, number_field, next_free_number(
+                    model.objects.filter(**scope),
+                    number_field,
+                    getattr(document, institution_field),
+                    number_type,
+                    document.issue_date.year,
+                ))
+                document.save(update_fields=[number_field])
+            log(f"{model._meta.verbose_name} #{document.pk}: {old_number} -> {getattr(document, number_field)}")
+            renumbered += 1
+    return renumbered
+
+
+def missing_constraints_with_duplicates(using='default'):
+    """
+    Ограничения уникальности номеров, которых ещё нет в базе и которые
+    нельзя добавить из-за повторов в существующих данных
+
+    Returns:
+        dict: Имя ограничения -> количество групп повторов
+    """
+    connection = connections[using]
+    tables = set(connection.introspection.table_names())
+    result = {}
+    for constraint_name, (model, *_) in NUMBER_CONSTRAINTS.items():
+        table = model._meta.db_table
+        if table not in tables:
+            continue
+        with connection.cursor() as cursor:
+            existing = connection.introspection.get_constraints(cursor, table)
+        if constraint_name in existing:
+            continue
+        try:
+            with transaction.atomic(using=using):
+                groups = find_duplicate_numbers(constraint_name)
+        except DatabaseError:
+            # Таблица ещё без нужных столбцов: их добавит сама миграция
+            continue
+        if groups:
+            result[constraint_name] = len(groups)
+    return result
+
+
+def check_duplicates_before_migrate(sender, using='default', **kwargs):
+    """
+    Останавливает migrate, если ограничения уникальности номеров нельзя
+    добавить из-за повторов (обработчик pre_migrate)
+    """
+    duplicates = missing_constraints_with_duplicates(using)
+    if duplicates:
+        details = ', '.join(f'{name}: {count}' for name, count in duplicates.items())
+        raise CommandError(
+            f"Повторяющиеся номера документов ({details}). "
+            f"Перед миграцией выполните manage.py dedupe_document_numbers --fix"
+        )
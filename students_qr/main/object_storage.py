@@ -0,0 +1,557 @@
+# students/object_storage.py
+import datetime
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.utils.deconstruct import deconstructible
+
+# Размер части при многочастичной загрузке (S3 требует не меньше 5 МБ)
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_WORKERS = 4
+
+# Локальный кэш часто читаемых файлов (QR-коды, шаблоны shablon/)
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+DEFAULT_CACHE_MAX_FILE_SIZE = 5 * 1024 * 1024
+# Через сколько секунд файл из кэша сверяется с хранилищем
+DEFAULT_CACHE_TTL = 300
+# Вытеснение освобождает кэш до этой доли max_size, чтобы не запускаться на каждой записи
+CACHE_EVICT_TARGET = 0.9
+# Сколько отметок о сверке с хранилищем держит процесс (самые давние вытесняются)
+MAX_VALIDATED_NAMES = 10000
+
+COPY_BLOCK_SIZE = 1024 * 1024
+
+NOT_FOUND_CODES = {'404', 'NoSuchKey', 'NotFound'}
+
+
+def is_not_found(error):
+    """
+    Проверяет, что ошибка клиента S3 означает отсутствие объекта
+    """
+    response = getattr(error, 'response', None) or {}
+    return str(response.get('Error', {}).get('Code')) in NOT_FOUND_CODES
+
+
+class ObjectNotFound(Exception):
+    """
+    Ошибка файлового клиента в формате botocore ClientError
+    """
+
+    def __init__(self, key):
+        super().__init__(f"Объект не найден: {key}")
+        self.response = {'Error': {'Code': 'NoSuchKey', 'Message': str(self)}}
+
+
+class FilesystemObjectClient:
+    """
+    Клиент S3 поверх локального каталога (для разработки и тестов)
+
+    Реализует те методы boto3 S3 client, которые использует ObjectStorage;
+    объекты лежат в <root>/<bucket>/<key>.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def _upload_dir(self, upload_id):
+        return os.path.join(self.root, '.uploads', upload_id)
+
+    def _stat(self, bucket, key):
+        try:
+            return os.stat(self._path(bucket, key))
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+
+    def _meta(self, bucket, key):
+        stat = self._stat(bucket, key)
+        return {
+            'ContentLength': stat.st_size,
+            'LastModified': datetime.datetime.fromtimestamp(stat.st_mtime, datetime.timezone.utc),
+            'ETag': f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+        }
+
+    def _write(self, path, chunks):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as output:
+            for chunk in chunks:
+                if isinstance(chunk, bytes):
+                    output.write(chunk)
+                else:
+                    shutil.copyfileobj(chunk, output, COPY_BLOCK_SIZE)
+        os.replace(tmp_path, path)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._write(self._path(Bucket, Key), [Body])
+        return {'ETag': self._meta(Bucket, Key)['ETag']}
+
+    def head_object(self, Bucket, Key):
+        return self._meta(Bucket, Key)
+
+    def get_object(self, Bucket, Key):
+        meta = self._meta(Bucket, Key)
+        meta['Body'] = open(self._path(Bucket, Key), 'rb')
+        return meta
+
+    def delete_object(self, Bucket, Key):
+        try:
+            os.remove(self._path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix='', Delimiter='', **kwargs):
+        base = os.path.join(self.root, Bucket)
+        contents = []
+        prefixes = set()
+        for directory, dirnames, filenames in os.walk(base):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                key = os.path.relpath(os.path.join(directory, filename), base).replace(os.sep, '/')
+                if not key.startswith(Prefix):
+                    continue
+                rest = key[len(Prefix):]
+                if Delimiter and Delimiter in rest:
+                    prefixes.add(Prefix + rest.split(Delimiter, 1)[0] + Delimiter)
+                    continue
+                meta = self._meta(Bucket, key)
+                contents.append({'Key': key, 'Size': meta['ContentLength'], 'LastModified': meta['LastModified']})
+        return {
+            'Contents': sorted(contents, key=lambda item: item['Key']),
+            'CommonPrefixes': [{'Prefix': prefix} for prefix in sorted(prefixes)],
+            'IsTruncated': False,
+        }
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._upload_dir(upload_id))
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        path = os.path.join(self._upload_dir(UploadId), f'{PartNumber:05d}')
+        self._write(path, [Body])
+        return {'ETag': f'"{UploadId}-{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        upload_dir = self._upload_dir(UploadId)
+        parts = sorted(MultipartUpload['Parts'], key=lambda part: part['PartNumber'])
+        sources = [open(os.path.join(upload_dir, f"{part['PartNumber']:05d}"), 'rb') for part in parts]
+        try:
+            self._write(self._path(Bucket, Key), sources)
+        finally:
+            for source in sources:
+                source.close()
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        return {'ETag': self._meta(Bucket, Key)['ETag']}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        shutil.rmtree(self._upload_dir(UploadId), ignore_errors=True)
+        return {}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600):
+        return 'file://' + self._path(Params['Bucket'], Params['Key'])
+
+
+class LocalFileCache:
+    """
+    Локальный кэш файлов хранилища с вытеснением давно не читавшихся (LRU)
+
+    Время последнего чтения хранится в atime файла (выставляется явно),
+    mtime равен времени изменения объекта в хранилище. Каталог может
+    использоваться несколькими процессами одновременно.
+
+    Размер кэша процесс считает сам: полный обход каталога выполняется при
+    первой записи и при вытеснении, когда размер превысил max_size (обход
+    заодно учитывает файлы, записанные другими процессами).
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.size = None
+
+    def path(self, name):
+        digest = hashlib.sha256(name.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + os.path.splitext(name)[1])
+
+    def get(self, name):
+        """
+        Возвращает путь к файлу в кэше и отмечает чтение, либо None
+        """
+        path = self.path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        os.utime(path, (time.time(), stat.st_mtime))
+        return path
+
+    def put(self, name, source, modified):
+        """
+        Записывает файл в кэш из потока
+
+        Args:
+            name (str): Имя файла в хранилище
+            source: Поток с содержимым
+            modified (float): Время изменения объекта в хранилище (timestamp)
+
+        Returns:
+            str: Путь к файлу в кэше
+        """
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as output:
+            shutil.copyfileobj(source, output, COPY_BLOCK_SIZE)
+        os.utime(tmp_path, (time.time(), modified))
+        written = os.path.getsize(tmp_path)
+        replaced = self._file_size(path)
+        os.replace(tmp_path, path)
+        self._add_size(written - replaced)
+        if self.size > self.max_size:
+            self.evict()
+        return path
+
+    def discard(self, name):
+        path = self.path(name)
+        size = self._file_size(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        self._add_size(-size)
+
+    def _file_size(self, path):
+        try:
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return 0
+
+    def _add_size(self, delta):
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for accessed, size, path in self._entries())
+            else:
+                self.size = max(0, self.size + delta)
+
+    def _entries(self):
+        entries = []
+        for directory, dirnames, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+        Удаляет давно не читавшиеся файлы, пока кэш больше max_size
+        (с запасом: до CACHE_EVICT_TARGET от max_size)
+        """
+        with self.lock:
+            entries = sorted(self._entries())
+            total = sum(size for accessed, size, path in entries)
+            if total <= self.max_size:
+                self.size = total
+                return
+            for accessed, size, path in entries:
+                if total <= self.max_size * CACHE_EVICT_TARGET:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self.size = total
+
+
+@deconstructible(path='main.object_storage.ObjectStorage')
+class ObjectStorage(Storage):
+    """
+    Хранилище медиафайлов в S3-совместимом объектном хранилище
+
+    Большие файлы загружаются частями в несколько потоков, файлы читаются
+    потоком, небольшие - через локальный кэш с вытеснением LRU. Для
+    endpoint_url вида file:///path используется FilesystemObjectClient
+    (без boto3), для S3 и MinIO - boto3.
+
+    Args:
+        bucket (str): Имя бакета
+        endpoint_url (str): Адрес хранилища (None - AWS S3)
+        access_key (str): Ключ доступа
+        secret_key (str): Секретный ключ
+        region (str): Регион
+        location (str): Префикс ключей внутри бакета
+        base_url (str): Публичный адрес файлов (None - подписанные ссылки)
+        part_size (int): Размер части многочастичной загрузки
+        max_workers (int): Количество потоков загрузки частей
+        cache_dir (str): Каталог локального кэша (None - без кэша)
+        cache_size (int): Максимальный размер кэша в байтах
+        cache_max_file_size (int): Файлы больше этого размера не кэшируются
+        cache_ttl (int): Через сколько секунд файл из кэша сверяется с хранилищем
+        url_expires (int): Время жизни подписанной ссылки в секундах
+    """
+
+    def __init__(self, bucket=None, endpoint_url=None, access_key=None, secret_key=None, region=None,
+                 location='', base_url=None, part_size=DEFAULT_PART_SIZE, max_workers=DEFAULT_MAX_WORKERS,
+                 cache_dir=None, cache_size=DEFAULT_CACHE_SIZE, cache_max_file_size=DEFAULT_CACHE_MAX_FILE_SIZE,
+                 cache_ttl=DEFAULT_CACHE_TTL, url_expires=3600):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.location = location.strip('/')
+        self.base_url = base_url
+        self.part_size = part_size
+        self.max_workers = max_workers
+        self.cache = LocalFileCache(cache_dir, cache_size) if cache_dir else None
+        self.cache_max_file_size = cache_max_file_size
+        self.cache_ttl = cache_ttl
+        self.url_expires = url_expires
+        self._client = None
+        self._client_lock = threading.Lock()
+        # Когда файл из кэша последний раз сверялся с хранилищем (в этом процессе);
+        # не больше MAX_VALIDATED_NAMES имён, давно сверенные вытесняются
+        self._validated = OrderedDict()
+        self._validated_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def _create_client(self):
+        if self.endpoint_url and self.endpoint_url.startswith('file://'):
+            return FilesystemObjectClient(self.endpoint_url[len('file://'):])
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise ImportError("Для ObjectStorage с S3 нужен пакет boto3 (pip install boto3)")
+        return boto3.client(
+            's3',
+            endpoint_url=self.endpoint_url,
+            aws_access_key_id=self.access_key,
+            aws_secret_access_key=self.secret_key,
+            region_name=self.region,
+            # Пул соединений рассчитан на параллельную загрузку частей
+            config=Config(max_pool_connections=max(10, self.max_workers * 2)),
+        )
+
+    def _key(self, name):
+        name = name.replace('\\', '/').lstrip('/')
+        return f'{self.location}/{name}' if self.location else name
+
+    def _head(self, name):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except Exception as error:
+            if is_not_found(error):
+                return None
+            raise
+
+    def _save(self, name, content):
+        if hasattr(content, 'seekable') and content.seekable():
+            content.seek(0)
+        key = self._key(name)
+        first = content.read(self.part_size)
+        if len(first) < self.part_size:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=first)
+        else:
+            self._multipart_upload(key, first, content)
+        if self.cache:
+            self.cache.discard(name)
+        self._forget_validated(name)
+        return name
+
+    def _multipart_upload(self, key, first, content):
+        """
+        Загружает файл частями в несколько потоков
+
+        Части читаются из content по очереди; в памяти одновременно находится
+        не больше max_workers + 1 частей.
+        """
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)['UploadId']
+
+        def upload(number, data):
+            response = self.client.upload_part(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=data,
+            )
+            return {'ETag': response['ETag'], 'PartNumber': number}
+
+        parts = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                pending = set()
+                number = 1
+                data = first
+                while data:
+                    if len(pending) >= self.max_workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        parts.extend(future.result() for future in done)
+                    pending.add(executor.submit(upload, number, data))
+                    number += 1
+                    data = content.read(self.part_size)
+                parts.extend(future.result() for future in pending)
+            parts.sort(key=lambda part: part['PartNumber'])
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts},
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+
+    def _cached_path(self, name):
+        """
+        Путь к актуальной копии файла в локальном кэше, при необходимости
+        скачивает файл. None - файл слишком большой для кэша.
+        """
+        path = self.cache.get(name)
+        with self._validated_lock:
+            validated = self._validated.get(name, float('-inf'))
+        if path is not None and time.monotonic() - validated < self.cache_ttl:
+            return path
+
+        meta = self._head(name)
+        if meta is None:
+            self.cache.discard(name)
+            raise FileNotFoundError(f"Файл не найден в хранилище: {name}")
+        modified = meta['LastModified'].timestamp()
+        # Время изменения в S3 хранится с точностью до секунды
+        if path is None or abs(os.path.getmtime(path) - modified) > 0.001:
+            if meta['ContentLength'] > self.cache_max_file_size:
+                return None
+            body = self.client.get_object(Bucket=self.bucket, Key=self._key(name))['Body']
+            try:
+                path = self.cache.put(name, body, modified)
+            finally:
+                body.close()
+        with self._validated_lock:
+            self._validated[name] = time.monotonic()
+            self._validated.move_to_end(name)
+            while len(self._validated) > MAX_VALIDATED_NAMES:
+                self._validated.popitem(last=False)
+        return path
+
+    def _forget_validated(self, name):
+        with self._validated_lock:
+            self._validated.pop(name, None)
+
+    def local_path(self, name):
+        """
+        Локальный путь к копии файла (для библиотек, которым нужен путь, например шаблоны QR)
+
+        Returns:
+            str: Путь к файлу в кэше; файла может не быть, если его нет в хранилище
+        """
+        if not self.cache:
+            raise NotImplementedError("Для local_path нужен cache_dir")
+        try:
+            path = self._cached_path(name)
+        except FileNotFoundError:
+            return self.cache.path(name)
+        if path is None:
+            raise ValueError(f"Файл слишком большой для локального кэша: {name}")
+        return path
+
+    def _open(self, name, mode='rb'):
+        if 'w' in mode or 'a' in mode or '+' in mode:
+            raise ValueError("ObjectStorage открывает файлы только для чтения")
+        if self.cache:
+            path = self._cached_path(name)
+            if path is not None:
+                return File(open(path, 'rb'), name)
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(name))
+        except Exception as error:
+            if is_not_found(error):
+                raise FileNotFoundError(f"Файл не найден в хранилище: {name}")
+            raise
+        # Тело ответа читается по мере обращения, без загрузки целиком
+        file = File(response['Body'], name)
+        file.size = response['ContentLength']
+        return file
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+        if self.cache:
+            self.cache.discard(name)
+        self._forget_validated(name)
+
+    def exists(self, name):
+        return self._head(name) is not None
+
+    def size(self, name):
+        meta = self._head(name)
+        if meta is None:
+            raise FileNotFoundError(f"Файл не найден в хранилище: {name}")
+        return meta['ContentLength']
+
+    def get_modified_time(self, name):
+        meta = self._head(name)
+        if meta is None:
+            raise FileNotFoundError(f"Файл не найден в хранилище: {name}")
+        return meta['LastModified']
+
+    def listdir(self, path):
+        prefix = self._key(path).rstrip('/')
+        prefix = f'{prefix}/' if prefix else ''
+        directories, files = [], []
+        params = {'Bucket': self.bucket, 'Prefix': prefix, 'Delimiter': '/'}
+        while True:
+            response = self.client.list_objects_v2(**params)
+            directories += [item['Prefix'][len(prefix):].rstrip('/') for item in response.get('CommonPrefixes', [])]
+            files += [item['Key'][len(prefix):] for item in response.get('Contents', [])]
+            if not response.get('IsTruncated'):
+                return directories, files
+            params['ContinuationToken'] = response['NextContinuationToken']
+
+    def url(self, name):
+        if self.base_url is not None:
+            return urljoin(self.base_url, name.lstrip('/'))
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self._key(name)},
+            ExpiresIn=self.url_expires,
+        )
+
+
+def media_file_path(name):
+    """
+    Локальный путь к медиафайлу: в MEDIA_ROOT или в кэше объектного хранилища
+
+    Args:
+        name (str): Имя файла относительно MEDIA_ROOT
+
+    Returns:
+        str: Путь к файлу на диске
+    """
+    from django.core.files.storage import default_storage
+
+    local_path = getattr(default_storage, 'local_path', None)
+    if local_path is not None:
+        return local_path(name)
+    return os.path.join(settings.MEDIA_ROOT, name)
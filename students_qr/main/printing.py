@@ -0,0 +1,298 @@
+# students/printing.py
+import hashlib
+import os
+import re
+import time
+from functools import lru_cache
+from io import BytesIO
+from django.conf import settings
+from django.urls import reverse
+from PIL import Image, ImageDraw, features
+from .object_storage import LocalFileCache
+from .qr_generator import load_font, make_qr_image
+
+# Версия макета: при изменении вёрстки страниц кэш автоматически устаревает
+LAYOUT_VERSION = 2
+
+# Лист A4 при 150 dpi
+PAGE_WIDTH = 1240
+PAGE_HEIGHT = 1754
+PAGE_WIDTH_PT = 595.28
+PAGE_HEIGHT_PT = 841.89
+MARGIN = 100
+QR_SIZE = 300
+JPEG_QUALITY = 90
+
+# Кэш отрисованных страниц: вне MEDIA_ROOT (страницы содержат паспортные данные)
+# и с ограничением размера (settings.PRINT_CACHE_DIR, settings.PRINT_CACHE_SIZE)
+DEFAULT_CACHE_DIR = os.path.join(settings.BASE_DIR, 'cache', 'print')
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+# Арабские буквы и их формы представления
+ARABIC_RE = re.compile(r'[\u0600-\u06FF\u0750-\u077F\uFB50-\uFDFF\uFE70-\uFEFF]')
+
+
+def document_url(document, base_url=''):
+    """
+    Возвращает ссылку проверки документа (та же, что кодируется в QR-коде)
+
+    Args:
+        document: Объект справки или диплома
+        base_url (str): Адрес сайта, например https://example.com
+
+    Returns:
+        str: Абсолютная (при указании base_url) ссылка на документ
+    """
+    if hasattr(document, 'certificate_number'):
+        path = reverse('students:certificate_detail', args=[document.student_id, document.id])
+    else:
+        path = reverse('students:diploma_detail', args=[document.student_id, document.id])
+    return base_url.rstrip('/') + path
+
+
+def document_fields(document):
+    """
+    Собирает данные документа и его владельца для печати
+
+    Args:
+        document: Объект справки или диплома
+
+    Returns:
+        tuple: Заголовок и список пар (подпись, значение)
+    """
+    student = document.student
+    fields = [
+        ('ФИО', student.full_name_english),
+        ('ФИО (араб.)', student.full_name_arabic),
+        ('Номер паспорта', student.passport_number),
+        ('Дата рождения', student.birth_date.strftime('%d.%m.%Y')),
+        ('Гражданство', student.citizenship),
+    ]
+    if hasattr(document, 'certificate_number'):
+        title = f"СПРАВКА № {document.certificate_number}"
+        fields += [
+            ('Тип справки', document.get_certificate_type_display()),
+            ('Дата выдачи', document.issue_date.strftime('%d.%m.%Y')),
+            ('Учебное учреждение', document.issuing_institution),
+            ('Направление', document.major),
+            ('Уровень образования', document.get_education_level_display()),
+            ('Курс', str(document.course or '')),
+            ('Форма обучения', document.get_study_form_display()),
+            ('Период обучения', f"{document.study_period_start:%d.%m.%Y} – {document.study_period_end:%d.%m.%Y}"),
+            ('Действительна до', document.certificate_validity_period.strftime('%d.%m.%Y')
+                if document.certificate_validity_period else ''),
+            ('Цель выдачи', document.get_purpose_display()),
+        ]
+    else:
+        title = f"ДИПЛОМ {document.diploma_series} № {document.diploma_number}"
+        fields += [
+            ('Тип диплома', document.get_diploma_type_display()),
+            ('Регистрационный номер', document.registration_number),
+            ('Дата выдачи', document.issue_date.strftime('%d.%m.%Y')),
+            ('Направление', document.major),
+            ('Уровень образования', document.get_education_level_display()),
+            ('Организация', document.issuing_organization),
+            ('Статус', document.get_document_status_display()),
+        ]
+    return title, fields
+
+
+@lru_cache(maxsize=None)
+def has_raqm():
+    return features.check('raqm')
+
+
+def visual_text(text):
+    """
+    Готовит текст к отрисовке через PIL
+
+    С libraqm Pillow сам соединяет арабские буквы и расставляет направление
+    письма. Без неё буквы приводятся к контекстным формам (arabic_reshaper)
+    и переставляются в порядок отображения справа налево (python-bidi).
+
+    Args:
+        text (str): Исходный текст
+
+    Returns:
+        str: Текст для draw.text
+    """
+    if not text or has_raqm() or not ARABIC_RE.search(text):
+        return text
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+    return get_display(arabic_reshaper.reshape(text))
+
+
+def render_page(title, fields, link):
+    """
+    Рисует страницу документа: заголовок, данные и QR-код
+
+    Args:
+        title (str): Заголовок документа
+        fields (list): Пары (подпись, значение)
+        link (str): Ссылка для QR-кода
+
+    Returns:
+        bytes: Страница в формате JPEG
+    """
+    page = Image.new('RGB', (PAGE_WIDTH, PAGE_HEIGHT), 'white')
+    draw = ImageDraw.Draw(page)
+    title_font = load_font(48)
+    label_font = load_font(28)
+
+    title = visual_text(title)
+    title_x = (PAGE_WIDTH - draw.textlength(title, font=title_font)) // 2
+    draw.text((title_x, MARGIN), title, fill='black', font=title_font)
+
+    y = MARGIN + 120
+    for label, value in fields:
+        draw.text((MARGIN, y), f"{label}:", fill='#555555', font=label_font)
+        draw.text((MARGIN + 420, y), visual_text(value), fill='black', font=label_font)
+        y += 50
+
+    qr_image = make_qr_image(link, qr_size=QR_SIZE)
+    qr_x = PAGE_WIDTH - MARGIN - QR_SIZE
+    qr_y = PAGE_HEIGHT - MARGIN - QR_SIZE - 40
+    page.paste(qr_image, (qr_x, qr_y))
+    caption_font = load_font(18)
+    caption_x = PAGE_WIDTH - MARGIN - draw.textlength(link, font=caption_font)
+    draw.text((max(MARGIN, caption_x), qr_y + QR_SIZE + 10), link, fill='black', font=caption_font)
+
+    buffer = BytesIO()
+    page.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+def page_hash(title, fields, link):
+    """
+    Хэш содержимого страницы (ключ кэша отрисованных страниц)
+    """
+    digest = hashlib.sha256(f"{LAYOUT_VERSION}\n{title}\n{link}\n".encode('utf-8'))
+    for label, value in fields:
+        digest.update(f"{label}\t{value}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def page_cache():
+    return LocalFileCache(
+        getattr(settings, 'PRINT_CACHE_DIR', DEFAULT_CACHE_DIR),
+        getattr(settings, 'PRINT_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+    )
+
+
+def get_page(document, base_url=''):
+    """
+    Возвращает страницу документа, используя кэш по хэшу содержимого
+
+    Args:
+        document: Объект справки или диплома
+        base_url (str): Адрес сайта для ссылки в QR-коде
+
+    Returns:
+        bytes: Страница в формате JPEG
+    """
+    title, fields = document_fields(document)
+    link = document_url(document, base_url)
+    name = f"{page_hash(title, fields, link)}.jpg"
+
+    cache = page_cache()
+    cached_path = cache.get(name)
+    if cached_path is not None:
+        try:
+            with open(cached_path, 'rb') as cached:
+                return cached.read()
+        except FileNotFoundError:
+            # Файл мог вытеснить другой процесс
+            pass
+
+    data = render_page(title, fields, link)
+    cache.put(name, BytesIO(data), time.time())
+    return data
+
+
+def stream_pdf(pages):
+    """
+    Собирает многостраничный PDF, отдавая его по частям
+
+    В памяти одновременно находится только одна страница: объекты PDF
+    записываются по мере поступления, дерево страниц и таблица
+    ссылок - в конце.
+
+    Args:
+        pages: Итератор страниц в формате JPEG (bytes)
+
+    Yields:
+        bytes: Очередной фрагмент PDF-файла
+    """
+    offsets = {}
+    position = 0
+    page_ids = []
+
+    def write_object(number, body):
+        nonlocal position
+        offsets[number] = position
+        chunk = f"{number} 0 obj\n".encode('ascii') + body + b"\nendobj\n"
+        position += len(chunk)
+        return chunk
+
+    header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    position += len(header)
+    yield header
+    # 1 - каталог, 2 - дерево страниц (пишется последним)
+    yield write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    number = 3
+    for jpeg in pages:
+        with Image.open(BytesIO(jpeg)) as image:
+            width, height = image.size
+        image_id, content_id, page_id = number, number + 1, number + 2
+        number += 3
+
+        yield write_object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode "
+            f"/Length {len(jpeg)} >>\nstream\n"
+        ).encode('ascii') + jpeg + b"\nendstream")
+
+        content = f"q {PAGE_WIDTH_PT} 0 0 {PAGE_HEIGHT_PT} 0 0 cm /Im0 Do Q".encode('ascii')
+        yield write_object(content_id, (
+            f"<< /Length {len(content)} >>\nstream\n"
+        ).encode('ascii') + content + b"\nendstream")
+
+        yield write_object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH_PT} {PAGE_HEIGHT_PT}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode('ascii'))
+        page_ids.append(page_id)
+
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+    yield write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode('ascii'))
+
+    xref_position = position
+    xref = [f"xref\n0 {number}\n", "0000000000 65535 f \n"]
+    for object_id in range(1, number):
+        xref.append(f"{offsets[object_id]:010d} 00000 n \n")
+    xref.append(f"trailer\n<< /Size {number} /Root 1 0 R >>\nstartxref\n{xref_position}\n%%EOF\n")
+    yield ''.join(xref).encode('ascii')
+
+
+def print_documents(certificates=(), diplomas=(), base_url=''):
+    """
+    Формирует PDF для выбранных справок и дипломов
+
+    Args:
+        certificates: QuerySet справок
+        diplomas: QuerySet дипломов
+        base_url (str): Адрес сайта для ссылок в QR-кодах
+
+    Returns:
+        generator: Фрагменты PDF-файла (bytes)
+    """
+    def pages():
+        for queryset in (certificates, diplomas):
+            if hasattr(queryset, 'select_related'):
+                queryset = queryset.select_related('student').order_by('student__full_name_english', 'pk').iterator(chunk_size=100)
+            for document in queryset:
+                yield get_page(document, base_url)
+
+    return stream_pdf(pages())
@@ -3,20 +3,33 @@ import qrcode
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
 from django.core.files.base import ContentFile
-import datetime
-import os
 from django.conf import settings
+import datetime
+
+# Форматы файлов QR-кодов
+QR_FORMATS = ('png', 'webp', 'svg')
+
+# Формат по умолчанию для каждого назначения (переопределяется settings.QR_OUTPUT_FORMATS)
+DEFAULT_OUTPUT_FORMATS = {
+    'print': 'png',
+    'web': 'webp',
+}
 
-def generate_qr_code(link, qr_size=300):
+# Усилие сжатия WebP без потерь (0-6): выдача документа ждёт сохранения QR-кода.
+# method=6 на шаблоне справки занимает больше секунды, method=4 - десятки
+# миллисекунд при файле крупнее примерно на 5%
+WEBP_METHOD = 4
+
+def make_qr_image(link, qr_size=300):
     """
-    Генерирует QR-код из ссылки
+    Строит изображение QR-кода из ссылки
     
     Args:
         link (str): Ссылка для кодирования в QR-код
         qr_size (int): Размер QR-кода в пикселях
     
     Returns:
-        BytesIO: Объект с изображением QR-кода
+        Image: Изображение QR-кода (PIL)
     """
     # Создаем объект QRCode
     qr = qrcode.QRCode(
@@ -31,139 +44,205 @@ def generate_qr_code(link, qr_size=300):
     qr.make(fit=True)
     
     # Создаем изображение
-    qr_image = qr.make_image(fill_color="black", back_color="white")
+    qr_image = qr.make_image(fill_color="black", back_color="white").get_image()
     
     # Изменяем размер если нужно
     if qr_size != 300:
-        qr_image = qr_image.resize((qr_size, qr_size))
+        qr_image = qr_image.resize((qr_size, qr_size), Image.Resampling.NEAREST)
     
-    # Сохраняем в BytesIO
-    buffer = BytesIO()
-    qr_image.save(buffer, format='PNG')
-    buffer.seek(0)
-    
-    return buffer
+    return qr_image
 
-def add_qr_to_template(template_path, link):
+def get_output_format(use='print'):
     """
-    Добавляет QR-код и дату-время (слитно) на шаблонное изображение
+    Возвращает формат файла для назначения (печать или веб)
     
     Args:
-        template_path (str): Путь к шаблонному изображению
-        link (str): Ссылка для QR-кода
+        use (str): Назначение: 'print' или 'web'
     
     Returns:
-        BytesIO: Объект с финальным изображением
+        str: Формат из QR_FORMATS
     """
-    # Открываем шаблонное изображение
-    template = Image.open(template_path)
+    formats = {**DEFAULT_OUTPUT_FORMATS, **getattr(settings, 'QR_OUTPUT_FORMATS', {})}
+    output_format = formats.get(use, 'png')
+    if output_format not in QR_FORMATS:
+        raise ValueError(f"Неизвестный формат QR-кода: {output_format}")
+    return output_format
+
+def save_image(image, output_format='png'):
+    """
+    Сохраняет растровое изображение с оптимизацией под формат
     
-    # Генерируем QR-код
-    qr_buffer = generate_qr_code(link, qr_size=250)
-    qr_image = Image.open(qr_buffer)
+    PNG: чистый QR-код сохраняется в 1 бит на пиксель, изображение на шаблоне -
+    в палитру, только если в нём не больше 256 цветов (без потерь), иначе
+    в полном цвете; WebP: сжатие без потерь (чёткие края модулей QR-кода).
     
-    # Получаем текущую дату и время и объединяем слитно
-    current_time = datetime.datetime.now()
-    datetime_string = current_time.strftime("%d%m%Y%H%M%S")
+    Args:
+        image (Image): Изображение (PIL)
+        output_format (str): 'png' или 'webp'
     
-    # Позиция для QR-кода (центрируем по горизонтали)
-    qr_x = (template.width - qr_image.width) // 2
-    qr_y = 100  # Отступ сверху
+    Returns:
+        BytesIO: Объект с изображением
+    """
+    buffer = BytesIO()
+    if output_format == 'png':
+        if image.mode == 'RGB' and image.getcolors(256) is not None:
+            # Палитра ADAPTIVE точно передаёт изображение, в котором до 256 цветов
+            image = image.convert('P', palette=Image.Palette.ADAPTIVE, colors=256)
+        image.save(buffer, format='PNG', optimize=True)
+    elif output_format == 'webp':
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        image.save(buffer, format='WEBP', lossless=True, quality=80, method=WEBP_METHOD)
+    else:
+        raise ValueError(f"Формат {output_format} не поддерживается для растровых изображений")
+    buffer.seek(0)
+    return buffer
+
+def generate_qr_code(link, qr_size=300, output_format='png'):
+    """
+    Генерирует QR-код из ссылки
     
-    # Вставляем QR-код на шаблон
-    template.paste(qr_image, (qr_x, qr_y))
+    Args:
+        link (str): Ссылка для кодирования в QR-код
+        qr_size (int): Размер QR-кода в пикселях (для SVG не используется)
+        output_format (str): 'png', 'webp' или 'svg'
     
-    # Добавляем текст с датой-временем
-    draw = ImageDraw.Draw(template)
+    Returns:
+        BytesIO: Объект с изображением QR-кода
+    """
+    if output_format == 'svg':
+        import qrcode.image.svg
+        
+        qr = qrcode.QRCode(
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            border=4,
+            image_factory=qrcode.image.svg.SvgPathImage,
+        )
+        qr.add_data(link)
+        qr.make(fit=True)
+        
+        buffer = BytesIO()
+        qr.make_image().save(buffer)
+        buffer.seek(0)
+        return buffer
     
-    try:
-        # Пробуем использовать системный шрифт
-        font = ImageFont.truetype("arial.ttf", 24)
-    except:
+    return save_image(make_qr_image(link, qr_size), output_format)
+
+def load_font(size, font_names=("arial.ttf", "DejaVuSans.ttf")):
+    """
+    Загружает первый доступный шрифт заданного размера
+    
+    Args:
+        size (int): Размер шрифта
+        font_names (tuple): Имена или пути шрифтов в порядке предпочтения
+    
+    Returns:
+        ImageFont: Шрифт (стандартный, если ни один из указанных недоступен)
+    """
+    for font_name in font_names:
         try:
-            # Пробуем другой распространенный шрифт
-            font = ImageFont.truetype("DejaVuSans.ttf", 24)
-        except:
-            # Если системные шрифты недоступны, используем стандартный
-            font = ImageFont.load_default()
+            return ImageFont.truetype(font_name, size)
+        except OSError:
+            continue
+    # Если шрифты недоступны, используем стандартный
+    return ImageFont.load_default()
+
+def add_qr_to_template(template_path, link, output_format='png'):
+    """
+    Добавляет QR-код и дату-время (слитно) на шаблонное изображение
     
-    # Рассчитываем позицию для текста (под QR-кодом)
-    text_x = (template.width - draw.textlength(datetime_string, font=font)) // 2
-    text_y = qr_y + qr_image.height + 20
+    Использует макет по умолчанию с указанным шаблоном.
     
-    # Рисуем текст
-    draw.text((text_x, text_y), datetime_string, fill="black", font=font)
+    Args:
+        template_path (str): Путь к шаблонному изображению
+        link (str): Ссылка для QR-кода
+        output_format (str): 'png' или 'webp'
     
-    # Возвращаем BytesIO
-    buffer = BytesIO()
-    template.save(buffer, format='PNG')
-    buffer.seek(0)
-    return buffer
+    Returns:
+        BytesIO: Объект с финальным изображением
+    """
+    from .qr_layouts import compile_layout_for_template, render_layout
+    
+    return render_layout(compile_layout_for_template(template_path), link, output_format=output_format)
 
-def generate_certificate_qr(certificate, request):
+def generate_certificate_qr(certificate, request, use='print', save=True):
     """
     Генерирует QR-код для справки и сохраняет в модель
     
     Args:
         certificate: Объект справки
         request: HttpRequest для построения абсолютного URL
+        use (str): Назначение QR-кода ('print' или 'web'), определяет формат файла
+        save (bool): Сохранить объект в БД (False - для последующего bulk_update)
     """
     try:
         # Создаем абсолютный URL для справки
         certificate_url = request.build_absolute_uri(
-            f'/student/{certificate.student.id}/certificate/{certificate.id}/'
+            f'/student/{certificate.student_id}/certificate/{certificate.id}/'
         )
         
-        # Путь к шаблону
-        template_path = os.path.join(settings.MEDIA_ROOT, 'shablon', 'best.png')
-        
-        # Проверяем существование шаблона
-        if not os.path.exists(template_path):
-            raise FileNotFoundError(f"Шаблон не найден: {template_path}")
+        output_format = get_output_format(use)
         
-        # Генерируем изображение с QR-кодом
-        qr_image_buffer = add_qr_to_template(template_path, certificate_url)
+        if output_format == 'svg':
+            # Векторный QR-код без шаблона
+            qr_image_buffer = generate_qr_code(certificate_url, output_format='svg')
+        else:
+            # Макет выбирается по типу документа и выдавшему учреждению
+            from .qr_layouts import get_layout, render_layout
+            
+            layout = get_layout('certificate', certificate.issuing_institution)
+            
+            # Генерируем изображение с QR-кодом
+            qr_image_buffer = render_layout(layout, certificate_url, output_format=output_format)
         
         # Создаем имя файла
-        filename = f"certificate_qr_{certificate.certificate_number}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+        filename = f"certificate_qr_{certificate.certificate_number}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.{output_format}"
         
         # Сохраняем в поле модели
-        certificate.certificate_qr.save(filename, ContentFile(qr_image_buffer.read()), save=True)
+        certificate.certificate_qr_format = output_format
+        certificate.certificate_qr.save(filename, ContentFile(qr_image_buffer.read()), save=save)
         
         return True
     except Exception as e:
         print(f"Ошибка при генерации QR-кода для справки: {e}")
         return False
 
-def generate_diploma_qr(diploma, request):
+def generate_diploma_qr(diploma, request, use='print', save=True):
     """
     Генерирует QR-код для диплома и сохраняет в модель
     
     Args:
         diploma: Объект диплома
         request: HttpRequest для построения абсолютного URL
+        use (str): Назначение QR-кода ('print' или 'web'), определяет формат файла
+        save (bool): Сохранить объект в БД (False - для последующего bulk_update)
     """
     try:
         # Создаем абсолютный URL для диплома
         diploma_url = request.build_absolute_uri(
-            f'/student/{diploma.student.id}/diploma/{diploma.id}/'
+            f'/student/{diploma.student_id}/diploma/{diploma.id}/'
         )
         
-        # Путь к шаблону
-        template_path = os.path.join(settings.MEDIA_ROOT, 'shablon', 'best.png')
-        
-        # Проверяем существование шаблона
-        if not os.path.exists(template_path):
-            raise FileNotFoundError(f"Шаблон не найден: {template_path}")
+        output_format = get_output_format(use)
         
-        # Генерируем изображение с QR-кодом
-        qr_image_buffer = add_qr_to_template(template_path, diploma_url)
+        if output_format == 'svg':
+            # Векторный QR-код без шаблона
+            qr_image_buffer = generate_qr_code(diploma_url, output_format='svg')
+        else:
+            # Макет выбирается по типу документа и выдавшему учреждению
+            from .qr_layouts import get_layout, render_layout
+            
+            layout = get_layout('diploma', diploma.issuing_organization)
+            
+            # Генерируем изображение с QR-кодом
+            qr_image_buffer = render_layout(layout, diploma_url, output_format=output_format)
         
         # Создаем имя файла
-        filename = f"diploma_qr_{diploma.diploma_number}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+        filename = f"diploma_qr_{diploma.diploma_number}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.{output_format}"
         
         # Сохраняем в поле модели
-        diploma.diploma_qr.save(filename, ContentFile(qr_image_buffer.read()), save=True)
+        diploma.diploma_qr_format = output_format
+        diploma.diploma_qr.save(filename, ContentFile(qr_image_buffer.read()), save=save)
         
         return True
     except Exception as e:
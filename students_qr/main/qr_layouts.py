@@ -0,0 +1,246 @@
+# students/qr_layouts.py
+import datetime
+import os
+import threading
+import time
+from collections import namedtuple
+from django.conf import settings
+from PIL import Image, ImageDraw
+from .object_storage import media_file_path
+from .qr_generator import load_font, make_qr_image, save_image
+
+# Макет по умолчанию повторяет исходное оформление: шаблон shablon/best.png,
+# QR-код 250x250 по центру на высоте 100, под ним дата-время слитно
+DEFAULT_LAYOUT = {
+    'template': 'shablon/best.png',
+    'qr_x': None,           # None - по центру шаблона
+    'qr_y': 100,
+    'qr_size': 250,
+    'caption_x': None,      # None - по центру шаблона
+    'caption_y': None,      # None - сразу под QR-кодом с отступом caption_gap
+    'caption_gap': 20,
+    'caption_format': '%d%m%Y%H%M%S',
+    'font': ('arial.ttf', 'DejaVuSans.ttf'),
+    'font_size': 24,
+    'fill': 'black',
+}
+
+# Подготовленный к отрисовке макет: декодированный шаблон, загруженный шрифт
+# и заранее вычисленные координаты
+CompiledLayout = namedtuple('CompiledLayout', [
+    'name',
+    'base',
+    'font',
+    'qr_position',
+    'qr_size',
+    'caption_x',
+    'caption_y',
+    'caption_format',
+    'fill',
+    'mtime',
+])
+
+# Как часто (в секундах) проверяется, не заменён ли шаблон на диске;
+# между проверками отрисовка не обращается к файловой системе
+TEMPLATE_CHECK_INTERVAL = 30
+
+_compiled = {}
+_checked_at = {}
+_lock = threading.Lock()
+
+
+def get_layout_definitions():
+    """
+    Возвращает описания макетов: settings.QR_LAYOUTS поверх макета по умолчанию
+
+    Returns:
+        dict: Имя макета -> полное описание
+    """
+    definitions = {'default': dict(DEFAULT_LAYOUT)}
+    for name, definition in getattr(settings, 'QR_LAYOUTS', {}).items():
+        definitions[name] = {**DEFAULT_LAYOUT, **definition}
+    return definitions
+
+
+def _normalize(value):
+    return ' '.join((value or '').lower().split())
+
+
+def select_layout_name(document_type, institution=''):
+    """
+    Выбирает имя макета по типу документа и выдавшему учреждению
+
+    Правила берутся из settings.QR_LAYOUT_RULES - список словарей с ключами
+    document_type, institution (любой из них может отсутствовать) и layout.
+    Побеждает первое подходящее правило, иначе используется 'default'.
+
+    Args:
+        document_type (str): 'certificate' или 'diploma'
+        institution (str): Учреждение, выдавшее документ
+
+    Returns:
+        str: Имя макета
+    """
+    institution = _normalize(institution)
+    for rule in getattr(settings, 'QR_LAYOUT_RULES', []):
+        if rule.get('document_type') and rule['document_type'] != document_type:
+            continue
+        if rule.get('institution') and _normalize(rule['institution']) != institution:
+            continue
+        return rule['layout']
+    return 'default'
+
+
+def compile_layout(name, definition, template_path):
+    """
+    Подготавливает макет к отрисовке
+
+    Шаблон декодируется, шрифт загружается, координаты вычисляются один раз;
+    отрисовка после этого сводится к вставке QR-кода и подписи.
+
+    Args:
+        name (str): Имя макета
+        definition (dict): Описание макета
+        template_path (str): Путь к шаблонному изображению
+
+    Returns:
+        CompiledLayout: Подготовленный макет
+    """
+    # Проверяем существование шаблона
+    try:
+        mtime = os.stat(template_path).st_mtime
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Шаблон не найден: {template_path}")
+
+    with Image.open(template_path) as template:
+        # Прозрачность палитровых (P) шаблонов задаётся в info['transparency'],
+        # а не отдельным каналом: без RGBA она теряется при конвертации
+        transparent = (
+            template.mode == 'P'
+            or 'A' in template.getbands()
+            or 'transparency' in template.info
+        )
+        base = template.convert('RGBA' if transparent else 'RGB')
+
+    qr_size = definition['qr_size']
+    qr_x = definition['qr_x']
+    if qr_x is None:
+        qr_x = (base.width - qr_size) // 2
+    qr_y = definition['qr_y']
+
+    caption_y = definition['caption_y']
+    if caption_y is None:
+        caption_y = qr_y + qr_size + definition['caption_gap']
+
+    return CompiledLayout(
+        name=name,
+        base=base,
+        font=load_font(definition['font_size'], tuple(definition['font'])),
+        qr_position=(qr_x, qr_y),
+        qr_size=qr_size,
+        caption_x=definition['caption_x'],
+        caption_y=caption_y,
+        caption_format=definition['caption_format'],
+        fill=definition['fill'],
+        mtime=mtime,
+    )
+
+
+def _template_mtime(template_path):
+    try:
+        return os.stat(template_path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _get_compiled(cache_key, name, definition, template_path):
+    compiled = _compiled.get(cache_key)
+    if compiled is not None:
+        now = time.monotonic()
+        if now - _checked_at.get(cache_key, 0) < TEMPLATE_CHECK_INTERVAL:
+            return compiled
+        # Шаблон, заменённый на диске, перекомпилируется; удалённый - остаётся в памяти
+        mtime = _template_mtime(template_path)
+        if mtime is None or mtime == compiled.mtime:
+            _checked_at[cache_key] = now
+            return compiled
+    with _lock:
+        compiled = compile_layout(name, definition, template_path)
+        _compiled[cache_key] = compiled
+        _checked_at[cache_key] = time.monotonic()
+    return compiled
+
+
+def get_layout(document_type, institution=''):
+    """
+    Возвращает подготовленный макет для документа
+
+    Args:
+        document_type (str): 'certificate' или 'diploma'
+        institution (str): Учреждение, выдавшее документ
+
+    Returns:
+        CompiledLayout: Подготовленный макет
+    """
+    definitions = get_layout_definitions()
+    name = select_layout_name(document_type, institution)
+    if name not in definitions:
+        name = 'default'
+    definition = definitions[name]
+    template_path = media_file_path(definition['template'])
+    return _get_compiled(('layout', name), name, definition, template_path)
+
+
+def compile_layout_for_template(template_path):
+    """
+    Возвращает макет по умолчанию с произвольным шаблоном
+
+    Args:
+        template_path (str): Путь к шаблонному изображению
+
+    Returns:
+        CompiledLayout: Подготовленный макет
+    """
+    return _get_compiled(('template', template_path), 'default', DEFAULT_LAYOUT, template_path)
+
+
+def warm_up_layouts():
+    """
+    Заранее подготавливает все описанные макеты
+
+    Returns:
+        list: Имена подготовленных макетов
+    """
+    compiled = []
+    for name, definition in get_layout_definitions().items():
+        template_path = media_file_path(definition['template'])
+        if _template_mtime(template_path) is not None:
+            _get_compiled(('layout', name), name, definition, template_path)
+            compiled.append(name)
+    return compiled
+
+
+def render_layout(layout, link, now=None, output_format='png'):
+    """
+    Отрисовывает QR-код и подпись с датой-временем на подготовленном макете
+
+    Args:
+        layout (CompiledLayout): Подготовленный макет
+        link (str): Ссылка для QR-кода
+        now (datetime): Время для подписи (по умолчанию текущее)
+        output_format (str): 'png' или 'webp'
+
+    Returns:
+        BytesIO: Объект с финальным изображением
+    """
+    image = layout.base.copy()
+    image.paste(make_qr_image(link, qr_size=layout.qr_size), layout.qr_position)
+
+    caption = (now or datetime.datetime.now()).strftime(layout.caption_format)
+    draw = ImageDraw.Draw(image)
+    caption_x = layout.caption_x
+    if caption_x is None:
+        caption_x = (image.width - draw.textlength(caption, font=layout.font)) // 2
+    draw.text((caption_x, layout.caption_y), caption, fill=layout.fill, font=layout.font)
+
+    return save_image(image, output_format)
@@ -0,0 +1,185 @@
+# students/ratelimit.py
+import hashlib
+import math
+import time
+from functools import lru_cache, wraps
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.http import HttpResponse
+from .network import client_ip
+
+# Ограничения по маршрутам: rate - "количество/период" (s, m, h, d),
+# key - чем различаются клиенты: ip, user, user_or_ip, api_key,
+# methods - какие методы учитываются (по умолчанию все).
+# Переопределяются по имени маршрута через settings.RATE_LIMITS, rate=None отключает.
+DEFAULT_RATE_LIMITS = {
+    'login': {'rate': '10/m', 'key': 'ip', 'methods': ('POST',)},
+    'document_scan': {'rate': '60/m', 'key': 'user_or_ip'},
+    'bulk': {'rate': '30/h', 'key': 'user'},
+}
+
+# Кэш со счётчиками (settings.RATE_LIMIT_CACHE): должен быть общим для воркеров
+# (Redis/Memcached), иначе каждый воркер считает запросы отдельно
+DEFAULT_CACHE_ALIAS = 'default'
+
+KEY_PREFIX = 'ratelimit'
+API_KEY_HEADER = 'HTTP_X_API_KEY'
+
+# Бэкенды, которые хранят счётчики в памяти одного процесса
+LOCAL_CACHE_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    Разбирает строку вида "10/m"
+
+    Returns:
+        tuple: Количество запросов и период в секундах
+    """
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period.strip().lower()[0]]
+
+
+def route_limit(route):
+    limit = dict(DEFAULT_RATE_LIMITS.get(route, {}))
+    limit.update(getattr(settings, 'RATE_LIMITS', {}).get(route, {}))
+    return limit
+
+
+def client_key(request, kind):
+    """
+    Идентификатор клиента для счётчика
+
+    Args:
+        request: Запрос
+        kind (str): ip, user, user_or_ip или api_key
+
+    Returns:
+        str: Ключ клиента
+    """
+    if kind in ('user', 'user_or_ip') and request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    if kind == 'api_key' and request.META.get(API_KEY_HEADER):
+        return 'k' + hashlib.sha1(request.META[API_KEY_HEADER].encode('utf-8')).hexdigest()
+    return f"ip{client_ip(request) or ''}"
+
+
+def hit(cache, key, timeout):
+    # incr атомарен в Redis и Memcached; ключ создаётся через add,
+    # чтобы параллельные запросы не затирали значение друг друга
+    if cache.add(key, 1, timeout):
+        return 1
+    try:
+        value = cache.incr(key)
+    except ValueError:
+        # Ключ истёк между add и incr
+        if cache.add(key, 1, timeout):
+            return 1
+        value = cache.incr(key)
+    # Бэкенды без собственного incr (база, файлы) пересохраняют ключ со сроком
+    # по умолчанию: срок окна выставляется заново
+    cache.touch(key, timeout)
+    return value
+
+
+def retry_after(previous, current, elapsed, period, limit):
+    """
+    Через сколько секунд клиенту снова будет доступен один запрос
+    """
+    if current + 1 <= limit and previous:
+        # Ждём, пока вклад прошлого окна уменьшится
+        wait = period * (1 - (limit - current - 1) / previous) - elapsed
+    else:
+        # Ждём следующего окна и уменьшения вклада текущего
+        wait = period - elapsed + period * (1 - (limit - 1) / max(current, 1))
+    return max(1, math.ceil(wait))
+
+
+def check(route, request):
+    """
+    Учитывает запрос в ведре клиента и проверяет, не превышен ли лимит
+
+    Ведро хранится в кэше в виде счётчиков двух соседних окон длиной в период:
+    заполненность = счётчик текущего окна + счётчик прошлого окна с весом
+    оставшейся доли периода. Так ведро равномерно "доливается" со скоростью
+    limit / period, а каждое обращение - один атомарный incr и один get.
+
+    Args:
+        route (str): Имя ограничения (ключ RATE_LIMITS)
+        request: Запрос
+
+    Returns:
+        int: Значение Retry-After в секундах или None, если запрос разрешён
+    """
+    if not getattr(settings, 'RATE_LIMITS_ENABLED', True):
+        return None
+    config = route_limit(route)
+    if not config.get('rate'):
+        return None
+    methods = config.get('methods')
+    if methods and request.method not in methods:
+        return None
+
+    limit, period = parse_rate(config['rate'])
+    cache = caches[getattr(settings, 'RATE_LIMIT_CACHE', DEFAULT_CACHE_ALIAS)]
+    now = time.time()
+    window = int(now // period)
+    elapsed = now - window * period
+    base = f"{KEY_PREFIX}:{route}:{client_key(request, config.get('key', 'ip'))}"
+
+    current = hit(cache, f'{base}:{window}', period * 2)
+    previous = cache.get(f'{base}:{window - 1}', 0)
+    if previous * (1 - elapsed / period) + current <= limit:
+        return None
+    # Отклонённый запрос не расходует ведро
+    cache.decr(f'{base}:{window}')
+    return retry_after(previous, current - 1, elapsed, period, limit)
+
+
+def too_many_requests(seconds):
+    response = HttpResponse(
+        "Слишком много запросов. Повторите попытку позже.",
+        status=429,
+        content_type='text/plain; charset=utf-8',
+    )
+    response['Retry-After'] = str(seconds)
+    return response
+
+
+def ratelimit(route):
+    """
+    Декоратор представления, ограничивающий частоту запросов по правилу route
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            seconds = check(route, request)
+            if seconds is not None:
+                return too_many_requests(seconds)
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def check_shared_cache(app_configs=None, **kwargs):
+    """
+    Проверка manage.py check --deploy: при DEBUG=False счётчики не должны
+    храниться в локальном кэше процесса (каждый воркер считал бы запросы отдельно)
+    """
+    if settings.DEBUG or not getattr(settings, 'RATE_LIMITS_ENABLED', True):
+        return []
+    alias = getattr(settings, 'RATE_LIMIT_CACHE', DEFAULT_CACHE_ALIAS)
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in LOCAL_CACHE_BACKENDS:
+        return []
+    return [
+        checks.Error(
+            f"Кэш ограничения частоты запросов '{alias}' хранится в памяти процесса ({backend})",
+            hint='Задайте SESSION_CACHE_BACKEND или RATE_LIMIT_CACHE_BACKEND (Redis/Memcached).',
+            id='main.E001',
+        )
+    ]
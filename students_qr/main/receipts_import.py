@@ -0,0 +1,188 @@
+# students/receipts_import.py
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from .models import Student, PaymentReceipt
+from .summary import refresh_summaries
+
+# Допустимые расширения файлов чеков (как в PaymentReceiptForm)
+RECEIPT_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff')
+
+# Ограничение на размер одного файла в распакованном виде (защита от zip-бомб)
+MAX_RECEIPT_SIZE = 20 * 1024 * 1024
+
+DEFAULT_WORKERS = 4
+BULK_BATCH_SIZE = 500
+
+# Номер паспорта - начало имени файла: A1234567.pdf, A1234567_2.pdf, A1234567 (март).jpg
+PASSPORT_RE = re.compile(r'^([A-Za-z0-9]+)')
+
+# Причины, по которым файл из архива не был загружен
+REASON_NO_PASSPORT = 'в имени файла нет номера паспорта'
+REASON_EXTENSION = 'неподдерживаемый тип файла'
+REASON_TOO_LARGE = 'файл слишком большой'
+REASON_NO_STUDENT = 'студент с таким паспортом не найден'
+REASON_STORAGE = 'ошибка сохранения файла'
+
+
+def passport_from_filename(filename):
+    """
+    Извлекает номер паспорта из имени файла в архиве
+
+    Args:
+        filename (str): Путь к файлу внутри архива
+
+    Returns:
+        str: Номер паспорта в верхнем регистре или None
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    match = PASSPORT_RE.match(stem.strip())
+    return match.group(1).upper() if match else None
+
+
+def is_service_entry(info):
+    # Каталоги и служебные файлы архиваторов (macOS, Windows)
+    basename = os.path.basename(info.filename)
+    return (
+        info.is_dir()
+        or info.filename.startswith('__MACOSX/')
+        or basename.startswith('.')
+        or basename.lower() == 'thumbs.db'
+    )
+
+
+def scan_archive(archive):
+    """
+    Разбирает оглавление архива, не распаковывая файлы
+
+    Returns:
+        tuple: Список (запись, паспорт) подходящих файлов и список пропущенных (имя, причина)
+    """
+    entries = []
+    skipped = []
+    for info in archive.infolist():
+        if is_service_entry(info):
+            continue
+        if not info.filename.lower().endswith(RECEIPT_EXTENSIONS):
+            skipped.append((info.filename, REASON_EXTENSION))
+            continue
+        if info.file_size > MAX_RECEIPT_SIZE:
+            skipped.append((info.filename, REASON_TOO_LARGE))
+            continue
+        passport = passport_from_filename(info.filename)
+        if not passport:
+            skipped.append((info.filename, REASON_NO_PASSPORT))
+            continue
+        entries.append((info, passport))
+    return entries, skipped
+
+
+def match_students(passports):
+    """
+    Находит студентов по номерам паспортов одним запросом
+
+    Номера сравниваются без учёта регистра: в базе они хранятся в том виде,
+    в каком их ввели, поэтому ищутся и исходные, и приведённые значения.
+
+    Returns:
+        dict: Номер паспорта (в верхнем регистре) -> id студента
+    """
+    passports = set(passports)
+    lookup = passports | {passport.lower() for passport in passports}
+    matched = {}
+    for student_id, passport_number in Student.objects.filter(
+        passport_number__in=lookup
+    ).values_list('id', 'passport_number'):
+        matched[passport_number.upper()] = student_id
+    return matched
+
+
+def store_entry(archive, info, upload_field):
+    """
+    Копирует файл из архива в хранилище потоком, без распаковки на диск
+
+    Returns:
+        str: Имя сохранённого файла в хранилище
+    """
+    filename = upload_field.generate_filename(None, os.path.basename(info.filename))
+    with archive.open(info) as source:
+        return default_storage.save(filename, File(source, name=filename))
+
+
+def import_receipts(fileobj, workers=DEFAULT_WORKERS, dry_run=False, log=None):
+    """
+    Загружает чеки оплаты из ZIP-архива банка
+
+    Файлы называются по номеру паспорта студента. Студенты ищутся одним
+    запросом, файлы копируются в хранилище параллельно, записи PaymentReceipt
+    создаются через bulk_create.
+
+    Args:
+        fileobj: Путь к архиву или файловый объект
+        workers (int): Количество потоков для сохранения файлов
+        dry_run (bool): Только сопоставить файлы со студентами, ничего не сохраняя
+        log: Функция для вывода прогресса
+
+    Returns:
+        dict: Количество созданных чеков и список незагруженных файлов (имя, причина)
+    """
+    log = log or (lambda message: None)
+    started = time.perf_counter()
+
+    with zipfile.ZipFile(fileobj) as archive:
+        entries, unmatched = scan_archive(archive)
+        students = match_students(passport for info, passport in entries)
+        log(f"Файлов в архиве: {len(entries) + len(unmatched)}, найдено студентов: {len(students)}")
+
+        matched = []
+        for info, passport in entries:
+            if passport in students:
+                matched.append((info, students[passport]))
+            else:
+                unmatched.append((info.filename, REASON_NO_STUDENT))
+
+        receipts = []
+        if not dry_run and matched:
+            upload_field = PaymentReceipt._meta.get_field('payment_receipt')
+
+            def store(item):
+                info, student_id = item
+                try:
+                    return store_entry(archive, info, upload_field)
+                except (OSError, zipfile.BadZipFile) as error:
+                    log(f"{info.filename}: {error}")
+                    return None
+
+            # zipfile разрешает читать несколько записей одновременно,
+            # чтение архива сериализуется, запись в хранилище идёт параллельно
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                stored = list(executor.map(store, matched))
+
+            for (info, student_id), name in zip(matched, stored):
+                if name is None:
+                    unmatched.append((info.filename, REASON_STORAGE))
+                else:
+                    receipts.append(PaymentReceipt(student_id=student_id, payment_receipt=name))
+
+            try:
+                with transaction.atomic():
+                    PaymentReceipt.objects.bulk_create(receipts, batch_size=BULK_BATCH_SIZE)
+                    refresh_summaries(receipt.student_id for receipt in receipts)
+            except Exception:
+                # Записи не созданы - сохранённые файлы больше не нужны
+                for receipt in receipts:
+                    default_storage.delete(receipt.payment_receipt.name)
+                raise
+
+    return {
+        'created': len(receipts),
+        'matched': len(matched),
+        'students': len({student_id for info, student_id in matched}),
+        'unmatched': sorted(unmatched),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
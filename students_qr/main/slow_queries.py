@@ -0,0 +1,356 @@
+# students/slow_queries.py
+import contextlib
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+# Порог в миллисекундах, начиная с которого запрос считается медленным
+# (переопределяется settings.SLOW_QUERY_THRESHOLD_MS, None - отключено)
+DEFAULT_THRESHOLD_MS = 200
+
+# Как часто фоновый поток записывает накопленную статистику, секунд
+DEFAULT_FLUSH_INTERVAL = 10.0
+
+# Сколько разных отпечатков процесс держит до записи в базу
+MAX_PENDING_FINGERPRINTS = 1000
+
+MAX_SQL_LENGTH = 10000
+
+# Нормализация SQL: значения заменяются на ?, списки IN (...) и VALUES сворачиваются
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_RE = re.compile(r'%s|\?')
+IN_LIST_RE = re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE)
+VALUES_RE = re.compile(r'\bVALUES \((?:\?, )*\?\)(?:, \((?:\?, )*\?\))*', re.IGNORECASE)
+SPACE_RE = re.compile(r'\s+')
+
+# Каталог проекта: место вызова ищется среди его файлов
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Текущий HTTP-запрос (выставляет SlowQueryMiddleware через capture())
+_request = contextvars.ContextVar('slow_query_request', default=None)
+
+# Запросы самого фонового потока записи не отслеживаются
+_local = threading.local()
+
+
+def normalize_sql(sql):
+    """
+    Приводит SQL к виду без конкретных значений
+
+    Args:
+        sql (str): SQL с плейсхолдерами или значениями
+
+    Returns:
+        str: Нормализованный SQL
+    """
+    sql = SPACE_RE.sub(' ', sql).strip()
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = PLACEHOLDER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    sql = VALUES_RE.sub('VALUES (...)', sql)
+    return sql
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode('utf-8')).hexdigest()
+
+
+def call_site():
+    """
+    Ближайший к запросу кадр стека из кода проекта (не Django и не сторонних пакетов)
+
+    Returns:
+        str: "путь:строка в функции" или пустая строка
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(PROJECT_DIR)
+            and filename != __file__
+            and 'site-packages' not in filename
+        ):
+            path = os.path.relpath(filename, PROJECT_DIR)
+            return f"{path}:{frame.f_lineno} in {frame.f_code.co_name}"[:300]
+        frame = frame.f_back
+    return ''
+
+
+def view_name(request):
+    if request is None:
+        # Вне HTTP-запроса - имя команды manage.py
+        if len(sys.argv) > 1 and os.path.basename(sys.argv[0]) == 'manage.py':
+            return f'manage.py {sys.argv[1]}'[:200]
+        return ''
+    match = getattr(request, 'resolver_match', None)
+    if match is not None:
+        return (match.view_name or match._func_path)[:200]
+    return request.path[:200]
+
+
+def explain(alias, sql, params):
+    """
+    Получает план запроса
+
+    EXPLAIN ANALYZE (settings.SLOW_QUERY_EXPLAIN_ANALYZE) выполняется только
+    для SELECT на PostgreSQL и внутри транзакции, которая откатывается.
+
+    Returns:
+        str: Текст плана
+    """
+    connection = connections[alias]
+    analyze = (
+        getattr(settings, 'SLOW_QUERY_EXPLAIN_ANALYZE', False)
+        and connection.vendor == 'postgresql'
+        and sql.lstrip().upper().startswith('SELECT')
+    )
+    prefix = connection.ops.explain_query_prefix(analyze=True) if analyze else connection.ops.explain_query_prefix()
+    with transaction.atomic(using=alias):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.fetchall()
+        transaction.set_rollback(True, using=alias)
+    return '\n'.join(' '.join(str(value) for value in row) for row in rows)
+
+
+class SlowQueryStats:
+    """
+    Статистика медленных запросов процесса
+
+    Запрос только обновляет счётчики в памяти; фоновый поток раз в
+    SLOW_QUERY_FLUSH_INTERVAL секунд прибавляет их к строкам SlowQuery
+    и получает план для отпечатков, у которых его ещё нет. Представление
+    и место вызова сохраняются первые: отпечаток, встречающийся в разных
+    местах, показывает то место, где его заметили впервые.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.explained = set()
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'SLOW_QUERY_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+    def _ensure_thread(self):
+        # После fork воркера поток родителя в дочернем процессе не работает
+        if self.thread is None or self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, name='slow-query-writer', daemon=True)
+            self.thread.start()
+
+    def add(self, alias, sql, params, many, elapsed_ms, view, location):
+        normalized = normalize_sql(sql)
+        key = fingerprint(normalized)
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is None:
+                if len(self.pending) >= MAX_PENDING_FINGERPRINTS:
+                    # Предупреждение - один раз до следующей записи, итог пишет flush()
+                    if not self.dropped:
+                        logger.warning(
+                            "Накоплено %d отпечатков медленных запросов, новые отбрасываются до записи в базу",
+                            MAX_PENDING_FINGERPRINTS,
+                        )
+                    self.dropped += 1
+                    return
+                entry = self.pending[key] = {
+                    'sql': normalized[:MAX_SQL_LENGTH],
+                    'calls': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'view': view,
+                    'location': location,
+                    'sample': None,
+                }
+            entry['calls'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            # Параметры нужны только для EXPLAIN и хранятся, пока план не получен
+            if entry['sample'] is None and not many and key not in self.explained:
+                entry['sample'] = (alias, sql, params)
+            self._ensure_thread()
+        logger.warning("Медленный запрос %.0f мс [%s] %s: %s", elapsed_ms, view, location, normalized[:500])
+
+    def _run(self):
+        _local.disabled = True
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Ошибка записи статистики медленных запросов")
+            finally:
+                close_old_connections()
+
+    def requeue(self, entries):
+        """
+        Возвращает в очередь статистику, которую не удалось записать
+
+        Счётчики складываются с накопленными за это время; отпечатки сверх
+        MAX_PENDING_FINGERPRINTS отбрасываются.
+        """
+        with self.lock:
+            for key, entry in entries.items():
+                current = self.pending.get(key)
+                if current is None:
+                    if len(self.pending) >= MAX_PENDING_FINGERPRINTS:
+                        self.dropped += 1
+                        continue
+                    self.pending[key] = entry
+                    continue
+                current['calls'] += entry['calls']
+                current['total_ms'] += entry['total_ms']
+                current['max_ms'] = max(current['max_ms'], entry['max_ms'])
+                if current['sample'] is None:
+                    current['sample'] = entry['sample']
+
+    def flush(self):
+        """
+        Записывает накопленную статистику и планы новых отпечатков
+
+        Если запись прерывается ошибкой базы, незаписанные отпечатки
+        возвращаются в очередь до следующей попытки.
+
+        Returns:
+            int: Количество обновлённых отпечатков
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logger.warning("Отброшено отпечатков медленных запросов сверх предела: %d", dropped)
+        if not pending:
+            return 0
+
+        now = timezone.now()
+        unsaved = dict(pending)
+        try:
+            for key, entry in pending.items():
+                changes = {
+                    'calls': F('calls') + entry['calls'],
+                    'total_ms': F('total_ms') + entry['total_ms'],
+                    'max_ms': Greatest('max_ms', entry['max_ms']),
+                    'view': Case(When(view='', then=Value(entry['view'])), default=F('view')),
+                    'location': Case(When(location='', then=Value(entry['location'])), default=F('location')),
+                    'last_seen': now,
+                }
+                if not SlowQuery.objects.filter(fingerprint=key).update(**changes):
+                    SlowQuery.objects.get_or_create(fingerprint=key, defaults={'sql': entry['sql'], 'last_seen': now})
+                    SlowQuery.objects.filter(fingerprint=key).update(**changes)
+                del unsaved[key]
+        except DatabaseError:
+            self.requeue(unsaved)
+            raise
+
+        sampled = [key for key, entry in pending.items() if entry['sample'] is not None]
+        if not sampled:
+            return len(pending)
+        without_plan = set(
+            SlowQuery.objects.filter(fingerprint__in=sampled, plan='').values_list('fingerprint', flat=True)
+        )
+        for key in sampled:
+            if key in without_plan:
+                alias, sql, params = pending[key]['sample']
+                try:
+                    plan = explain(alias, sql, params)
+                except (DatabaseError, ValueError) as error:
+                    # Повторно не пытаемся: сохраняем причину вместо плана
+                    plan = f"EXPLAIN не выполнен: {error}"
+                SlowQuery.objects.filter(fingerprint=key, plan='').update(plan=plan)
+            # План записан (или уже был, в том числе от другого процесса):
+            # параметры этого отпечатка больше не сохраняются
+            self.explained.add(key)
+        return len(pending)
+
+
+stats = SlowQueryStats()
+
+
+def threshold_ms():
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', DEFAULT_THRESHOLD_MS)
+
+
+class QueryTimer:
+    """
+    Обёртка выполнения запросов (connection.execute_wrappers), передающая
+    медленные запросы в статистику
+
+    Ставится на каждое соединение при подключении (install_timer), поэтому
+    учитываются все запросы: сессии и аутентификация, представления,
+    команды manage.py и фоновые задачи.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        threshold = threshold_ms()
+        if threshold is None or getattr(_local, 'disabled', False):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= threshold:
+                stats.add(self.alias, sql, params, many, elapsed_ms, view_name(_request.get()), call_site())
+
+
+def install_timer(sender, connection, **kwargs):
+    """
+    Ставит QueryTimer на соединение (обработчик сигнала connection_created)
+    """
+    if not any(isinstance(wrapper, QueryTimer) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(QueryTimer(connection.alias))
+
+
+@contextlib.contextmanager
+def capture(request=None):
+    """
+    Относит медленные запросы внутри блока к запросу request (для имени представления)
+
+    Args:
+        request: Текущий запрос
+    """
+    token = _request.set(request)
+    try:
+        yield
+    finally:
+        _request.reset(token)
+
+
+def top_queries(order='total', limit=20):
+    """
+    Самые тяжёлые запросы по суммарному, максимальному, среднему времени или количеству
+
+    Returns:
+        QuerySet: Записи SlowQuery
+    """
+    orderings = {
+        'total': '-total_ms',
+        'max': '-max_ms',
+        'calls': '-calls',
+        'avg': '-avg_ms',
+    }
+    queryset = SlowQuery.objects.annotate(avg_ms=F('total_ms') / F('calls'))
+    return queryset.order_by(orderings[order], 'pk')[:limit]
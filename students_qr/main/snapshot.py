@@ -0,0 +1,342 @@
+# students/snapshot.py
+import datetime
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.apps import apps
+from django.core import serializers
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+from django.db.models import FileField
+
+SNAPSHOT_FORMAT = 2
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_WORKERS = 4
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Файлы до этого размера при чтении держатся в памяти, крупнее - во временном файле
+SPOOL_MEMORY_SIZE = 8 * 1024 * 1024
+
+MANIFEST_NAME = 'manifest.json'
+MEDIA_INDEX_NAME = 'media.json'
+
+
+def snapshot_models():
+    """
+    Модели приложения main в порядке зависимостей (сначала Student)
+    """
+    app_config = apps.get_app_config('main')
+    return serializers.sort_dependencies([(app_config, None)], allow_cycles=True)
+
+
+def file_fields(model):
+    return [field.name for field in model._meta.get_fields() if isinstance(field, FileField)]
+
+
+def local_root(storage):
+    """
+    Каталог хранилища на диске или None, если хранилище не файловое (объектное и т.п.)
+    """
+    try:
+        return storage.path('')
+    except NotImplementedError:
+        return None
+
+
+def spool_file(storage, name):
+    """
+    Читает файл хранилища один раз: считает SHA-256 и копирует содержимое во временный файл
+
+    Returns:
+        tuple: (хэш, размер, временный файл) или None, если файла нет
+    """
+    digest = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_SIZE)
+    try:
+        with storage.open(name, 'rb') as source:
+            for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+                spool.write(block)
+    except FileNotFoundError:
+        spool.close()
+        return None
+    size = spool.tell()
+    spool.seek(0)
+    return digest.hexdigest(), size, spool
+
+
+def place_file(storage, root, staged_path, name):
+    """
+    Переносит восстановленный файл на его место в хранилище
+
+    В файловом хранилище файл заменяется атомарно (os.replace), в остальных
+    существующий объект удаляется и записывается заново под тем же именем.
+    """
+    if root is not None:
+        target = storage.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f'{target}.restore-tmp'
+        shutil.copyfile(staged_path, tmp_path)
+        os.replace(tmp_path, target)
+        return
+    if storage.exists(name):
+        storage.delete(name)
+    with open(staged_path, 'rb') as source:
+        saved = storage.save(name, File(source, name))
+    if saved != name:
+        raise RuntimeError(f"Хранилище сохранило файл под другим именем: {name} -> {saved}")
+
+
+def read_manifest(path):
+    """
+    Читает манифест снимка: из архива или из файла <архив>.manifest.json рядом с ним
+    """
+    sidecar = f'{path}.manifest.json'
+    if os.path.exists(sidecar):
+        with open(sidecar, encoding='utf-8') as source:
+            return json.load(source)
+    with tarfile.open(path, 'r:*') as archive:
+        return json.load(archive.extractfile(MANIFEST_NAME))
+
+
+def _add_bytes(archive, name, data, mtime):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    archive.addfile(info, io.BytesIO(data))
+
+
+def _begin_snapshot_transaction(connection):
+    # Все чтения видят одно состояние базы
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+
+
+def write_snapshot(fileobj, name='', previous=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS,
+                   compress=False, using=DEFAULT_DB_ALIAS, log=None):
+    """
+    Записывает согласованный снимок данных main и медиафайлов в tar-поток
+
+    Порядок в архиве: data/<модель>/<пачка>.json, media/<хэш> (каждый файл
+    один раз), media.json (путь -> хэш), manifest.json. Данные и файлы
+    читаются в одной транзакции, каждый файл - один раз: хэш считается при
+    копировании во временный файл, из которого он и попадает в архив.
+
+    Args:
+        fileobj: Поток для записи архива (файл или stdout)
+        name (str): Имя снимка (записывается в манифест)
+        previous (dict): Манифест предыдущего снимка для инкрементального режима
+        chunk_size (int): Количество объектов в одной пачке данных
+        workers (int): Количество потоков для хэширования файлов
+        compress (bool): Сжимать архив gzip
+        using (str): Алиас базы данных
+        log: Функция для вывода прогресса
+
+    Returns:
+        dict: Манифест записанного снимка
+    """
+    log = log or (lambda message: None)
+    started = time.perf_counter()
+    now = int(time.time())
+    previous_hashes = set(previous['media_hashes']) if previous else set()
+
+    storage = default_storage
+    archive = tarfile.open(fileobj=fileobj, mode='w|gz' if compress else 'w|')
+    counts = {}
+    media_paths = set()
+    hashes = {}
+    missing = []
+    written = set()
+    skipped = set()
+    total_bytes = 0
+
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        _begin_snapshot_transaction(connection)
+        for model in snapshot_models():
+            label = model._meta.label_lower
+            fields = file_fields(model)
+            queryset = model._default_manager.using(using).order_by('pk')
+            counts[label] = 0
+            chunk_number = 0
+            last_pk = None
+            while True:
+                chunk_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+                chunk = list(chunk_queryset[:chunk_size])
+                if not chunk:
+                    break
+                for obj in chunk:
+                    for field_name in fields:
+                        value = getattr(obj, field_name)
+                        if value:
+                            media_paths.add(value.name)
+                data = serializers.serialize('json', chunk).encode('utf-8')
+                _add_bytes(archive, f'data/{label}/{chunk_number:06d}.json', data, now)
+                counts[label] += len(chunk)
+                chunk_number += 1
+                last_pk = chunk[-1].pk
+            log(f'{label}: {counts[label]}')
+
+        # Файлы читаются параллельно пачками по workers (во временных файлах
+        # одновременно не больше пачки) и пишутся в архив по порядку
+        paths = sorted(media_paths)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(paths), workers):
+                batch = paths[start:start + workers]
+                for path, result in zip(batch, executor.map(lambda name: spool_file(storage, name), batch)):
+                    if result is None:
+                        missing.append(path)
+                        continue
+                    digest, size, spool = result
+                    with spool:
+                        hashes[path] = digest
+                        if digest in written or digest in skipped:
+                            continue
+                        if digest in previous_hashes:
+                            skipped.add(digest)
+                            continue
+                        info = tarfile.TarInfo(f'media/{digest}')
+                        info.size = size
+                        info.mtime = now
+                        archive.addfile(info, spool)
+                        written.add(digest)
+                        total_bytes += size
+
+    _add_bytes(archive, MEDIA_INDEX_NAME, json.dumps(hashes, ensure_ascii=False).encode('utf-8'), now)
+
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'name': name,
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'database_vendor': connection.vendor,
+        'counts': counts,
+        'media_files': len(hashes),
+        'media_written': len(written),
+        'media_skipped': len(skipped),
+        'media_bytes': total_bytes,
+        'media_missing': missing,
+        'media_hashes': sorted(set(hashes.values()) | previous_hashes),
+        'base': previous.get('name') if previous else None,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    _add_bytes(archive, MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'), now)
+    archive.close()
+    return manifest
+
+
+def _reset_sequences(models, using):
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def restore_snapshot(path, bases=(), replace=False, using=DEFAULT_DB_ALIAS, log=None):
+    """
+    Восстанавливает данные и медиафайлы из снимка
+
+    Данные вставляются пачками через bulk_create в одной транзакции. Файлы
+    из архива (и пропущенные инкрементальным снимком - из базовых архивов)
+    сначала пишутся во временный каталог (для файлового хранилища - внутри
+    MEDIA_ROOT) и переносятся в хранилище только после фиксации транзакции;
+    при откате каталог удаляется, и существующие медиафайлы остаются нетронутыми.
+
+    Args:
+        path (str): Путь к архиву снимка
+        bases (list): Пути к предыдущим снимкам (для инкрементального)
+        replace (bool): Удалить существующие данные main перед восстановлением
+        using (str): Алиас базы данных
+        log: Функция для вывода прогресса
+
+    Returns:
+        dict: Количество восстановленных объектов и файлов
+    """
+    log = log or (lambda message: None)
+    storage = default_storage
+    models = snapshot_models()
+    counts = {}
+    media_targets = {}
+    staged = set()
+    media_root = local_root(storage)
+    if media_root is not None:
+        # На той же файловой системе перенос на место - переименование
+        os.makedirs(media_root, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix='.restore-', dir=media_root)
+
+    def stage(digest, source):
+        with open(os.path.join(staging_dir, digest), 'wb') as output:
+            shutil.copyfileobj(source, output, HASH_BLOCK_SIZE)
+        staged.add(digest)
+
+    try:
+        with transaction.atomic(using=using):
+            if replace:
+                # Прямой DELETE без сигналов и каскада в Python: обработчики сводок
+                # и журнала аудита не должны срабатывать на очистку перед загрузкой
+                for model in reversed(models):
+                    queryset = model._base_manager.using(using).all()
+                    queryset._raw_delete(using)
+
+            with tarfile.open(path, 'r|*') as archive:
+                for member in archive:
+                    if member.name.startswith('data/'):
+                        objects = [
+                            deserialized.object
+                            for deserialized in serializers.deserialize('json', archive.extractfile(member).read())
+                        ]
+                        if objects:
+                            model = type(objects[0])
+                            model._default_manager.using(using).bulk_create(objects)
+                            label = model._meta.label_lower
+                            counts[label] = counts.get(label, 0) + len(objects)
+                    elif member.name == MEDIA_INDEX_NAME:
+                        for name, digest in json.load(archive.extractfile(member)).items():
+                            media_targets.setdefault(digest, []).append(name)
+                    elif member.name.startswith('media/'):
+                        with archive.extractfile(member) as source:
+                            stage(member.name.split('/', 1)[1], source)
+
+            # Файлы из базовых снимков (инкрементальный режим)
+            missing = set(media_targets) - staged
+            for base in bases:
+                if not missing:
+                    break
+                with tarfile.open(base, 'r:*') as archive:
+                    for digest in list(missing):
+                        try:
+                            member = archive.getmember(f'media/{digest}')
+                        except KeyError:
+                            continue
+                        with archive.extractfile(member) as source:
+                            stage(digest, source)
+                        missing.discard(digest)
+
+            _reset_sequences(models, using)
+
+        # Транзакция зафиксирована: файл записывается по всем путям, которые на него ссылаются
+        restored = 0
+        for digest in staged.intersection(media_targets):
+            for name in media_targets[digest]:
+                place_file(storage, media_root, os.path.join(staging_dir, digest), name)
+            restored += 1
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    for label, count in counts.items():
+        log(f'{label}: {count}')
+    return {
+        'counts': counts,
+        'media_restored': restored,
+        'media_missing': sorted(missing),
+    }
@@ -0,0 +1,64 @@
+# students/static_storage.py
+import gzip
+import os
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    # Без пакета brotli создаются только .gz-версии
+    brotli = None
+
+# Расширения файлов, которые имеет смысл сжимать
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico',
+}
+
+# Сжатые версии файлов: расширение -> Content-Encoding
+ENCODINGS = (
+    ('.br', 'br'),
+    ('.gz', 'gzip'),
+)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Хранилище статики с хэшированными именами и заранее сжатыми копиями
+
+    После collectstatic рядом с каждым текстовым файлом лежат .gz и .br
+    версии, которые отдаёт PrecompressedStaticMiddleware.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        compressed = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not dry_run and not isinstance(processed, Exception):
+                for path in (name, hashed_name):
+                    if path and path not in compressed:
+                        compressed.add(path)
+                        self.compress(path)
+            yield name, hashed_name, processed
+
+    def compress(self, name):
+        """
+        Создаёт .gz и .br копии файла, если они меньше оригинала
+        """
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return
+        path = self.path(name)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as original:
+            data = original.read()
+
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data, quality=11)))
+
+        for extension, content in variants:
+            if len(content) >= len(data):
+                continue
+            tmp_path = f"{path}{extension}.tmp"
+            with open(tmp_path, 'wb') as output:
+                output.write(content)
+            os.replace(tmp_path, path + extension)
@@ -0,0 +1,208 @@
+# students/summary.py
+from django.db import transaction
+from django.db.models import Count, DateField, F, Max, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from .models import Certificate, Diploma, PaymentReceipt, Student, StudentSummary, StudentUniversity
+
+DEFAULT_CHUNK_SIZE = 1000
+
+SUMMARY_FIELDS = ['certificates_count', 'diplomas_count', 'receipts_count', 'current_university', 'last_issue_date']
+
+# Модель документа -> поле счётчика в сводке
+COUNT_FIELDS = {
+    Certificate: 'certificates_count',
+    Diploma: 'diplomas_count',
+    PaymentReceipt: 'receipts_count',
+}
+
+
+def compute_summaries(student_ids):
+    """
+    Считает сводки по связанным таблицам: по одному запросу с GROUP BY на таблицу
+
+    Args:
+        student_ids (list): ID студентов
+
+    Returns:
+        dict: ID студента -> несохранённый объект StudentSummary
+    """
+    summaries = {pk: StudentSummary(student_id=pk) for pk in student_ids}
+
+    for model, field_name in COUNT_FIELDS.items():
+        rows = model.objects.filter(student_id__in=student_ids).values('student_id').annotate(total=Count('pk'))
+        for row in rows:
+            setattr(summaries[row['student_id']], field_name, row['total'])
+
+    for model in (Certificate, Diploma):
+        rows = model.objects.filter(student_id__in=student_ids).values('student_id').annotate(last=Max('issue_date'))
+        for row in rows:
+            summary = summaries[row['student_id']]
+            if summary.last_issue_date is None or row['last'] > summary.last_issue_date:
+                summary.last_issue_date = row['last']
+
+    # При нескольких отмеченных текущими берётся начатый позже всех
+    current = StudentUniversity.objects.filter(
+        student_id__in=student_ids, is_current=True
+    ).order_by('student_id', 'start_date', 'pk').values_list('student_id', 'university')
+    for student_id, university in current:
+        summaries[student_id].current_university = university
+
+    return summaries
+
+
+def save_summaries(summaries):
+    StudentSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=['student'],
+        update_fields=SUMMARY_FIELDS,
+    )
+
+
+def refresh_summaries(student_ids):
+    """
+    Пересчитывает и сохраняет сводки студентов (после bulk_create и т.п.,
+    когда сигналы не вызываются)
+    """
+    student_ids = list(set(student_ids))
+    if student_ids:
+        save_summaries(list(compute_summaries(student_ids).values()))
+
+
+def rebuild_summaries(chunk_size=DEFAULT_CHUNK_SIZE, log=None):
+    """
+    Пересчитывает сводки всех студентов пачками
+
+    Args:
+        chunk_size (int): Количество студентов в пачке
+        log: Функция для вывода прогресса
+
+    Returns:
+        int: Количество пересчитанных сводок
+    """
+    log = log or (lambda message: None)
+    last_pk = 0
+    total = 0
+    while True:
+        student_ids = list(
+            Student.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not student_ids:
+            return total
+        with transaction.atomic():
+            save_summaries(list(compute_summaries(student_ids).values()))
+        total += len(student_ids)
+        last_pk = student_ids[-1]
+        log(f"Пересчитано сводок: {total}")
+
+
+def backfill_summaries(sender=None, using='default', chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+    """
+    Создаёт недостающие сводки студентов, добавленных до появления сводок
+    или в обход сигналов (обработчик post_migrate вместо миграции данных)
+
+    Returns:
+        int: Количество созданных сводок
+    """
+    missing = Student.objects.using(using).filter(summary__isnull=True).order_by('pk')
+    total = 0
+    while True:
+        student_ids = list(missing.values_list('pk', flat=True)[:chunk_size])
+        if not student_ids:
+            return total
+        with transaction.atomic(using=using):
+            save_summaries(list(compute_summaries(student_ids).values()))
+        total += len(student_ids)
+
+
+def update_summary(student_id, **changes):
+    # Изменение применяется одним UPDATE в транзакции, изменившей документ;
+    # если сводки ещё нет (студент создан до её появления), она считается целиком
+    if not StudentSummary.objects.filter(student_id=student_id).update(**changes):
+        refresh_summaries([student_id])
+
+
+def last_issue_date(student_id):
+    dates = [
+        model.objects.filter(student_id=student_id).aggregate(last=Max('issue_date'))['last']
+        for model in (Certificate, Diploma)
+    ]
+    dates = [date for date in dates if date is not None]
+    return max(dates) if dates else None
+
+
+def current_university(student_id):
+    university = StudentUniversity.objects.filter(
+        student_id=student_id, is_current=True
+    ).order_by('-start_date', '-pk').values_list('university', flat=True).first()
+    return university or ''
+
+
+def deleted_with_student(kwargs):
+    # При удалении студента каскадом сводка удаляется вместе с ним
+    return isinstance(kwargs.get('origin'), Student)
+
+
+def student_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        StudentSummary.objects.get_or_create(student=instance)
+
+
+def document_pre_save(sender, instance, raw=False, **kwargs):
+    # Документ могут перенести к другому студенту: запоминаем прежнего
+    if raw or instance._state.adding:
+        return
+    instance._summary_student_id = sender.objects.filter(pk=instance.pk).values_list('student_id', flat=True).first()
+
+
+def document_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_student_id = instance.__dict__.pop('_summary_student_id', None)
+    if not created and previous_student_id is not None and previous_student_id != instance.student_id:
+        # Документ перенесён: пересчитываются сводки обоих студентов
+        for student_id, delta in ((previous_student_id, -1), (instance.student_id, 1)):
+            changes = {COUNT_FIELDS[sender]: F(COUNT_FIELDS[sender]) + delta}
+            if sender is not PaymentReceipt:
+                changes['last_issue_date'] = last_issue_date(student_id)
+            update_summary(student_id, **changes)
+        return
+
+    changes = {}
+    if created:
+        changes[COUNT_FIELDS[sender]] = F(COUNT_FIELDS[sender]) + 1
+    if sender is not PaymentReceipt:
+        if created:
+            issue_date = Value(instance.issue_date, output_field=DateField())
+            changes['last_issue_date'] = Greatest(Coalesce('last_issue_date', issue_date), issue_date)
+        else:
+            # Дата выдачи могла измениться в любую сторону
+            changes['last_issue_date'] = last_issue_date(instance.student_id)
+    if changes:
+        update_summary(instance.student_id, **changes)
+
+
+def document_deleted(sender, instance, **kwargs):
+    if deleted_with_student(kwargs):
+        return
+    changes = {COUNT_FIELDS[sender]: F(COUNT_FIELDS[sender]) - 1}
+    if sender is not PaymentReceipt:
+        changes['last_issue_date'] = last_issue_date(instance.student_id)
+    update_summary(instance.student_id, **changes)
+
+
+def university_changed(sender, instance, raw=False, **kwargs):
+    if raw or deleted_with_student(kwargs):
+        return
+    update_summary(instance.student_id, current_university=current_university(instance.student_id))
+
+
+def connect_signals():
+    post_save.connect(student_saved, sender=Student, dispatch_uid='main.summary_student')
+    for model in COUNT_FIELDS:
+        pre_save.connect(document_pre_save, sender=model, dispatch_uid=f'main.summary_pre_save_{model.__name__}')
+        post_save.connect(document_saved, sender=model, dispatch_uid=f'main.summary_save_{model.__name__}')
+        post_delete.connect(document_deleted, sender=model, dispatch_uid=f'main.summary_delete_{model.__name__}')
+    post_save.connect(university_changed, sender=StudentUniversity, dispatch_uid='main.summary_university_save')
+    post_delete.connect(university_changed, sender=StudentUniversity, dispatch_uid='main.summary_university_delete')
@@ -1,3 +1,49 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from .management.commands.seed_loadtest import PASSPORT_SCAN
+from .models import Certificate, Student
+from .snapshot import snapshot_models
 
-# Create your tests here.
+
+class SnapshotRestoreTests(TransactionTestCase):
+    """
+    Снимок и восстановление поверх заполненной базы (restore_snapshot --replace)
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        # seed_loadtest работает только при DEBUG=True
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, DEBUG=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, snapshot_dir, ignore_errors=True)
+        self.snapshot_path = os.path.join(snapshot_dir, 'snapshot.tar')
+
+    def test_restore_replace_over_populated_database(self):
+        call_command(
+            'seed_loadtest', students=3, certificates=2, diplomas=1, users=1, password='test', stdout=io.StringIO()
+        )
+        expected = {model: model._base_manager.count() for model in snapshot_models()}
+        names = dict(Student.objects.values_list('pk', 'full_name_english'))
+        call_command('snapshot', self.snapshot_path, stdout=io.StringIO())
+
+        # Данные и файлы меняются после снимка
+        student = Student.objects.order_by('pk').first()
+        student.full_name_english = 'Changed After Snapshot'
+        student.save()
+        Certificate.objects.filter(student=student).first().delete()
+        default_storage.delete(PASSPORT_SCAN)
+
+        call_command('restore_snapshot', self.snapshot_path, replace=True, stdout=io.StringIO())
+
+        self.assertEqual({model: model._base_manager.count() for model in snapshot_models()}, expected)
+        self.assertEqual(dict(Student.objects.values_list('pk', 'full_name_english')), names)
+        self.assertTrue(default_storage.exists(PASSPORT_SCAN))
@@ -1,19 +1,24 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from . import views
+from .ratelimit import ratelimit
 
 app_name = 'students'
 
 urlpatterns = [
     path('', views.student_list, name='student_list'),
-    path('login/', auth_views.LoginView.as_view(template_name='students/login.html'), name='login'),
+    path('login/', ratelimit('login')(auth_views.LoginView.as_view(template_name='students/login.html')), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('add-student/', views.add_student, name='add_student'),
+    path('import-receipts/', views.import_receipts, name='import_receipts'),
     path('student/<int:student_id>/', views.student_detail, name='student_detail'),
     path('student/<int:student_id>/add-certificate/', views.add_certificate, name='add_certificate'),
     path('student/<int:student_id>/add-diploma/', views.add_diploma, name='add_diploma'),
     path('student/<int:student_id>/certificate/<int:certificate_id>/', views.certificate_detail, name='certificate_detail'),
     path('student/<int:student_id>/diploma/<int:diploma_id>/', views.diploma_detail, name='diploma_detail'),
     path('student/<int:student_id>/receipt/<int:receipt_id>/', views.receipt_detail, name='receipt_detail'),
+    path('student/<int:student_id>/print/', views.print_student_documents, name='print_documents'),
+    path('student/<int:student_id>/restore/', views.restore_archived_student, name='restore_student'),
+    path('student/<int:student_id>/passport-scan/', views.student_passport_scan, name='passport_scan'),
 ]
 
@@ -1,8 +1,15 @@
+import os
 from django.shortcuts import render, get_object_or_404, redirect
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, Http404, HttpResponseBadRequest, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required, user_passes_test
-from .models import Student, Certificate, Diploma, PaymentReceipt, StudentUniversity
-from .forms import CertificateForm, DiplomaForm, PaymentReceiptForm, StudentForm, StudentUniversityFormSet
-from .qr_generator import generate_certificate_qr, generate_diploma_qr
+from .models import ArchivedStudent, Student, Certificate, Diploma, PaymentReceipt, StudentUniversity
+from .archive import display_fields, find_archived_document, get_archived_student, restore_student
+from .audit import record_view
+from .ratelimit import ratelimit
+from .forms import CertificateForm, DiplomaForm, PaymentReceiptForm, ReceiptArchiveForm, StudentForm, StudentUniversityFormSet
+# qr_generator и printing тянут qrcode и Pillow, поэтому импортируются
+# внутри представлений: manage.py и миграции их не загружают
 
 
 def admin_required(function=None):
@@ -19,7 +26,8 @@ def admin_required(function=None):
 
 @login_required
 def student_list(request):
-    students = Student.objects.all().order_by('full_name_english')
+    # Количество документов и текущий университет берутся из сводки (одна строка на студента)
+    students = Student.objects.select_related('summary').order_by('full_name_english')
     is_admin = request.user.is_staff or request.user.is_superuser
     return render(request, 'students/student_list.html', {
         'students': students,
@@ -41,12 +49,16 @@ def student_list(request):
 from .models import Student, Certificate, Diploma, PaymentReceipt
 from .forms import CertificateForm, DiplomaForm, PaymentReceiptForm
 
+@ratelimit('document_scan')
 @login_required
 def student_detail(request, student_id):
-    student = get_object_or_404(Student, id=student_id)
+    student = Student.objects.filter(id=student_id).first()
+    if student is None:
+        return archived_student_detail(request, student_id)
     certificates = student.certificates.all()
     diplomas = student.diplomas.all()
     payment_receipts = student.payment_receipts.all()
+    record_view(request, student, 'student_detail')
     
     # Добавляем флаг is_admin в контекст
     is_admin = request.user.is_staff or request.user.is_superuser
@@ -56,7 +68,8 @@ def student_detail(request, student_id):
         if form.is_valid():
             receipt = form.save(commit=False)
             receipt.student = student
-            receipt.save()
+            with transaction.atomic():
+                receipt.save()
             return redirect('students:student_detail', student_id=student.id)
     else:
         form = PaymentReceiptForm()
@@ -79,12 +92,17 @@ def add_certificate(request, student_id):
         if form.is_valid():
             certificate = form.save(commit=False)
             certificate.student = student
-            certificate.save()
-            
-            # Генерируем QR-код после сохранения справки
-            generate_certificate_qr(certificate, request)
-            
-            return redirect('students:student_detail', student_id=student.id)
+            from .numbering import assign_certificate_number, save_numbered
+            try:
+                save_numbered(certificate, assign_certificate_number)
+            except IntegrityError:
+                form.add_error('certificate_number', "Справка с таким номером уже выдана этим учреждением")
+            else:
+                # Генерируем QR-код после сохранения справки (показывается на странице справки)
+                from .qr_generator import generate_certificate_qr
+                generate_certificate_qr(certificate, request, use='web')
+                
+                return redirect('students:student_detail', student_id=student.id)
     else:
         form = CertificateForm()
     
@@ -102,12 +120,17 @@ def add_diploma(request, student_id):
         if form.is_valid():
             diploma = form.save(commit=False)
             diploma.student = student
-            diploma.save()
-            
-            # Генерируем QR-код после сохранения диплома
-            generate_diploma_qr(diploma, request)
-            
-            return redirect('students:student_detail', student_id=student.id)
+            from .numbering import assign_diploma_numbers, save_numbered
+            try:
+                save_numbered(diploma, assign_diploma_numbers)
+            except IntegrityError:
+                form.add_error(None, "Диплом с таким номером или регистрационным номером уже выдан этой организацией")
+            else:
+                # Генерируем QR-код после сохранения диплома (показывается на странице диплома)
+                from .qr_generator import generate_diploma_qr
+                generate_diploma_qr(diploma, request, use='web')
+                
+                return redirect('students:student_detail', student_id=student.id)
     else:
         form = DiplomaForm()
     
@@ -116,18 +139,24 @@ def add_diploma(request, student_id):
         'student': student
     })
 
+@ratelimit('document_scan')
 @login_required
 def certificate_detail(request, student_id, certificate_id):
-    student = get_object_or_404(Student, id=student_id)
+    student = Student.objects.filter(id=student_id).first()
+    if student is None:
+        return archived_document_detail(request, student_id, 'certificate', certificate_id)
     certificate = get_object_or_404(Certificate, id=certificate_id, student=student)
     return render(request, 'students/certificate_detail.html', {
         'certificate': certificate,
         'student': student
     })
 
+@ratelimit('document_scan')
 @login_required
 def diploma_detail(request, student_id, diploma_id):
-    student = get_object_or_404(Student, id=student_id)
+    student = Student.objects.filter(id=student_id).first()
+    if student is None:
+        return archived_document_detail(request, student_id, 'diploma', diploma_id)
     diploma = get_object_or_404(Diploma, id=diploma_id, student=student)
     return render(request, 'students/diploma_detail.html', {
         'diploma': diploma,
@@ -136,7 +165,9 @@ def diploma_detail(request, student_id, diploma_id):
 
 @login_required
 def receipt_detail(request, student_id, receipt_id):
-    student = get_object_or_404(Student, id=student_id)
+    student = Student.objects.filter(id=student_id).first()
+    if student is None:
+        return archived_document_detail(request, student_id, 'receipt', receipt_id)
     receipt = get_object_or_404(PaymentReceipt, id=receipt_id, student=student)
     return render(request, 'students/receipt_detail.html', {
         'receipt': receipt,
@@ -144,6 +175,69 @@ def receipt_detail(request, student_id, receipt_id):
     })
 
 
+# Модели документов по типам индекса архивных документов
+ARCHIVED_DOCUMENT_MODELS = {
+    'certificate': Certificate,
+    'diploma': Diploma,
+    'receipt': PaymentReceipt,
+}
+
+
+def archived_student_detail(request, student_id):
+    """
+    Карточка архивного студента только для чтения (без восстановления в основные таблицы)
+    """
+    archived, objects = get_archived_student(student_id)
+    student = next(obj for obj in objects if isinstance(obj, Student))
+    documents = [
+        (document, display_fields(obj))
+        for document in archived.documents.order_by('document_type', 'document_id')
+        for obj in objects
+        if isinstance(obj, ARCHIVED_DOCUMENT_MODELS[document.document_type]) and obj.pk == document.document_id
+    ]
+    record_view(request, archived, 'archived_student_detail')
+    return render(request, 'students/archived_student_detail.html', {
+        'archived': archived,
+        'student': student,
+        'student_fields': display_fields(student),
+        'documents': documents,
+        'is_admin': request.user.is_staff or request.user.is_superuser,
+    })
+
+
+def archived_document_detail(request, student_id, document_type, document_id):
+    """
+    Проверка документа архивного студента по ссылке QR-кода: только чтение,
+    поиск через индекс архивных документов
+    """
+    document = find_archived_document(document_type, student_id=student_id, document_id=document_id).first()
+    if document is None:
+        raise Http404("Документ не найден")
+    archived, objects = get_archived_student(student_id)
+    model = ARCHIVED_DOCUMENT_MODELS[document_type]
+    obj = next((obj for obj in objects if isinstance(obj, model) and obj.pk == document_id), None)
+    if obj is None:
+        raise Http404("Документ не найден")
+    return render(request, 'students/archived_document_detail.html', {
+        'archived': archived,
+        'document': document,
+        'fields': display_fields(obj),
+    })
+
+
+@admin_required
+def restore_archived_student(request, student_id):
+    """
+    Восстанавливает архивного студента в основные таблицы (только POST)
+    """
+    if request.method != 'POST':
+        return HttpResponseBadRequest("Восстановление выполняется только POST-запросом")
+    if not Student.objects.filter(id=student_id).exists():
+        get_object_or_404(ArchivedStudent, student_id=student_id)
+        restore_student(student_id)
+    return redirect('students:student_detail', student_id=student_id)
+
+
 @admin_required
 def add_student(request):
     if request.method == 'POST':
@@ -151,12 +245,13 @@ def add_student(request):
         university_formset = StudentUniversityFormSet(request.POST, request.FILES)
         
         if form.is_valid():
-            student = form.save()
-            
-            # Сохраняем университеты
-            university_formset = StudentUniversityFormSet(request.POST, request.FILES, instance=student)
-            if university_formset.is_valid():
-                university_formset.save()
+            with transaction.atomic():
+                student = form.save()
+                
+                # Сохраняем университеты
+                university_formset = StudentUniversityFormSet(request.POST, request.FILES, instance=student)
+                if university_formset.is_valid():
+                    university_formset.save()
             
             return redirect('students:student_detail', student_id=student.id)
     else:
@@ -166,4 +261,80 @@ def add_student(request):
     return render(request, 'students/add_student.html', {
         'form': form,
         'university_formset': university_formset,
-    })
\ No newline at end of file
+    })
+
+
+@admin_required
+def student_passport_scan(request, student_id):
+    """
+    Скан паспорта студента; каждый просмотр записывается в журнал аудита
+    """
+    student = Student.objects.filter(id=student_id).first()
+    if student is None:
+        get_object_or_404(ArchivedStudent, student_id=student_id)
+        raise Http404("Студент в архиве: восстановите его, чтобы открыть скан паспорта")
+    if not student.passport_scan:
+        raise Http404("Скан паспорта не загружен")
+    try:
+        scan = student.passport_scan.open('rb')
+    except FileNotFoundError:
+        raise Http404("Файл скана паспорта не найден")
+    record_view(request, student, 'passport_scan')
+    return FileResponse(scan, filename=os.path.basename(student.passport_scan.name))
+
+
+@ratelimit('bulk')
+@admin_required
+def print_student_documents(request, student_id):
+    """
+    Печать справок и дипломов студента одним PDF-файлом
+
+    Параметры certificate и diploma (можно несколько) ограничивают выбор,
+    без них печатаются все документы студента.
+    """
+    from .printing import print_documents
+
+    student = get_object_or_404(Student, id=student_id)
+    certificates = student.certificates.all()
+    diplomas = student.diplomas.all()
+
+    try:
+        certificate_ids = [int(value) for value in request.GET.getlist('certificate')]
+        diploma_ids = [int(value) for value in request.GET.getlist('diploma')]
+    except ValueError:
+        return HttpResponseBadRequest("ID документов должны быть целыми числами")
+    if certificate_ids or diploma_ids:
+        certificates = certificates.filter(id__in=certificate_ids)
+        diplomas = diplomas.filter(id__in=diploma_ids)
+    if not certificates.exists() and not diplomas.exists():
+        raise Http404("Документы для печати не найдены")
+
+    response = StreamingHttpResponse(
+        print_documents(certificates, diplomas, base_url=request.build_absolute_uri('/')),
+        content_type='application/pdf',
+    )
+    response['Content-Disposition'] = f'inline; filename="documents_{student.passport_number}.pdf"'
+    return response
+
+
+@ratelimit('bulk')
+@admin_required
+def import_receipts(request):
+    """
+    Загрузка ZIP-архива банка с чеками оплаты, названными по номеру паспорта
+    """
+    from .receipts_import import import_receipts as run_import
+
+    result = None
+    if request.method == 'POST':
+        form = ReceiptArchiveForm(request.POST, request.FILES)
+        if form.is_valid():
+            result = run_import(form.cleaned_data['archive'])
+            form = ReceiptArchiveForm()
+    else:
+        form = ReceiptArchiveForm()
+
+    return render(request, 'students/import_receipts.html', {
+        'form': form,
+        'result': result,
+    })
@@ -0,0 +1,76 @@
+# students/warmup.py
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Переменная окружения, включающая прогрев при старте (выставляется в wsgi.py / asgi.py)
+WARM_UP_ENV = 'STUDENTS_QR_WARM_UP'
+
+
+def warm_up_renderer():
+    """
+    Загружает qrcode и Pillow, подготавливает макеты QR-кодов
+    """
+    from .qr_generator import make_qr_image
+    from .qr_layouts import warm_up_layouts
+
+    warm_up_layouts()
+    # Первый QR-код инициализирует таблицы qrcode и кодеки Pillow
+    make_qr_image('https://localhost/warm-up/', qr_size=250)
+
+
+def warm_up_urls():
+    """
+    Строит URL-резолвер проекта
+    """
+    from django.urls import get_resolver, reverse
+
+    get_resolver().url_patterns
+    reverse('students:student_list')
+
+
+def warm_up_templates():
+    """
+    Компилирует шаблоны приложения (они кэшируются загрузчиком при DEBUG=False)
+    """
+    from django.template.loader import get_template
+
+    template_dir = os.path.join(os.path.dirname(__file__), 'templates', 'students')
+    for filename in sorted(os.listdir(template_dir)):
+        if filename.endswith('.html'):
+            get_template(f'students/{filename}')
+
+
+WARM_UP_STEPS = (
+    ('renderer', warm_up_renderer),
+    ('urls', warm_up_urls),
+    ('templates', warm_up_templates),
+)
+
+
+def warm_up():
+    """
+    Выполняет прогрев воркера до приёма запросов
+
+    Ошибка одного шага не мешает остальным и не останавливает воркер.
+
+    Returns:
+        dict: Имя шага -> время выполнения в секундах (None при ошибке)
+    """
+    timings = {}
+    for name, step in WARM_UP_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception("Ошибка прогрева: %s", name)
+            timings[name] = None
+            continue
+        timings[name] = time.perf_counter() - started
+    logger.info(
+        "Прогрев завершён: %s",
+        ', '.join(f"{name}={'ошибка' if t is None else f'{t * 1000:.1f} мс'}" for name, t in timings.items()),
+    )
+    return timings
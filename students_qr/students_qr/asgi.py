@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'students_qr.settings')
+# Прогрев рендерера, URL и шаблонов в MainConfig.ready() до приёма запросов
+os.environ.setdefault('STUDENTS_QR_WARM_UP', '1')
+# Журнал аудита пишется фоновым потоком пачками (main/audit.py)
+os.environ.setdefault('STUDENTS_QR_AUDIT_BUFFER', '1')
 
 application = get_asgi_application()
@@ -28,6 +28,10 @@ DEBUG = config('DEBUG', default=False, cast=bool)
 
 ALLOWED_HOSTS = config('ALLOWED_HOSTS').split(',')
 
+# Адрес сайта для ссылок в QR-кодах, которые строятся вне запроса
+# (manage.py print_documents), например https://example.com
+SITE_URL = config('SITE_URL', default='')
+
 
 # Application definition
 
@@ -42,11 +46,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первой: медленные запросы сессий и аутентификации тоже учитываются
+    'main.middleware.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'main.middleware.PrecompressedStaticMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.middleware.CachedAuthenticationMiddleware',
+    'main.middleware.AuditContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,6 +95,52 @@ DATABASES = {
 }
 
 
+# Cache and sessions
+# Сессии и снимки пользователей кэшируются только в общем для всех воркеров и
+# серверов кэше (Redis/Memcached), заданном через SESSION_CACHE_BACKEND и
+# SESSION_CACHE_LOCATION. Без него сессии хранятся в таблице django_session,
+# а снимки отключены: локальный кэш процесса не видел бы сброса из других
+# воркеров, а файловый хранил бы данные пользователей в открытом виде.
+
+SESSION_CACHE_BACKEND = config('SESSION_CACHE_BACKEND', default='')
+SESSION_CACHE_LOCATION = config('SESSION_CACHE_LOCATION') if SESSION_CACHE_BACKEND else ''
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='students-qr'),
+    },
+    # Счётчики ограничения частоты запросов (main/ratelimit.py). По умолчанию -
+    # общий кэш сессий (SESSION_CACHE_BACKEND), отдельный задаётся через
+    # RATE_LIMIT_CACHE_BACKEND / _LOCATION. Локальный кэш считает запросы в каждом
+    # воркере отдельно, поэтому при DEBUG=False manage.py check --deploy его не пропускает.
+    # Конечный TIMEOUT не даёт ключам копиться, если бэкенд не хранит срок при incr.
+    'ratelimit': {
+        'BACKEND': config(
+            'RATE_LIMIT_CACHE_BACKEND',
+            default=SESSION_CACHE_BACKEND or 'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': config('RATE_LIMIT_CACHE_LOCATION', default=SESSION_CACHE_LOCATION or 'students-qr-ratelimit'),
+        'TIMEOUT': 2 * 86400,
+    },
+}
+
+if SESSION_CACHE_BACKEND:
+    CACHES['sessions'] = {
+        'BACKEND': SESSION_CACHE_BACKEND,
+        'LOCATION': SESSION_CACHE_LOCATION,
+        'TIMEOUT': None,
+    }
+    SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cache')
+    SESSION_CACHE_ALIAS = 'sessions'
+else:
+    SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.db')
+
+# Снимок пользователя и его прав (main/auth_cache.py), None - без снимков
+AUTH_SNAPSHOT_CACHE = 'sessions' if SESSION_CACHE_BACKEND else None
+AUTH_SNAPSHOT_TIMEOUT = 300
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -134,6 +188,11 @@ if not DEBUG:
     SECURE_HSTS_PRELOAD = True
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
+# Сколько обратных прокси (nginx и т.п.) стоит перед приложением: адрес клиента
+# для журнала аудита и ограничения частоты запросов берётся из X-Forwarded-For
+# только при TRUSTED_PROXY_COUNT > 0, иначе - из REMOTE_ADDR
+TRUSTED_PROXY_COUNT = config('TRUSTED_PROXY_COUNT', default=0, cast=int)
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
@@ -144,9 +203,104 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
+# collectstatic создаёт файлы с хэшем в имени и их .gz / .br копии,
+# которые отдаёт main.middleware.PrecompressedStaticMiddleware
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'main.static_storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 
+# Медиафайлы в S3-совместимом хранилище (S3, MinIO) вместо MEDIA_ROOT, см. main/object_storage.py.
+# Для проверки без S3 подойдёт endpoint_url 'file:///путь/к/каталогу'.
+# STORAGES['default'] = {
+#     'BACKEND': 'main.object_storage.ObjectStorage',
+#     'OPTIONS': {
+#         'bucket': config('S3_BUCKET'),
+#         'endpoint_url': config('S3_ENDPOINT_URL', default=None),
+#         'access_key': config('S3_ACCESS_KEY'),
+#         'secret_key': config('S3_SECRET_KEY'),
+#         'region': config('S3_REGION', default=None),
+#         'cache_dir': os.path.join(BASE_DIR, 'cache', 'media'),
+#     },
+# }
+
+# Макеты QR-кодов (см. main/qr_layouts.py). Пути шаблонов - относительно MEDIA_ROOT.
+# Пример:
+# QR_LAYOUTS = {
+#     'cairo': {'template': 'shablon/cairo.png', 'qr_x': 60, 'qr_y': 60, 'qr_size': 200},
+# }
+# QR_LAYOUT_RULES = [
+#     {'document_type': 'diploma', 'institution': 'Cairo University', 'layout': 'cairo'},
+# ]
+QR_LAYOUTS = {}
+QR_LAYOUT_RULES = []
+
+# Формат файлов QR-кодов по назначению: 'png' (1 бит / палитра), 'webp' (без потерь)
+# или 'svg' (векторный QR-код без шаблона)
+QR_OUTPUT_FORMATS = {
+    'print': 'png',
+    'web': 'webp',
+}
+
+# Кэш отрисованных страниц печати (main/printing.py): вне MEDIA_ROOT, так как
+# страницы содержат паспортные данные; давно не читавшиеся страницы вытесняются
+PRINT_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'print')
+PRINT_CACHE_SIZE = 256 * 1024 * 1024
+
+# Автоматическая нумерация документов. Номера выдаются по сериям
+# (учреждение + тип номера + год) блоками по DOCUMENT_NUMBER_BLOCK_SIZE на процесс.
+# Поля шаблона: {code} - код учреждения, {year}, {yy}, {number}; серия шаблона
+# без {year} и {yy} не начинается заново каждый год.
+# DOCUMENT_NUMBER_FORMATS = {
+#     'certificate': '{code}-{year}-{number:05d}',
+#     'diploma': '{yy}{number:06d}',
+#     'registration': '{code}/{year}/{number}',
+# }
+# DOCUMENT_NUMBER_INSTITUTION_CODES = {
+#     'Cairo University': 'CU',
+# }
+DOCUMENT_NUMBER_BLOCK_SIZE = 20
+
+# Архив выпускников и отчисленных (manage.py archive_students): через сколько дней
+# после окончания обучения студент переносится в архив и сколько дней
+# восстановленный студент не архивируется повторно
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_RESTORE_HOLD_DAYS = 90
+
+# Журнал аудита (main/audit.py): события пишутся фоновым потоком пачками
+# по AUDIT_BATCH_SIZE или раз в AUDIT_FLUSH_INTERVAL секунд
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 2.0
+
+# Медленные запросы (main/slow_queries.py, manage.py slow_queries): запросы дольше
+# SLOW_QUERY_THRESHOLD_MS миллисекунд (None - не отслеживать) собираются по отпечаткам
+# и раз в SLOW_QUERY_FLUSH_INTERVAL секунд записываются в базу вместе с планом EXPLAIN.
+# SLOW_QUERY_EXPLAIN_ANALYZE выполняет SELECT повторно (EXPLAIN ANALYZE) в откатываемой транзакции.
+SLOW_QUERY_THRESHOLD_MS = 200
+SLOW_QUERY_FLUSH_INTERVAL = 10.0
+SLOW_QUERY_EXPLAIN_ANALYZE = False
+
+# Ограничение частоты запросов (main/ratelimit.py). Счётчики хранятся в отдельном
+# кэше RATE_LIMIT_CACHE (см. CACHES['ratelimit']), который должен быть общим для
+# воркеров; атомарные incr дают Redis/Memcached. Адрес клиента берётся с учётом
+# TRUSTED_PROXY_COUNT. Правила по маршрутам переопределяют значения по умолчанию:
+# RATE_LIMITS = {
+#     'login': {'rate': '10/m', 'key': 'ip', 'methods': ['POST']},
+#     'document_scan': {'rate': '60/m', 'key': 'user_or_ip'},
+#     'bulk': {'rate': '30/h', 'key': 'user'},
+# }
+RATE_LIMIT_CACHE = 'ratelimit'
+# False отключает все ограничения, например на сервере для нагрузочного теста
+# (manage.py loadtest), чтобы отчёт измерял приложение, а не ограничитель
+RATE_LIMITS_ENABLED = config('RATE_LIMITS_ENABLED', default=True, cast=bool)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 